@@ -0,0 +1,207 @@
+"""
+Throughput benchmarks for k-mer counting and graph construction.
+
+Reads are simulated locally (see read_simulator), so the benchmark needs no
+external data. Each scenario runs in a freshly spawned process, which
+makes its peak RSS its own and keeps earlier scenarios from warming
+caches for later ones. Results are written as JSON so that runs of
+different versions can be compared.
+
+Scenarios:
+    count  FastqProcessor.process_fastq (reads/s, k-mers/s)
+    graph  DeBruijnGraphBuilder.build_graph_from_kmers; seconds cover the
+           graph construction alone, its counting pass is reported as
+           count_seconds
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from profiling import StageProfiler, peak_rss_bytes
+from read_simulator import DEFAULT_ERROR_RATE, DEFAULT_READ_LENGTH, ReadSimulator
+
+
+BENCHMARK_KMERS = (6, 21, 31, 63)
+SCENARIOS = ('count', 'graph')
+
+# Named input sizes as (genome length, coverage)
+INPUT_SIZES = {
+    'tiny': (5000, 5),
+    'small': (50000, 10),
+    'medium': (500000, 10),
+    'large': (2000000, 20),
+}
+DEFAULT_SIZES = ('small', 'medium')
+
+
+def run_scenario(scenario, reads_file, kmer_length, workers=1):
+    """
+    Time one scenario in the current process.
+
+    Returns:
+        dict: Elapsed seconds of the timed stage, distinct k-mers and, for
+        graphs, the counting seconds and node and edge counts, plus the
+        process peak RSS
+    """
+    # Imported here so that the parent process stays light
+    from de_bruijn_graph_builder import DeBruijnGraphBuilder
+    from read_fastq_gz import FastqProcessor, default_method
+
+    result = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if scenario == 'count':
+            processor = FastqProcessor(reads_file, kmer_length, method=default_method(kmer_length, workers),
+                                       workers=workers)
+            start = time.perf_counter()
+            processor.process_fastq()
+            result['seconds'] = time.perf_counter() - start
+            result['distinct_kmers'] = len(processor.count_table) if processor.count_table is not None \
+                else len(processor.packed_counts)
+        elif scenario == 'graph':
+            # The builder counts before it builds; its 'graph' stage times the construction alone
+            profiler = StageProfiler(progress_interval=float('inf'))
+            builder = DeBruijnGraphBuilder(reads_file, kmer_length, workers=workers, profiler=profiler)
+            start = time.perf_counter()
+            builder.build_graph_from_kmers()
+            elapsed = time.perf_counter() - start
+            result['seconds'] = profiler.stages['graph'].wall
+            result['count_seconds'] = elapsed - result['seconds']
+            result['backend'] = builder.backend
+            result['nodes'] = builder.graph.number_of_nodes()
+            result['edges'] = builder.graph.number_of_edges()
+        else:
+            raise ValueError(f"Unknown scenario '{scenario}', expected one of {SCENARIOS}")
+    result['peak_rss_bytes'] = peak_rss_bytes()
+    return result
+
+
+def _scenario_worker(queue, scenario, reads_file, kmer_length, workers):
+    try:
+        queue.put(run_scenario(scenario, reads_file, kmer_length, workers))
+    except Exception as error:
+        queue.put({'error': f"{type(error).__name__}: {error}"})
+
+
+def run_isolated(scenario, reads_file, kmer_length, workers=1):
+    """Run a scenario in a spawned child process and return its result."""
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_scenario_worker, args=(queue, scenario, reads_file, kmer_length, workers))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def simulate_input(size, work_dir, read_length=DEFAULT_READ_LENGTH, error_rate=DEFAULT_ERROR_RATE):
+    """
+    Simulate the reads of a named input size, reusing an existing file.
+
+    Returns:
+        tuple: (FASTQ path, ReadSimulator)
+    """
+    genome_length, coverage = INPUT_SIZES[size]
+    simulator = ReadSimulator(genome_length, read_length, coverage, error_rate)
+    path = os.path.join(work_dir, f"sim_{size}_{genome_length}x{coverage}_{read_length}bp.fastq.gz")
+    if not os.path.exists(path):
+        simulator.write_fastq_gz(path)
+    return path, simulator
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, kmer_lengths=BENCHMARK_KMERS, scenarios=SCENARIOS, workers=1,
+                   work_dir=None, read_length=DEFAULT_READ_LENGTH, error_rate=DEFAULT_ERROR_RATE):
+    """
+    Run every scenario for every input size and k.
+
+    Returns:
+        dict: Environment description and a list of results
+    """
+    report = {
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': workers,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'results': [],
+    }
+    with tempfile.TemporaryDirectory(prefix='shortasm_bench_') as scratch:
+        work_dir = work_dir or scratch
+        for size in sizes:
+            reads_file, simulator = simulate_input(size, work_dir, read_length, error_rate)
+            reads = simulator.num_reads
+            for kmer_length in kmer_lengths:
+                kmers = reads * max(read_length - kmer_length + 1, 0)
+                for scenario in scenarios:
+                    print(f"{scenario:>6} size={size} k={kmer_length} ...", end=' ', flush=True, file=sys.stderr)
+                    result = run_isolated(scenario, reads_file, kmer_length, workers)
+                    result.update({
+                        'scenario': scenario,
+                        'size': size,
+                        'genome_length': simulator.genome_length,
+                        'coverage': simulator.coverage,
+                        'kmer_length': kmer_length,
+                        'reads': reads,
+                        'kmers': kmers,
+                    })
+                    if 'seconds' in result:
+                        result['reads_per_second'] = reads / result['seconds']
+                        result['kmers_per_second'] = kmers / result['seconds']
+                        print(f"{result['seconds']:.2f}s", file=sys.stderr)
+                    else:
+                        print(result['error'], file=sys.stderr)
+                    report['results'].append(result)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark k-mer counting and de Bruijn graph construction")
+    parser.add_argument('--sizes', nargs='+', choices=sorted(INPUT_SIZES), default=list(DEFAULT_SIZES),
+                        help="Simulated input sizes to run")
+    parser.add_argument('--kmer', nargs='+', type=int, default=list(BENCHMARK_KMERS), help="K-mer lengths")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS),
+                        help="Scenarios to run")
+    parser.add_argument('--threads', '--workers', dest='workers', type=int, default=1,
+                        help="Worker processes used by each scenario")
+    parser.add_argument('--read-length', type=int, default=DEFAULT_READ_LENGTH, help="Simulated read length")
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_ERROR_RATE,
+                        help="Simulated per-base substitution error rate")
+    parser.add_argument('--work-dir', type=str,
+                        help="Keep simulated reads here and reuse them across runs (default: a temporary directory)")
+    parser.add_argument('--output', type=str, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.work_dir:
+        os.makedirs(args.work_dir, exist_ok=True)
+    report = run_benchmarks(args.sizes, args.kmer, args.scenarios, args.workers, args.work_dir,
+                            args.read_length, args.error_rate)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Wrote {len(report['results'])} results to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Argument groups shared by the command-line entry points.
+
+read_fastq_gz.py, de_bruijn_graph_builder.py and the subcommands of
+shortasm.py declare their options through these helpers, so a flag is
+defined once and means the same everywhere. The module only loads the
+counting defaults, never the graph code, so shortasm can build its whole
+parser without importing the graph backends.
+"""
+
+from incremental_index import is_extendable
+from ingest_pipeline import DEFAULT_QUEUE_DEPTH
+from kmer_table import MAX_ARRAY_K
+from profiling import DEFAULT_PROGRESS_INTERVAL
+from read_fastq_gz import COUNTING_METHODS, DEFAULT_BATCH_SIZE, DEFAULT_MEMORY_BUDGET_MB, default_method
+
+
+GRAPH_BACKENDS = ('compact', 'networkx')
+DEFAULT_KMER = 6
+
+
+def add_input_arguments(parser, multi_k=False, samples=True):
+    """Input files, samples and k-mer length."""
+    parser.add_argument('--reads', nargs='+', metavar='FASTQ',
+                        help="Input FASTQ files or glob patterns; paired-end mates and lanes are all counted")
+    if samples:
+        parser.add_argument('--sample-sheet', type=str,
+                            help="Tab-separated 'sample<TAB>file or glob' lines defining the inputs and their samples")
+        parser.add_argument('--sample-counts', type=str,
+                            help="Keep a count column per sample (files grouped by name without lane and mate "
+                                 "suffixes, or by --sample-sheet) and write them to this TSV file")
+    if multi_k:
+        parser.add_argument('--kmer', type=int, nargs='+', default=[DEFAULT_KMER],
+                            help="K-mer length; several values are counted together in one pass")
+    else:
+        parser.add_argument('--kmer', type=int, default=DEFAULT_KMER, help="K-mer length")
+
+
+def add_counting_arguments(parser):
+    """Workers, filtering, memory, index and batching of the k-mer counting."""
+    parser.add_argument('--threads', '--workers', dest='workers', type=int, default=1,
+                        help="Worker processes for sharded parallel counting")
+    parser.add_argument('--min-count', type=int, default=1,
+                        help="Keep only k-mers seen at least this many times")
+    parser.add_argument('--memory-budget', type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help="Memory in MB for the count-min sketch used with --min-count")
+    parser.add_argument('--max-memory', type=int,
+                        help="Count through on-disk buckets, keeping memory near this many MB")
+    parser.add_argument('--tmp-dir', type=str,
+                        help="Directory for the on-disk buckets and count table (default: a temporary directory)")
+    parser.add_argument('--index', type=str,
+                        help="K-mer index file: reused when it matches the input, written otherwise")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Reads per counting batch")
+    parser.add_argument('--pipeline', nargs='?', type=int, const=DEFAULT_QUEUE_DEPTH, metavar='DEPTH',
+                        help="Inflate and parse the input in background threads, overlapping counting; "
+                             f"DEPTH blocks and batches may queue between the stages (default {DEFAULT_QUEUE_DEPTH})")
+
+
+def add_count_arguments(parser):
+    """Counting engine and spectrum output of a counting-only run."""
+    parser.add_argument('--method', choices=COUNTING_METHODS,
+                        help="K-mer counting engine: 2-bit packed integers, NumPy batches or Python strings "
+                             "(default: packed, or numpy when counting in parallel)")
+    parser.add_argument('--spectrum', type=str,
+                        help="Write the k-mer spectrum (count histogram) of every k to this TSV file")
+
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', nargs='?', const='-', metavar='JSON',
+                        help="Profile the run: progress and stage timings on stderr, JSON summary to this file "
+                             "(or stderr when no file is given)")
+    parser.add_argument('--progress-interval', type=float, default=DEFAULT_PROGRESS_INTERVAL,
+                        help="Seconds between progress reports when profiling")
+
+
+def add_graph_arguments(parser):
+    """Graph backend and incremental ingestion."""
+    parser.add_argument('--backend', choices=GRAPH_BACKENDS,
+                        help="Graph storage: compact packed arrays (default for k <= 32) or networkx.DiGraph")
+    parser.add_argument('--add-reads', nargs='+', metavar='FASTQ',
+                        help="Add FASTQ files to the incremental index given by --index and update the graph")
+
+
+def add_simplify_arguments(parser):
+    parser.add_argument('--simplify', action='store_true',
+                        help="Compact the graph, then clip tips and pop bubbles in the unitig graph")
+    parser.add_argument('--tip-length', type=int, help="Clip dead ends shorter than this many bases (default 2k)")
+    parser.add_argument('--tip-coverage', type=float, default=0,
+                        help="Also clip dead ends of any length with a lower mean k-mer coverage")
+    parser.add_argument('--bubble-length', type=int, help="Longest bubble branch to pop, in bases (default 3k)")
+
+
+def add_output_arguments(parser):
+    """Compaction, simplification and export of the graph."""
+    parser.add_argument('--compact', action='store_true', help="Compact the graph into unitigs")
+    add_simplify_arguments(parser)
+    parser.add_argument('--gfa', type=str,
+                        help="Write the graph (unitigs with --compact) as GFA; '.gz' paths are compressed")
+    parser.add_argument('--unitig-fasta', type=str, help="Write unitig sequences as FASTA")
+
+
+def add_stats_arguments(parser):
+    parser.add_argument('--threshold', type=int, default=10, help="Threshold for high-weight edges")
+    parser.add_argument('--validate', action='store_true', help="Validate bidirected structure")
+    parser.add_argument('--demonstrate', action='store_true', help="Demonstrate bidirected nature")
+
+
+def kmer_lengths_of(args):
+    return args.kmer if isinstance(args.kmer, list) else [args.kmer]
+
+
+def has_samples(args):
+    """Whether a run keeps per-sample counts: a sample sheet always defines samples."""
+    return bool(getattr(args, 'sample_counts', None) or getattr(args, 'sample_sheet', None))
+
+
+def counting_method(args):
+    """Counting method of a run: --method, or the default for its k-mer lengths, samples and options."""
+    if getattr(args, 'method', None):
+        return args.method
+    kmer_lengths = kmer_lengths_of(args)
+    if len(kmer_lengths) > 1 or has_samples(args):
+        return 'numpy'
+    return default_method(kmer_lengths[0], args.workers, args.min_count, args.max_memory)
+
+
+def check_counting_arguments(parser, args):
+    """Reject counting options that FastqProcessor cannot combine."""
+    kmer_lengths = kmer_lengths_of(args)
+    if min(kmer_lengths) < 1:
+        parser.error("--kmer must be at least 1")
+    method = counting_method(args)
+    if len(kmer_lengths) > 1:
+        if method != 'numpy' or max(kmer_lengths) > MAX_ARRAY_K:
+            parser.error(f"several --kmer values are counted with the numpy method, which needs k <= {MAX_ARRAY_K}")
+        if args.workers > 1 or args.max_memory is not None or args.index:
+            parser.error("several --kmer values are counted in one process, without --workers, --max-memory "
+                         "or --index")
+    if has_samples(args):
+        if method != 'numpy' or len(kmer_lengths) > 1 or max(kmer_lengths) > MAX_ARRAY_K:
+            parser.error(f"per-sample counts need the numpy method and a single k <= {MAX_ARRAY_K}")
+        if args.max_memory is not None or args.index:
+            parser.error("per-sample counts are kept in memory, without --max-memory or --index")
+    if args.workers > 1 and (method != 'numpy' or max(kmer_lengths) > MAX_ARRAY_K):
+        parser.error(f"--workers above 1 counts with the numpy method, which needs k <= {MAX_ARRAY_K}")
+    if args.max_memory is not None and (method != 'numpy' or max(kmer_lengths) > MAX_ARRAY_K):
+        parser.error(f"--max-memory counts with the numpy method, which needs k <= {MAX_ARRAY_K}")
+    if args.index and (method == 'string' or max(kmer_lengths) > MAX_ARRAY_K):
+        parser.error(f"--index needs the packed or numpy method and k <= {MAX_ARRAY_K}")
+
+
+def check_graph_arguments(parser, args):
+    """Reject --add-reads without an index it can extend."""
+    if args.add_reads and not args.index:
+        parser.error("--add-reads requires --index")
+    if args.add_reads and not is_extendable(args.index):
+        parser.error(f"{args.index} holds filtered counts or does not list the files it was counted from; "
+                     "rebuild it with --min-count 1 to use --add-reads")
+
+
+def check_output_arguments(parser, args):
+    """Reject unitig outputs for graphs that cannot be compacted; --gfa works with any graph."""
+    compacts = args.compact or args.simplify or args.unitig_fasta
+    if compacts and (args.backend == 'networkx' or args.kmer > MAX_ARRAY_K):
+        parser.error(f"--compact, --simplify and --unitig-fasta need the compact backend and k <= {MAX_ARRAY_K}")
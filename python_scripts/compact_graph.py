@@ -0,0 +1,216 @@
+"""
+Compact array-backed de Bruijn graph.
+
+Nodes are the oriented (k-1)-mers of both strands, stored as a sorted uint64
+array of packed codes. Edges are not stored at all: the oriented edge
+u -> v exists when the k-mer u + v[-1] (or its reverse complement) is in the
+canonical count table, and its count is looked up there. A node therefore
+has at most four successors and four predecessors, found by probing the
+four one-base extensions.
+"""
+
+import numpy as np
+
+from kmer_batch import canonical_codes_of, reverse_complement_codes
+from kmer_encoding import BASES, canonical_code, decode_kmer, encode_kmer, kmer_mask
+from kmer_table import MAX_ARRAY_K, KmerCountTable, sorted_unique
+
+
+_COMPLEMENT = str.maketrans(BASES, BASES[::-1])
+
+EDGE_CHUNK_SIZE = 4096
+
+
+class CompactDeBruijnGraph:
+    def __init__(self, kmer_length, kmers, counts):
+        if not 2 <= kmer_length <= MAX_ARRAY_K:
+            raise ValueError(f"Compact graphs support 2 <= k <= {MAX_ARRAY_K}, got {kmer_length}")
+        self.kmer_length = kmer_length
+        self.table = KmerCountTable(kmer_length, kmers, counts)
+        self.nodes = self._build_nodes()
+
+    def _build_nodes(self):
+        return self._node_codes(self.table.kmers)
+
+    def _node_codes(self, kmers):
+        """Sorted unique oriented (k-1)-mers touched by the given k-mers on either strand."""
+        k = self.kmer_length
+        reverse = reverse_complement_codes(kmers, k)
+        node_mask = np.uint64(kmer_mask(k - 1))
+        two = np.uint64(2)
+        return sorted_unique(np.concatenate((
+            kmers >> two, kmers & node_mask,
+            reverse >> two, reverse & node_mask,
+        )))
+
+    def add_kmers(self, kmers, counts):
+        """
+        Add counts for sorted canonical k-mers, inserting only the k-mers and
+        nodes that are new to the graph.
+
+        Returns:
+            np.ndarray: Counts the k-mers had before, 0 for new k-mers
+        """
+        previous = self.table.update(kmers, counts)
+        candidates = self._node_codes(kmers[previous == 0])
+        index = np.searchsorted(self.nodes, candidates)
+        present = np.zeros(len(candidates), dtype=bool)
+        inside = index < len(self.nodes)
+        present[inside] = self.nodes[index[inside]] == candidates[inside]
+        self.nodes = np.insert(self.nodes, index[~present], candidates[~present])
+        return previous
+
+    def _node_code(self, node):
+        """Packed code of a node, or None when it has non-ACGT bases and so cannot be in the graph."""
+        if isinstance(node, int):
+            return node
+        try:
+            return encode_kmer(node)
+        except ValueError:
+            return None
+
+    def _decode_node(self, code):
+        return decode_kmer(code, self.kmer_length - 1)
+
+    def _kmer_count(self, code):
+        """Count of an oriented packed k-mer (0 when absent)."""
+        return self.table.count_of(canonical_code(code, self.kmer_length))
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        # Each canonical k-mer gives a forward and a reverse complement edge,
+        # except palindromes whose two edges coincide
+        kmers = self.table.kmers
+        palindromes = int(np.count_nonzero(kmers == reverse_complement_codes(kmers, self.kmer_length)))
+        return 2 * len(kmers) - palindromes
+
+    def has_node(self, node):
+        code = self._node_code(node)
+        if code is None:
+            return False
+        code = np.uint64(code)
+        index = np.searchsorted(self.nodes, code)
+        return index < len(self.nodes) and self.nodes[index] == code
+
+    def get_edge_data(self, u, v):
+        """
+        Return the attributes of edge u -> v, or None if it does not exist.
+
+        Mirrors networkx.DiGraph.get_edge_data so callers work with either graph.
+        """
+        u_code = self._node_code(u)
+        v_code = self._node_code(v)
+        if u_code is None or v_code is None:
+            return None
+        if u_code & kmer_mask(self.kmer_length - 2) != v_code >> 2:
+            return None
+        count = self._kmer_count((u_code << 2) | (v_code & 3))
+        return {'count': count} if count else None
+
+    def has_edge(self, u, v):
+        return self.get_edge_data(u, v) is not None
+
+    def successors(self, node):
+        code = self._node_code(node)
+        if code is None:
+            return
+        mask = kmer_mask(self.kmer_length - 1)
+        for base in range(4):
+            if self._kmer_count((code << 2) | base):
+                yield self._decode_node(((code << 2) | base) & mask)
+
+    def predecessors(self, node):
+        code = self._node_code(node)
+        if code is None:
+            return
+        shift = 2 * (self.kmer_length - 1)
+        for base in range(4):
+            if self._kmer_count((base << shift) | code):
+                yield self._decode_node((base << shift | code) >> 2)
+
+    def out_degree_array(self):
+        """Out-degree of every node, parallel to `nodes`."""
+        mask = np.uint64(kmer_mask(self.kmer_length))
+        degrees = np.zeros(len(self.nodes), dtype=np.int64)
+        for base in range(4):
+            extended = ((self.nodes << np.uint64(2)) | np.uint64(base)) & mask
+            degrees += self.table.lookup(canonical_codes_of(extended, self.kmer_length)) > 0
+        return degrees
+
+    def in_degree_array(self):
+        """In-degree of every node, parallel to `nodes`."""
+        shift = np.uint64(2 * (self.kmer_length - 1))
+        degrees = np.zeros(len(self.nodes), dtype=np.int64)
+        for base in range(4):
+            extended = (np.uint64(base) << shift) | self.nodes
+            degrees += self.table.lookup(canonical_codes_of(extended, self.kmer_length)) > 0
+        return degrees
+
+    def out_degree(self, node=None):
+        """Out-degree of one node, or (node, degree) pairs like networkx when no node is given."""
+        if node is not None:
+            return sum(1 for _ in self.successors(node))
+        return zip(map(self._decode_node, self.nodes.tolist()), self.out_degree_array().tolist())
+
+    def in_degree(self, node=None):
+        """In-degree of one node, or (node, degree) pairs like networkx when no node is given."""
+        if node is not None:
+            return sum(1 for _ in self.predecessors(node))
+        return zip(map(self._decode_node, self.nodes.tolist()), self.in_degree_array().tolist())
+
+    def edge_arrays(self):
+        """
+        Return every oriented edge as packed k-mers with counts.
+
+        The first len(table) entries are the canonical k-mers themselves;
+        the rest are their reverse complements, excluding palindromes.
+
+        Returns:
+            tuple: (uint64 oriented k-mers, counts)
+        """
+        kmers = self.table.kmers
+        counts = self.table.counts
+        reverse = reverse_complement_codes(kmers, self.kmer_length)
+        distinct = reverse != kmers
+        return np.concatenate((kmers, reverse[distinct])), np.concatenate((counts, counts[distinct]))
+
+    def edges(self, data=False):
+        """
+        Iterate over oriented edges as (u, v) or (u, v, {'count': c}) tuples.
+
+        Orientation is derived on the fly: each canonical k-mer yields its
+        forward edge and, unless it is a palindrome, its reverse complement edge.
+        """
+        k = self.kmer_length
+        kmers = self.table.kmers
+        counts = self.table.counts
+        # Decode in chunks so that taking the first few edges stays cheap
+        pairs = (
+            pair
+            for start in range(0, len(kmers), EDGE_CHUNK_SIZE)
+            for pair in zip(kmers[start:start + EDGE_CHUNK_SIZE].tolist(),
+                            counts[start:start + EDGE_CHUNK_SIZE].tolist())
+        )
+        for kmer_code, count in pairs:
+            kmer = decode_kmer(kmer_code, k)
+            oriented = [kmer]
+            reverse = kmer.translate(_COMPLEMENT)[::-1]
+            if reverse != kmer:
+                oriented.append(reverse)
+            for edge_kmer in oriented:
+                if data:
+                    yield edge_kmer[:-1], edge_kmer[1:], {'count': count}
+                else:
+                    yield edge_kmer[:-1], edge_kmer[1:]
+
+    def to_networkx(self):
+        """Materialize the graph as a networkx.DiGraph (for small-graph debugging)."""
+        import networkx as nx
+
+        graph = nx.DiGraph()
+        graph.add_nodes_from(map(self._decode_node, self.nodes.tolist()))
+        for u, v, data in self.edges(data=True):
+            graph.add_edge(u, v, count=data['count'])
+        return graph
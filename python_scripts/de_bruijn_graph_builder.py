@@ -1,19 +1,77 @@
-import networkx as nx
-from read_fastq_gz import FastqProcessor
+import heapq
+
+import numpy as np
+from cli_arguments import GRAPH_BACKENDS, add_counting_arguments, add_graph_arguments, add_input_arguments, \
+    add_output_arguments, add_profile_arguments, add_stats_arguments, check_counting_arguments, \
+    check_graph_arguments, check_output_arguments
+from compact_graph import CompactDeBruijnGraph
+from graph_analysis import complement_mask, degree_arrays, degree_histogram, reciprocal_mask, top_edges
+from graph_export import write_kmer_gfa, write_networkx_gfa, write_unitig_fasta, write_unitig_gfa
+from graph_simplification import GraphSimplifier
+from incremental_index import IncrementalKmerIndex
+from kmer_batch import reverse_complement_codes
+from kmer_encoding import decode_kmer, encode_kmer, reverse_complement
+from kmer_index import input_checksum
+from kmer_table import COUNT_DTYPE, KMER_DTYPE, MAX_ARRAY_K
+from profiling import NULL_PROFILER, StageProfiler
+from query_service import print_kmer_analysis
+from read_fastq_gz import DEFAULT_BATCH_SIZE, DEFAULT_MEMORY_BUDGET_MB, FastqProcessor, default_method
+from sample_counts import expand_inputs
+from unitigs import build_unitigs
+
+
+def default_backend(kmer_length):
+    """Graph backend to use when none is requested explicitly."""
+    return 'compact' if 2 <= kmer_length <= MAX_ARRAY_K else 'networkx'
+
+
+def empty_graph(backend, kmer_length):
+    """
+    Create an empty graph of a backend.
+
+    networkx is imported here rather than at module load, so runs on the
+    compact backend never pay for importing it.
+    """
+    if backend == 'compact':
+        return CompactDeBruijnGraph(kmer_length, np.empty(0, dtype=KMER_DTYPE), np.empty(0, dtype=COUNT_DTYPE))
+    import networkx as nx
+    return nx.DiGraph()
 
 
 class DeBruijnGraphBuilder:
-    def __init__(self, reads_file, kmer_length=6):
+    def __init__(self, reads_file, kmer_length=6, workers=1, backend=None,
+                 min_count=1, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, max_memory_mb=None, work_dir=None,
+                 index_path=None, profiler=None, batch_size=DEFAULT_BATCH_SIZE, queue_depth=None, samples=None):
+        backend = backend or default_backend(kmer_length)
+        if backend not in GRAPH_BACKENDS:
+            raise ValueError(f"Unknown graph backend '{backend}', expected one of {GRAPH_BACKENDS}")
         self.reads_file = reads_file
         self.kmer_length = kmer_length
-        self.graph = nx.DiGraph()
+        self.workers = workers
+        self.min_count = min_count
+        self.memory_budget_mb = memory_budget_mb
+        self.max_memory_mb = max_memory_mb
+        self.work_dir = work_dir
+        self.index_path = index_path
+        self.backend = backend
+        self.graph = empty_graph(backend, kmer_length)
         self.kmer_counts = {}
-        
-        # DNA complement mapping
-        self.complement_map = {
-            'A': 'T', 'T': 'A', 'G': 'C', 'C': 'G',
-            'a': 't', 't': 'a', 'g': 'c', 'c': 'g'
-        }
+        self.processor = None
+        # Set once the graph has been built from canonical k-mer records,
+        # which guarantees every edge has its reverse complement
+        self.bidirected_by_construction = False
+        # Compacted graph of maximal non-branching paths, built by compact()
+        self.unitig_graph = None
+        # Unfiltered counts of every input added through add_reads()
+        self.incremental_index = None
+        # Stage timings and throughput; a no-op unless profiling is on
+        self.profiler = profiler or NULL_PROFILER
+        # Reads per counting batch, and the queue depth of the threaded
+        # ingestion pipeline (None reads and counts in sequence)
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth
+        # Sample name -> files, to keep per-sample count columns (see sample_counts)
+        self.samples = samples
     
     def get_reverse_complement(self, sequence):
         """
@@ -25,10 +83,7 @@ class DeBruijnGraphBuilder:
         Returns:
             str: Reverse complement sequence
         """
-        # First reverse the sequence, then complement each base
-        reversed_seq = sequence[::-1]
-        complement = ''.join(self.complement_map.get(base, base) for base in reversed_seq)
-        return complement
+        return reverse_complement(sequence)
     
     def get_canonical_kmer(self, kmer):
         """
@@ -44,8 +99,34 @@ class DeBruijnGraphBuilder:
         return min(kmer, reverse_complement)
     
     def build_graph_from_kmers(self):
-        processor = FastqProcessor(self.reads_file, self.kmer_length)
+        method = default_method(self.kmer_length, self.workers, self.min_count, self.max_memory_mb)
+        if self.samples is not None:
+            method = 'numpy'
+        processor = FastqProcessor(self.reads_file, self.kmer_length, method=method,
+                                   batch_size=self.batch_size, workers=self.workers, min_count=self.min_count,
+                                   memory_budget_mb=self.memory_budget_mb,
+                                   max_memory_mb=self.max_memory_mb, work_dir=self.work_dir,
+                                   index_path=self.index_path, profiler=self.profiler,
+                                   queue_depth=self.queue_depth, samples=self.samples)
         processor.process_fastq()
+        # Keeps a disk-backed count table (and its scratch directory) alive
+        self.processor = processor
+        with self.profiler.stage('graph'):
+            self._build_graph(processor)
+    
+    def _build_graph(self, processor):
+        if self.backend == 'compact':
+            kmers, counts = processor.get_count_arrays()
+            print(f"Building compact bidirected de Bruijn graph from {len(kmers)} k-mers...")
+            print("Edges of both strands are derived from the canonical k-mer count table...")
+            self.graph = CompactDeBruijnGraph(self.kmer_length, kmers, counts)
+            self.bidirected_by_construction = True
+            return
+
+        if processor.external_table is not None or processor.kmer_index is not None:
+            self._add_count_buckets(processor)
+            return
+
         self.kmer_counts = processor.get_kmer_counts()
 
         kmer_count_len = len(self.kmer_counts)
@@ -53,49 +134,159 @@ class DeBruijnGraphBuilder:
         print(f"Building bidirected de Bruijn graph from {kmer_count_len} k-mers...")
         print("Including both canonical and reverse complement edges for DNA bidirectionality...")
         
-        # Process each k-mer and its reverse complement
+        # The counts are keyed by canonical k-mer, so each k-mer is one
+        # record that yields its forward edge and its reverse complement edge
         for kmer, count in self.kmer_counts.items():
-            # Get the canonical form of the k-mer
-            canonical_kmer = self.get_canonical_kmer(kmer)
-            
-            # Get reverse complement of the k-mer
-            reverse_complement_kmer = self.get_reverse_complement(kmer)
-            
-            # Process canonical k-mer edges
-            self._add_kmer_edges(canonical_kmer, count)
-            
-            # Process reverse complement k-mer edges
-            self._add_kmer_edges(reverse_complement_kmer, count)
+            self._add_kmer_edges(kmer, count)
+        self.bidirected_by_construction = True
+    
+    def _add_count_buckets(self, processor):
+        """
+        Add edges from a disk-backed count table one bucket at a time, so
+        only one bucket of packed k-mers is decoded at once.
+        """
+        print(f"Building bidirected de Bruijn graph from {len(processor.count_table)} k-mers on disk...")
+        for kmers, counts in processor.iter_count_buckets():
+            for code, count in zip(kmers.tolist(), counts.tolist()):
+                kmer = decode_kmer(code, self.kmer_length)
+                self.kmer_counts[kmer] = count
+                self._add_kmer_edges(kmer, count)
+        self.bidirected_by_construction = True
     
     def _add_kmer_edges(self, kmer, count):
         """
-        Add edges for a k-mer to the graph.
+        Add the two strand orientations of a canonical k-mer to the graph.
+        
+        Every oriented edge belongs to exactly one canonical k-mer, so each
+        edge is written once and needs no existing-edge lookup.
         
         Args:
-            kmer (str): DNA k-mer
+            kmer (str): Canonical DNA k-mer
             count (int): Count of this k-mer
         """
-        prefix = kmer[:-1]
-        suffix = kmer[1:]
-        
         # Add the forward edge (prefix -> suffix)
-        if self.graph.has_edge(prefix, suffix):
-            current_count = self.graph[prefix][suffix]['count']
-            self.graph[prefix][suffix]['count'] = current_count + count
-        else:
-            self.graph.add_edge(prefix, suffix, count=count)
+        self.graph.add_edge(kmer[:-1], kmer[1:], count=count)
+        
+        # The reverse complement of prefix -> suffix is (reverse_complement of suffix) -> (reverse_complement of prefix),
+        # which is just the edge of the reverse complement k-mer
+        rev_comp_kmer = self.get_reverse_complement(kmer)
+        if rev_comp_kmer != kmer:
+            self.graph.add_edge(rev_comp_kmer[:-1], rev_comp_kmer[1:], count=count)
+    
+    def add_reads(self, reads_files):
+        """
+        Add FASTQ files to the incremental k-mer index and update the graph.
         
-        # For bidirected DNA, we also need to consider the reverse complement edge
-        # The reverse complement of prefix -> suffix is (reverse_complement of suffix) -> (reverse_complement of prefix)
-        rev_comp_suffix = self.get_reverse_complement(suffix)
-        rev_comp_prefix = self.get_reverse_complement(prefix)
+        The index at index_path holds the unfiltered counts of every file
+        added so far; the first call loads it (or starts an empty one) and
+        builds the graph from its k-mers that reach min_count, replacing any
+        graph built by build_graph_from_kmers. Only the new files are then
+        counted. Their counts are merged into the index in place, and only
+        k-mers that are new or that reach min_count create graph nodes and
+        edges, so an update costs time in proportion to the new data.
+        Files already recorded in the index are skipped.
         
-        # Add the reverse complement edge
-        if self.graph.has_edge(rev_comp_suffix, rev_comp_prefix):
-            current_count = self.graph[rev_comp_suffix][rev_comp_prefix]['count']
-            self.graph[rev_comp_suffix][rev_comp_prefix]['count'] = current_count + count
+        Args:
+            reads_files (list): FASTQ files to add
+            
+        Returns:
+            list: CountDelta of every file that was added
+        """
+        if self.index_path is None:
+            raise ValueError("Incremental ingestion requires an index path")
+        if self.kmer_length > MAX_ARRAY_K:
+            raise ValueError(f"Incremental ingestion supports k <= {MAX_ARRAY_K}")
+        if self.incremental_index is None:
+            with self.profiler.stage('graph'):
+                self._load_incremental_index()
+        
+        deltas = []
+        for reads_file in reads_files:
+            digest = input_checksum(reads_file)
+            if self.incremental_index.has_input(digest):
+                print(f"Skipping {reads_file}: already counted in {self.index_path}")
+                continue
+            processor = FastqProcessor(reads_file, self.kmer_length, method='numpy', batch_size=self.batch_size,
+                                       workers=self.workers, max_memory_mb=self.max_memory_mb,
+                                       work_dir=self.work_dir, profiler=self.profiler,
+                                       queue_depth=self.queue_depth)
+            processor.process_fastq()
+            kmers, counts = processor.get_count_arrays()
+            with self.profiler.stage('merge'):
+                delta = self.incremental_index.add(kmers, counts, digest, reads_file, self.min_count)
+            nodes_before = self.graph.number_of_nodes()
+            with self.profiler.stage('graph'):
+                self._apply_count_delta(delta)
+            self.print_count_delta(reads_file, delta, self.graph.number_of_nodes() - nodes_before)
+            deltas.append(delta)
+        
+        if deltas:
+            with self.profiler.stage('index'):
+                self.incremental_index.save()
+            # Unitigs of the previous graph no longer match it
+            self.unitig_graph = None
+        return deltas
+    
+    def _load_incremental_index(self):
+        index = IncrementalKmerIndex(self.index_path, self.kmer_length)
+        self.incremental_index = index
+        print(f"Loaded {len(index)} k-mers from {len(index.inputs)} input(s) in {self.index_path}")
+        kmers, counts = index.solid_arrays(self.min_count)
+        if self.backend == 'compact':
+            self.graph = CompactDeBruijnGraph(self.kmer_length, kmers, counts)
         else:
-            self.graph.add_edge(rev_comp_suffix, rev_comp_prefix, count=count)
+            self.graph = empty_graph(self.backend, self.kmer_length)
+            self.kmer_counts = {}
+            for code, count in zip(kmers.tolist(), counts.tolist()):
+                kmer = decode_kmer(code, self.kmer_length)
+                self.kmer_counts[kmer] = count
+                self._add_kmer_edges(kmer, count)
+        self.bidirected_by_construction = True
+    
+    def _apply_count_delta(self, delta):
+        """Update the graph with the k-mers of one added input that are at or above min_count."""
+        if isinstance(self.graph, CompactDeBruijnGraph):
+            self.graph.add_kmers(*delta.solid_increments())
+            return
+        solid = delta.total >= self.min_count
+        for code, count in zip(delta.kmers[solid].tolist(), delta.total[solid].tolist()):
+            kmer = decode_kmer(code, self.kmer_length)
+            self.kmer_counts[kmer] = count
+            # Re-adding an existing edge only updates its count
+            self._add_kmer_edges(kmer, count)
+    
+    def print_count_delta(self, reads_file, delta, new_nodes):
+        summary = delta.summary()
+        crossed = delta.crossed_kmers
+        palindromes = int(np.count_nonzero(crossed == reverse_complement_codes(crossed, self.kmer_length)))
+        print(f"\n=== Added {reads_file} ===")
+        print(f"  K-mer occurrences: {summary['kmer_occurrences']}")
+        print(f"  Distinct k-mers: {summary['distinct_kmers']}")
+        print(f"  New k-mers: {summary['new_kmers']}")
+        print(f"  K-mers reaching min count {self.min_count}: {summary['crossed_threshold']}")
+        print(f"  Graph: +{new_nodes} nodes, +{2 * len(crossed) - palindromes} edges")
+    
+    def _edge_arrays(self):
+        """
+        Return the oriented edges as packed edge k-mers (u + v[-1]) with counts.
+        
+        Returns:
+            tuple: (uint64 edge k-mers, counts), or None when k is too large
+            to pack (networkx backend with k > 32)
+        """
+        if isinstance(self.graph, CompactDeBruijnGraph):
+            return self.graph.edge_arrays()
+        if self.kmer_length > MAX_ARRAY_K:
+            return None
+        size = self.graph.number_of_edges()
+        edges = list(self.graph.edges(data='count'))
+        kmers = np.fromiter((encode_kmer(u + v[-1]) for u, v, _ in edges), dtype=KMER_DTYPE, count=size)
+        counts = np.fromiter((count for _, _, count in edges), dtype=COUNT_DTYPE, count=size)
+        return kmers, counts
+    
+    def _decode_edge(self, code):
+        kmer = decode_kmer(code, self.kmer_length)
+        return kmer[:-1], kmer[1:]
     
     def print_graph_stats(self):
         print("\n=== Bidirected De Bruijn Graph Statistics ===")
@@ -111,47 +302,92 @@ class DeBruijnGraphBuilder:
             else:
                 break
         
-        in_degrees = dict(self.graph.in_degree())
-        out_degrees = dict(self.graph.out_degree())
+        edges = self._edge_arrays()
+        if edges is None:
+            in_degrees = np.fromiter((degree for _, degree in self.graph.in_degree()), dtype=np.int64)
+            out_degrees = np.fromiter((degree for _, degree in self.graph.out_degree()), dtype=np.int64)
+            bidirectional_edges = sum(1 for u, v in self.graph.edges() if self.graph.has_edge(v, u))
+        else:
+            edge_kmers = edges[0]
+            nodes = self.graph.nodes if isinstance(self.graph, CompactDeBruijnGraph) else None
+            _, in_degrees, out_degrees = degree_arrays(edge_kmers, self.kmer_length, nodes)
+            bidirectional_edges = int(np.count_nonzero(reciprocal_mask(edge_kmers, self.kmer_length)))
         
         print(f"\nNode degree analysis:")
-        print(f"  Average in-degree: {sum(in_degrees.values()) / len(in_degrees):.2f}")
-        print(f"  Average out-degree: {sum(out_degrees.values()) / len(out_degrees):.2f}")
+        if len(in_degrees):
+            print(f"  Average in-degree: {in_degrees.mean():.2f}")
+            print(f"  Average out-degree: {out_degrees.mean():.2f}")
         
-        max_in_degree = max(in_degrees.values()) if in_degrees else 0
-        max_out_degree = max(out_degrees.values()) if out_degrees else 0
+        max_in_degree = int(in_degrees.max()) if len(in_degrees) else 0
+        max_out_degree = int(out_degrees.max()) if len(out_degrees) else 0
         
         print(f"  Max in-degree: {max_in_degree}")
         print(f"  Max out-degree: {max_out_degree}")
+        for label, degrees in (("In", in_degrees), ("Out", out_degrees)):
+            histogram = degree_histogram(degrees)
+            print(f"  {label}-degree histogram: " + ", ".join(
+                f"{degree}: {nodes}" for degree, nodes in enumerate(histogram.tolist()) if nodes))
         
         # Show bidirected nature
+        total_edges = self.graph.number_of_edges()
         print(f"\nBidirected DNA Analysis:")
-        bidirectional_edges = 0
-        for u, v, data in self.graph.edges(data=True):
-            if self.graph.has_edge(v, u):
-                bidirectional_edges += 1
-        
         print(f"  Bidirectional edge pairs: {bidirectional_edges // 2}")
-        print(f"  Total edges: {self.graph.number_of_edges()}")
-        print(f"  Bidirectionality ratio: {bidirectional_edges / self.graph.number_of_edges():.2f}")
+        print(f"  Total edges: {total_edges}")
+        if total_edges:
+            print(f"  Bidirectionality ratio: {bidirectional_edges / total_edges:.2f}")
     
-    def get_high_weight_edges(self, threshold=10):
-        high_weight_edges = []
-        for u, v, data in self.graph.edges(data=True):
-            if data['count'] >= threshold:
-                high_weight_edges.append((u, v, data['count']))
+    def _high_weight_edges(self, threshold, limit):
+        """Return up to `limit` heaviest edges with count >= threshold, and how many there are."""
+        edges = self._edge_arrays()
+        if edges is None:
+            weighted = [(u, v, count) for u, v, count in self.graph.edges(data='count') if count >= threshold]
+            if limit is None:
+                return sorted(weighted, key=lambda x: x[2], reverse=True), len(weighted)
+            return heapq.nlargest(limit, weighted, key=lambda x: x[2]), len(weighted)
+        edge_kmers, counts = edges
+        selected, total = top_edges(counts, threshold, limit)
+        heaviest = [
+            (*self._decode_edge(code), count)
+            for code, count in zip(edge_kmers[selected].tolist(), counts[selected].tolist())
+        ]
+        return heaviest, total
+    
+    def get_high_weight_edges(self, threshold=10, limit=None):
+        """
+        Edges with count >= threshold, heaviest first.
         
-        return sorted(high_weight_edges, key=lambda x: x[2], reverse=True)
+        Args:
+            threshold (int): Minimum edge count
+            limit (int): Return only this many of the heaviest edges
+            
+        Returns:
+            list: (u, v, count) tuples
+        """
+        return self._high_weight_edges(threshold, limit)[0]
     
     def print_high_weight_edges(self, threshold=10, max_show=20):
-        high_weight_edges = self.get_high_weight_edges(threshold)
+        high_weight_edges, total = self._high_weight_edges(threshold, max_show)
         
         print(f"\n=== High Weight Edges (count >= {threshold}) ===")
-        for i, (u, v, count) in enumerate(high_weight_edges[:max_show]):
+        for i, (u, v, count) in enumerate(high_weight_edges):
             print(f"  {i+1}. {u} -> {v} (count: {count})")
         
-        if len(high_weight_edges) > max_show:
-            print(f"  ... and {len(high_weight_edges) - max_show} more edges")
+        if total > max_show:
+            print(f"  ... and {total - max_show} more edges")
+    
+    def _complement_pairs(self):
+        """
+        Pair every edge with its reverse complement edge in one sorted join.
+        
+        Returns:
+            tuple: (edge k-mers, counts, mask of edges whose complement exists),
+            or None when edges cannot be packed
+        """
+        edges = self._edge_arrays()
+        if edges is None:
+            return None
+        edge_kmers, counts = edges
+        return edge_kmers, counts, complement_mask(edge_kmers, self.kmer_length)
     
     def demonstrate_bidirected_nature(self, max_examples=5):
         """
@@ -161,53 +397,79 @@ class DeBruijnGraphBuilder:
         print(f"\n=== Bidirected DNA Demonstration ===")
         print("Showing reverse complement edge pairs:")
         
-        examples_shown = 0
+        pairs = self._complement_pairs()
+        if pairs is None:
+            examples = self._complement_examples_slow(max_examples)
+        else:
+            edge_kmers, counts, paired = pairs
+            shown = np.flatnonzero(paired)[:max_examples]
+            reverse = reverse_complement_codes(edge_kmers[shown], self.kmer_length)
+            # Palindromic edges pair with themselves; others share the k-mer's count
+            examples = [
+                (*self._decode_edge(code), count, *self._decode_edge(rev_code), count)
+                for code, rev_code, count in zip(edge_kmers[shown].tolist(), reverse.tolist(), counts[shown].tolist())
+            ]
+        for u, v, count, rev_comp_v, rev_comp_u, rev_count in examples:
+            print(f"  Forward:  {u} -> {v} (count: {count})")
+            print(f"  Reverse:  {rev_comp_v} -> {rev_comp_u} (count: {rev_count})")
+            print(f"  Note: {rev_comp_v} is reverse complement of {u}")
+            print(f"        {rev_comp_u} is reverse complement of {v}")
+            print()
+    
+    def _complement_examples_slow(self, max_examples):
+        examples = []
         for u, v, data in self.graph.edges(data=True):
-            if examples_shown >= max_examples:
+            if len(examples) >= max_examples:
                 break
-                
-            # Get reverse complement of the edge
             rev_comp_u = self.get_reverse_complement(u)
             rev_comp_v = self.get_reverse_complement(v)
-            
-            # Check if the reverse complement edge exists
             if self.graph.has_edge(rev_comp_v, rev_comp_u):
-                rev_data = self.graph[rev_comp_v][rev_comp_u]
-                print(f"  Forward:  {u} -> {v} (count: {data['count']})")
-                print(f"  Reverse:  {rev_comp_v} -> {rev_comp_u} (count: {rev_data['count']})")
-                print(f"  Note: {rev_comp_v} is reverse complement of {u}")
-                print(f"        {rev_comp_u} is reverse complement of {v}")
-                print()
-                examples_shown += 1
-    
-    def validate_bidirected_structure(self):
+                rev_data = self.graph.get_edge_data(rev_comp_v, rev_comp_u)
+                examples.append((u, v, data['count'], rev_comp_v, rev_comp_u, rev_data['count']))
+        return examples
+    
+    def validate_bidirected_structure(self, full_scan=False):
         """
         Validate that the graph properly represents bidirected DNA structure.
         Returns True if the graph is properly bidirected.
+        
+        Graphs built from canonical k-mer records are bidirected by
+        construction; pass full_scan=True to check every edge anyway.
         """
         print(f"\n=== Validating Bidirected Structure ===")
         
         total_edges = self.graph.number_of_edges()
-        bidirectional_pairs = 0
-        missing_complements = 0
         
-        for u, v, data in self.graph.edges(data=True):
-            # Get reverse complement of the edge
-            rev_comp_u = self.get_reverse_complement(u)
-            rev_comp_v = self.get_reverse_complement(v)
-            
-            if self.graph.has_edge(rev_comp_v, rev_comp_u):
-                bidirectional_pairs += 1
-            else:
-                missing_complements += 1
-                print(f"  Missing reverse complement: {rev_comp_v} -> {rev_comp_u}")
+        if self.bidirected_by_construction and not full_scan:
+            print(f"  Total edges: {total_edges}")
+            print("  Edges are derived from canonical k-mer records, so every reverse complement is present")
+            print(f"  Graph is properly bidirected: True")
+            return True
+        
+        pairs = self._complement_pairs()
+        if pairs is None:
+            missing = []
+            for u, v in self.graph.edges():
+                rev_comp_u = self.get_reverse_complement(u)
+                rev_comp_v = self.get_reverse_complement(v)
+                if not self.graph.has_edge(rev_comp_v, rev_comp_u):
+                    missing.append((rev_comp_v, rev_comp_u))
+            bidirectional_pairs = total_edges - len(missing)
+        else:
+            edge_kmers, _, paired = pairs
+            bidirectional_pairs = int(np.count_nonzero(paired))
+            unpaired = reverse_complement_codes(edge_kmers[~paired], self.kmer_length)
+            missing = [self._decode_edge(code) for code in unpaired.tolist()]
+        
+        for rev_comp_v, rev_comp_u in missing:
+            print(f"  Missing reverse complement: {rev_comp_v} -> {rev_comp_u}")
         
         print(f"  Total edges: {total_edges}")
         print(f"  Bidirectional pairs: {bidirectional_pairs // 2}")
-        print(f"  Missing complements: {missing_complements}")
+        print(f"  Missing complements: {len(missing)}")
         
         # Each edge should have a reverse complement (except self-complementary edges)
-        is_valid = missing_complements == 0
+        is_valid = not missing
         print(f"  Graph is properly bidirected: {is_valid}")
         
         return is_valid
@@ -219,44 +481,116 @@ class DeBruijnGraphBuilder:
         Args:
             kmer (str): DNA k-mer to analyze
         """
-        print(f"\n=== Reverse Complement Analysis for '{kmer}' ===")
-        
-        rev_comp = self.get_reverse_complement(kmer)
-        canonical = self.get_canonical_kmer(kmer)
-        
-        print(f"  Original k-mer: {kmer}")
-        print(f"  Reverse complement: {rev_comp}")
-        print(f"  Canonical form: {canonical}")
-        
-        if kmer == rev_comp:
-            print(f"  Self-complementary: Yes")
-        else:
-            print(f"  Self-complementary: No")
-        
-        # Show the edges that would be created
         prefix = kmer[:-1]
         suffix = kmer[1:]
         rev_prefix = self.get_reverse_complement(prefix)
         rev_suffix = self.get_reverse_complement(suffix)
+        counts = []
+        for source, target in ((prefix, suffix), (rev_suffix, rev_prefix)):
+            counts.append(self.graph.get_edge_data(source, target)['count']
+                          if self.graph.has_edge(source, target) else 0)
+        print_kmer_analysis(kmer, *counts)
+    
+    def compact(self):
+        """
+        Compact the graph into unitigs (maximal non-branching paths).
         
-        print(f"  Forward edge: {prefix} -> {suffix}")
-        print(f"  Reverse complement edge: {rev_suffix} -> {rev_prefix}")
+        Runs in time linear in the number of k-mers and follows both strand
+        orientations. With several workers the k-mers are partitioned by
+        minimizer and the partitions are walked in parallel (see
+        partitioned_unitigs). Requires the compact backend.
         
-        # Check if these edges exist in the graph
-        if self.graph.has_edge(prefix, suffix):
-            print(f"  Forward edge exists in graph: Yes (count: {self.graph[prefix][suffix]['count']})")
+        Returns:
+            UnitigGraph: Unitigs with packed sequences, coverage and links
+        """
+        if not isinstance(self.graph, CompactDeBruijnGraph):
+            raise ValueError("Unitig compaction requires the compact graph backend (k <= 32)")
+        print(f"Compacting {self.graph.number_of_nodes()} nodes into unitigs...")
+        if self.workers > 1:
+            # Process pools are only loaded when compaction runs in parallel
+            from partitioned_unitigs import build_unitigs_partitioned
+            self.unitig_graph = build_unitigs_partitioned(self.graph.table, self.workers)
         else:
-            print(f"  Forward edge exists in graph: No")
-            
-        if self.graph.has_edge(rev_suffix, rev_prefix):
-            print(f"  Reverse edge exists in graph: Yes (count: {self.graph[rev_suffix][rev_prefix]['count']})")
+            self.unitig_graph = build_unitigs(self.graph.table)
+        return self.unitig_graph
+    
+    def simplify(self, max_tip_length=None, min_tip_coverage=0, max_bubble_length=None):
+        """
+        Clip tips and pop bubbles in the unitig graph, compacting first if
+        needed (see graph_simplification).
+        
+        Args:
+            max_tip_length (int): Clip dead ends shorter than this many bases (default 2k)
+            min_tip_coverage (float): Also clip dead ends with a lower mean coverage
+            max_bubble_length (int): Longest bubble branch to pop, in bases (default 3k)
+        
+        Returns:
+            UnitigGraph: Simplified unitig graph, which replaces the compacted one
+        """
+        if self.unitig_graph is None:
+            self.compact()
+        unitig_count = len(self.unitig_graph)
+        simplifier = GraphSimplifier(self.unitig_graph, self.graph.table.kmers, max_tip_length,
+                                     min_tip_coverage, max_bubble_length)
+        tips, bubbles = simplifier.simplify()
+        self.unitig_graph = simplifier.to_unitig_graph()
+        print(f"Simplified unitig graph: clipped {tips} tips, popped {bubbles} bubble branches, "
+              f"removed {simplifier.unitigs_removed} unitigs")
+        print(f"  Unitigs: {unitig_count} -> {len(self.unitig_graph)}")
+        return self.unitig_graph
+    
+    def print_unitig_stats(self, max_show=5):
+        unitig_graph = self.unitig_graph
+        print("\n=== Compacted De Bruijn Graph (Unitigs) ===")
+        print(f"Number of unitigs: {len(unitig_graph)}")
+        print(f"Number of links: {unitig_graph.number_of_links()}")
+        if not len(unitig_graph):
+            return
+        lengths = unitig_graph.length_array()
+        coverage = unitig_graph.coverage_array()
+        print(f"  Node reduction: {self.graph.number_of_nodes()} -> {len(unitig_graph)}")
+        print(f"  Total length: {int(lengths.sum())} bp")
+        print(f"  Longest unitig: {int(lengths.max())} bp")
+        print(f"  N50: {unitig_graph.n50()} bp")
+        print(f"  Mean k-mer coverage: {float(coverage.mean()):.2f}")
+        
+        print("\nLongest unitigs:")
+        for unitig in np.argsort(lengths)[::-1][:max_show].tolist():
+            sequence = unitig_graph.sequence(unitig)
+            shown = sequence if len(sequence) <= 60 else sequence[:57] + '...'
+            print(f"  {unitig}: {shown} (length: {lengths[unitig]}, mean coverage: {coverage[unitig]:.2f})")
+    
+    def write_gfa(self, path):
+        """
+        Stream the graph to a GFA file (gzip-compressed if path ends in '.gz').
+        
+        Writes the unitig graph when compact() has been run, otherwise one
+        segment per canonical k-mer, on either backend.
+        """
+        if self.unitig_graph is not None:
+            write_unitig_gfa(self.unitig_graph, path)
+        elif isinstance(self.graph, CompactDeBruijnGraph):
+            write_kmer_gfa(self.graph, path)
         else:
-            print(f"  Reverse edge exists in graph: No")
+            write_networkx_gfa(self.graph, self.kmer_length, path)
+        print(f"Wrote GFA graph to {path}")
+    
+    def write_unitig_fasta(self, path):
+        """Write the unitig sequences as FASTA, compacting the graph first if needed."""
+        if self.unitig_graph is None:
+            self.compact()
+        write_unitig_fasta(self.unitig_graph, path)
+        print(f"Wrote {len(self.unitig_graph)} unitigs to {path}")
+    
+    def get_unitig_graph(self):
+        return self.unitig_graph
     
     def get_graph(self):
         return self.graph
     
     def get_kmer_counts(self):
+        if isinstance(self.graph, CompactDeBruijnGraph):
+            return self.graph.table.to_dict()
         return self.kmer_counts
 
 
@@ -264,29 +598,63 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description="Build bidirected de Bruijn graph from FASTQ reads")
-    parser.add_argument('--reads', type=str, required=True, help="Input FASTQ file")
-    parser.add_argument('--kmer', type=int, default=6, help="K-mer length")
-    parser.add_argument('--threshold', type=int, default=10, help="Threshold for high-weight edges")
+    add_input_arguments(parser, samples=False)
+    add_counting_arguments(parser)
+    add_graph_arguments(parser)
+    add_output_arguments(parser)
+    add_stats_arguments(parser)
     parser.add_argument('--analyze-kmer', type=str, help="Analyze a specific k-mer and its reverse complement")
-    parser.add_argument('--validate', action='store_true', help="Validate bidirected structure")
-    parser.add_argument('--demonstrate', action='store_true', help="Demonstrate bidirected nature")
+    add_profile_arguments(parser)
     args = parser.parse_args()
+    check_graph_arguments(parser, args)
+    if not args.reads and not args.add_reads:
+        parser.error("one of --reads or --add-reads is required")
+    check_counting_arguments(parser, args)
+    check_output_arguments(parser, args)
+    
+    profiler = StageProfiler(args.progress_interval) if args.profile else NULL_PROFILER
+    reads_files = expand_inputs(args.reads) if args.reads else []
+    reads = reads_files[0] if len(reads_files) == 1 else reads_files or None
+    builder = DeBruijnGraphBuilder(reads, args.kmer, args.workers, args.backend,
+                                   args.min_count, args.memory_budget, args.max_memory, args.tmp_dir,
+                                   args.index, profiler, args.batch_size, args.pipeline)
     
-    builder = DeBruijnGraphBuilder(args.reads, args.kmer)
+    if args.add_reads:
+        reads_files += expand_inputs(args.add_reads)
+        print(f"Adding {len(reads_files)} file(s) to {args.index} with k-mer length {args.kmer}")
+        builder.add_reads(reads_files)
+    else:
+        print(f"Processing {', '.join(reads_files)} with k-mer length {args.kmer}")
+        print("Building bidirected de Bruijn graph with reverse complement handling...")
+        builder.build_graph_from_kmers()
     
-    print(f"Processing {args.reads} with k-mer length {args.kmer}")
-    print("Building bidirected de Bruijn graph with reverse complement handling...")
-    builder.build_graph_from_kmers()
+    with profiler.stage('stats'):
+        builder.print_graph_stats()
     
-    builder.print_graph_stats()
+    if args.compact or args.simplify:
+        with profiler.stage('compact'):
+            builder.compact()
+        if args.simplify:
+            with profiler.stage('simplify'):
+                builder.simplify(args.tip_length, args.tip_coverage, args.bubble_length)
+        builder.print_unitig_stats()
+    
+    with profiler.stage('export'):
+        if args.unitig_fasta:
+            builder.write_unitig_fasta(args.unitig_fasta)
+        
+        if args.gfa:
+            builder.write_gfa(args.gfa)
     
     # Demonstrate bidirected nature if requested
     if args.demonstrate:
-        builder.demonstrate_bidirected_nature()
+        with profiler.stage('stats'):
+            builder.demonstrate_bidirected_nature()
     
     # Validate bidirected structure if requested
     if args.validate:
-        builder.validate_bidirected_structure()
+        with profiler.stage('validate'):
+            builder.validate_bidirected_structure()
     
     # Analyze specific k-mer if provided
     if args.analyze_kmer:
@@ -295,7 +663,8 @@ def main():
         else:
             print(f"Error: K-mer length must be {args.kmer}, but '{args.analyze_kmer}' has length {len(args.analyze_kmer)}")
     
-    builder.print_high_weight_edges(args.threshold)
+    with profiler.stage('stats'):
+        builder.print_high_weight_edges(args.threshold)
     
     print(f"\n=== Journal Entry: Bidirected DNA Implementation ===")
     print("""
@@ -325,6 +694,9 @@ def main():
    - Essential for proper genome assembly
    - Handles the natural bidirectionality of DNA replication and transcription
     """)
+    
+    if args.profile:
+        profiler.write_summary(args.profile)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,257 @@
+"""
+External-memory k-mer counting for inputs larger than RAM.
+
+Counting runs in two phases:
+
+1. Partition: canonical packed k-mers are streamed into bucket files by
+   their leading bases, through per-bucket write buffers whose total size
+   is bounded by the memory budget.
+2. Count: each bucket file is sorted and reduced in chunks that fit the
+   memory budget, each chunk written out as a sorted run file, and the
+   runs are merged block by block into the bucket's sorted counts,
+   optionally one bucket per worker of a process pool.
+
+Since no bucket is ever held whole, buckets may be as large or as skewed
+as the prefixes make them. Because they are split by prefix, writing the
+bucket results one after another gives a globally sorted on-disk count
+table. The table is stored as
+raw uint64 k-mers, int64 counts and bucket offsets, and is read back through
+memory maps, so consumers can take it whole or one bucket at a time.
+"""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from kmer_batch import batch_canonical_codes
+from kmer_table import COUNT_DTYPE, KMER_DTYPE, reduce_codes, reduce_counts
+
+
+DEFAULT_MAX_MEMORY_MB = 1024
+DEFAULT_PREFIX_BASES = 4
+
+TABLE_PREFIX = 'kmer_counts'
+KMERS_SUFFIX = '.kmers'
+COUNTS_SUFFIX = '.counts'
+OFFSETS_SUFFIX = '.offsets'
+
+# Rough bytes of working memory per k-mer while sorting a bucket chunk
+# (codes, sort buffers and the reduced output)
+BYTES_PER_SORTED_KMER = 32
+
+
+def bucket_path(work_dir, bucket):
+    return os.path.join(work_dir, f"bucket_{bucket:05d}.raw")
+
+
+def _map_file(path, dtype):
+    if not os.path.getsize(path):
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+def write_sorted_runs(raw, chunk_size, run_prefix):
+    """
+    Sort and reduce raw k-mers in chunks, writing each chunk as a run.
+
+    Returns:
+        list: Path prefixes of the run files, each holding sorted unique
+        k-mers and their counts
+    """
+    runs = []
+    for start in range(0, len(raw), chunk_size):
+        kmers, counts = reduce_codes(np.asarray(raw[start:start + chunk_size]))
+        run = f"{run_prefix}.run{len(runs)}"
+        kmers.tofile(run + KMERS_SUFFIX)
+        counts.tofile(run + COUNTS_SUFFIX)
+        runs.append(run)
+    return runs
+
+
+def merge_runs(runs, block_size, kmers_file, counts_file, min_count=1):
+    """
+    K-way merge sorted run files, holding about block_size k-mers at a time.
+
+    Each step loads the next block of every run. K-mers up to the smallest
+    last k-mer of the blocks cannot appear later in any run, so that part
+    of the blocks is reduced and written; the run whose block ended there
+    moves on to its next block.
+
+    Returns:
+        int: Number of k-mers written
+    """
+    sources = [(_map_file(run + KMERS_SUFFIX, KMER_DTYPE), _map_file(run + COUNTS_SUFFIX, COUNT_DTYPE))
+               for run in runs]
+    positions = [0] * len(sources)
+    block = max(block_size // max(len(sources), 1), 1)
+    written = 0
+    while True:
+        active = [i for i, (kmers, _) in enumerate(sources) if positions[i] < len(kmers)]
+        if not active:
+            break
+        cutoff = min(sources[i][0][min(positions[i] + block, len(sources[i][0])) - 1] for i in active)
+        kmer_parts, count_parts = [], []
+        for i in active:
+            kmers, counts = sources[i]
+            start = positions[i]
+            block_kmers = np.asarray(kmers[start:start + block])
+            end = start + int(np.searchsorted(block_kmers, cutoff, side='right'))
+            kmer_parts.append(block_kmers[:end - start])
+            count_parts.append(np.asarray(counts[start:end]))
+            positions[i] = end
+        kmers, counts = reduce_counts(np.concatenate(kmer_parts), np.concatenate(count_parts))
+        if min_count > 1:
+            keep = counts >= min_count
+            kmers, counts = kmers[keep], counts[keep]
+        kmers.tofile(kmers_file)
+        counts.tofile(counts_file)
+        written += len(kmers)
+    del sources
+    return written
+
+
+def count_bucket_file(path, chunk_size, output_prefix, min_count=1):
+    """
+    Count one bucket file into sorted k-mer and count files, holding at
+    most about chunk_size k-mers in memory.
+
+    Args:
+        path (str): Raw bucket file of packed canonical k-mers
+        chunk_size (int): K-mers sorted at once
+        output_prefix (str): Path prefix of the output files
+        min_count (int): Drop k-mers seen fewer times
+
+    Returns:
+        int: Number of distinct k-mers written
+    """
+    raw = _map_file(path, KMER_DTYPE)
+    runs = write_sorted_runs(raw, chunk_size, output_prefix)
+    del raw
+    if len(runs) == 1 and min_count == 1:
+        # A single run is already the bucket's counts
+        os.replace(runs[0] + KMERS_SUFFIX, output_prefix + KMERS_SUFFIX)
+        os.replace(runs[0] + COUNTS_SUFFIX, output_prefix + COUNTS_SUFFIX)
+        return os.path.getsize(output_prefix + KMERS_SUFFIX) // np.dtype(KMER_DTYPE).itemsize
+    with open(output_prefix + KMERS_SUFFIX, 'wb') as kmers_file, \
+            open(output_prefix + COUNTS_SUFFIX, 'wb') as counts_file:
+        written = merge_runs(runs, chunk_size, kmers_file, counts_file, min_count)
+    for run in runs:
+        os.remove(run + KMERS_SUFFIX)
+        os.remove(run + COUNTS_SUFFIX)
+    return written
+
+
+class ExternalCountTable:
+    def __init__(self, path_prefix, kmer_length):
+        self.path_prefix = path_prefix
+        self.kmer_length = kmer_length
+        self.offsets = np.fromfile(path_prefix + OFFSETS_SUFFIX, dtype=np.int64)
+        self.kmers = self._map(KMERS_SUFFIX, KMER_DTYPE)
+        self.counts = self._map(COUNTS_SUFFIX, COUNT_DTYPE)
+
+    def _map(self, suffix, dtype):
+        return _map_file(self.path_prefix + suffix, dtype)
+
+    def __len__(self):
+        return len(self.kmers)
+
+    def iter_buckets(self):
+        """Yield (kmers, counts) slices of the sorted table one bucket at a time."""
+        for start, end in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist()):
+            if end > start:
+                yield self.kmers[start:end], self.counts[start:end]
+
+
+class ExternalKmerCounter:
+    def __init__(self, kmer_length, work_dir, max_memory_mb=DEFAULT_MAX_MEMORY_MB,
+                 prefix_bases=DEFAULT_PREFIX_BASES, workers=1, min_count=1):
+        self.kmer_length = kmer_length
+        self.work_dir = work_dir
+        self.prefix_bases = min(prefix_bases, kmer_length)
+        self.num_buckets = 4 ** self.prefix_bases
+        self.workers = workers
+        self.min_count = min_count
+        max_memory = max_memory_mb * 1024 * 1024
+        # Half of the budget buffers partitioned k-mers, the other half is
+        # shared by the workers sorting buckets
+        self.buffer_limit = max(max_memory // 2 // np.dtype(KMER_DTYPE).itemsize, 1)
+        self.chunk_size = max(max_memory // 2 // max(workers, 1) // BYTES_PER_SORTED_KMER, 1)
+
+    def count(self, batches):
+        """
+        Count the canonical k-mers of an iterable of read batches on disk.
+
+        Args:
+            batches (iterable): Lists of read sequences
+
+        Returns:
+            ExternalCountTable: Memory-mapped sorted count table
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        self._partition(batches)
+        return self._count_buckets()
+
+    def _partition(self, batches):
+        shift = np.uint64(2 * (self.kmer_length - self.prefix_bases))
+        buffers = [[] for _ in range(self.num_buckets)]
+        buffered = 0
+        files = [open(bucket_path(self.work_dir, bucket), 'wb') for bucket in range(self.num_buckets)]
+        try:
+            for batch in batches:
+                codes = batch_canonical_codes(batch, self.kmer_length)
+                buckets = codes >> shift
+                order = np.argsort(buckets, kind='stable')
+                bounds = np.searchsorted(buckets[order], np.arange(self.num_buckets + 1, dtype=np.uint64))
+                codes = codes[order]
+                for bucket in np.flatnonzero(np.diff(bounds)).tolist():
+                    buffers[bucket].append(codes[bounds[bucket]:bounds[bucket + 1]])
+                buffered += len(codes)
+                if buffered >= self.buffer_limit:
+                    self._flush_buffers(buffers, files)
+                    buffered = 0
+            self._flush_buffers(buffers, files)
+        finally:
+            for f in files:
+                f.close()
+
+    def _flush_buffers(self, buffers, files):
+        for bucket, chunks in enumerate(buffers):
+            if chunks:
+                np.concatenate(chunks).tofile(files[bucket])
+                chunks.clear()
+
+    def _count_buckets(self):
+        paths = [bucket_path(self.work_dir, bucket) for bucket in range(self.num_buckets)]
+        outputs = [os.path.splitext(path)[0] for path in paths]
+        prefix = os.path.join(self.work_dir, TABLE_PREFIX)
+        offsets = [0]
+        with open(prefix + KMERS_SUFFIX, 'wb') as kmers_file, open(prefix + COUNTS_SUFFIX, 'wb') as counts_file:
+            if self.workers > 1:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    results = pool.map(count_bucket_file, paths, [self.chunk_size] * len(paths), outputs,
+                                       [self.min_count] * len(paths))
+                    for path, output, written in zip(paths, outputs, results):
+                        self._append_bucket(path, output, written, kmers_file, counts_file, offsets)
+            else:
+                for path, output in zip(paths, outputs):
+                    written = count_bucket_file(path, self.chunk_size, output, self.min_count)
+                    self._append_bucket(path, output, written, kmers_file, counts_file, offsets)
+        np.array(offsets, dtype=np.int64).tofile(prefix + OFFSETS_SUFFIX)
+        return ExternalCountTable(prefix, self.kmer_length)
+
+    def _append_bucket(self, path, output, written, kmers_file, counts_file, offsets):
+        """Append a counted bucket to the table files and remove its scratch files."""
+        for suffix, table_file in ((KMERS_SUFFIX, kmers_file), (COUNTS_SUFFIX, counts_file)):
+            with open(output + suffix, 'rb') as f:
+                shutil.copyfileobj(f, table_file)
+            os.remove(output + suffix)
+        os.remove(path)
+        offsets.append(offsets[-1] + written)
+
+
+def make_work_dir(parent=None):
+    """Create a scratch directory for bucket files that is removed with the returned handle."""
+    return tempfile.TemporaryDirectory(prefix='shortasm_kmers_', dir=parent)
@@ -0,0 +1,195 @@
+"""
+Streaming FASTQ parser working directly on binary blocks.
+
+The reader inflates the input in large blocks, finds record boundaries by
+locating newlines with NumPy, and yields each sequence as a memoryview into
+the block instead of building a record object per read. Quality lines are
+only sliced out when requested.
+
+Plain, gzip and BGZF inputs are detected from the file header. BGZF blocks
+are independent deflate streams, so batches of them are inflated in a
+thread pool (zlib releases the GIL while inflating).
+"""
+
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+DEFAULT_BLOCK_SIZE = 1 << 22
+# Number of BGZF blocks (each at most 64 KiB) inflated per thread-pool round
+BGZF_BLOCKS_PER_ROUND = 256
+
+NEWLINE = ord('\n')
+RECORD_START = ord('@')
+
+
+def detect_format(path):
+    """
+    Detect whether a file is plain text, gzip or BGZF compressed.
+
+    Args:
+        path (str): Input file
+
+    Returns:
+        str: 'plain', 'gzip' or 'bgzf'
+    """
+    with open(path, 'rb') as f:
+        header = f.read(18)
+    if header[:2] != GZIP_MAGIC:
+        return 'plain'
+    # BGZF is gzip with an extra field holding a 'BC' subfield (SAM spec 4.1)
+    flags = header[3] if len(header) > 3 else 0
+    if flags & 4 and len(header) >= 16 and header[12:14] == b'BC':
+        return 'bgzf'
+    return 'gzip'
+
+
+def iter_plain_blocks(path, block_size=DEFAULT_BLOCK_SIZE):
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def iter_gzip_blocks(path, block_size=DEFAULT_BLOCK_SIZE):
+    """Inflate a (possibly multi-member) gzip file in blocks."""
+    with open(path, 'rb') as f:
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        while True:
+            compressed = f.read(block_size)
+            if not compressed:
+                break
+            while compressed:
+                block = inflater.decompress(compressed)
+                if block:
+                    yield block
+                if inflater.eof:
+                    # Start the next gzip member, if any
+                    compressed = inflater.unused_data
+                    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                else:
+                    compressed = b''
+        block = inflater.flush()
+        if block:
+            yield block
+
+
+def _inflate_bgzf_block(block):
+    # Deflate payload sits between the 18-byte header and the 8-byte footer
+    return zlib.decompress(block[18:-8], -zlib.MAX_WBITS)
+
+
+def iter_bgzf_compressed_blocks(f):
+    """Yield the raw bytes of each BGZF block in an open binary file."""
+    while True:
+        header = f.read(18)
+        if not header:
+            return
+        if len(header) < 18 or header[:2] != GZIP_MAGIC:
+            raise ValueError("Truncated or malformed BGZF block")
+        block_size = struct.unpack_from('<H', header, 16)[0] + 1
+        yield header + f.read(block_size - 18)
+
+
+def iter_bgzf_blocks(path, threads=None):
+    """Inflate a BGZF file, decompressing batches of blocks in parallel."""
+    threads = threads or os.cpu_count() or 1
+    with open(path, 'rb') as f, ThreadPoolExecutor(max_workers=threads) as pool:
+        pending = []
+        for block in iter_bgzf_compressed_blocks(f):
+            pending.append(block)
+            if len(pending) >= BGZF_BLOCKS_PER_ROUND:
+                yield b''.join(pool.map(_inflate_bgzf_block, pending))
+                pending = []
+        if pending:
+            yield b''.join(pool.map(_inflate_bgzf_block, pending))
+
+
+def iter_decompressed_blocks(path, block_size=DEFAULT_BLOCK_SIZE, threads=None):
+    """Yield decompressed blocks of any supported input format."""
+    file_format = detect_format(path)
+    if file_format == 'bgzf':
+        return iter_bgzf_blocks(path, threads)
+    if file_format == 'gzip':
+        return iter_gzip_blocks(path, block_size)
+    return iter_plain_blocks(path, block_size)
+
+
+class FastqReader:
+    def __init__(self, path, with_quality=False, block_size=DEFAULT_BLOCK_SIZE, threads=None):
+        self.path = path
+        self.with_quality = with_quality
+        self.block_size = block_size
+        self.threads = threads
+
+    def __iter__(self):
+        """
+        Iterate over the reads of the file.
+
+        Yields:
+            memoryview or tuple: The sequence, or (sequence, quality) when
+            with_quality is set
+        """
+        return self.parse_blocks(self.iter_blocks())
+
+    def iter_blocks(self):
+        """Yield the decompressed blocks of the file."""
+        return iter_decompressed_blocks(self.path, self.block_size, self.threads)
+
+    def parse_blocks(self, blocks):
+        """
+        Iterate over the reads in a stream of decompressed blocks.
+
+        Records may span blocks; the blocks must come from iter_blocks, in
+        order, which lets another thread do the decompression.
+
+        Yields:
+            memoryview or tuple: As for iterating over the reader
+        """
+        leftover = b''
+        for block in blocks:
+            buffer = leftover + block if leftover else block
+            consumed = yield from self._parse_buffer(buffer)
+            leftover = buffer[consumed:]
+        if leftover.strip():
+            if not leftover.endswith(b'\n'):
+                leftover += b'\n'
+            consumed = yield from self._parse_buffer(leftover)
+            if leftover[consumed:].strip():
+                raise ValueError(f"Truncated FASTQ record at end of {self.path}")
+
+    def _parse_buffer(self, buffer):
+        """
+        Yield every complete record in a buffer.
+
+        Returns:
+            int: Number of bytes consumed by complete records
+        """
+        newlines = np.flatnonzero(np.frombuffer(buffer, dtype=np.uint8) == NEWLINE)
+        n_records = len(newlines) // 4
+        if n_records == 0:
+            return 0
+        newlines = newlines[:4 * n_records]
+        header_starts = np.concatenate(([0], newlines[3:-1:4] + 1))
+        if not np.all(np.frombuffer(buffer, dtype=np.uint8)[header_starts] == RECORD_START):
+            raise ValueError(f"Malformed FASTQ record in {self.path}: expected '@' at record start")
+
+        view = memoryview(buffer)
+        seq_starts = (newlines[0::4] + 1).tolist()
+        seq_ends = newlines[1::4].tolist()
+        if self.with_quality:
+            qual_starts = (newlines[2::4] + 1).tolist()
+            qual_ends = newlines[3::4].tolist()
+            for start, end, qual_start, qual_end in zip(seq_starts, seq_ends, qual_starts, qual_ends):
+                yield view[start:end], view[qual_start:qual_end]
+        else:
+            for start, end in zip(seq_starts, seq_ends):
+                yield view[start:end]
+        return int(newlines[-1]) + 1
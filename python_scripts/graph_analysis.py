@@ -0,0 +1,127 @@
+"""
+Bulk analytics over packed de Bruijn graph edges.
+
+An oriented edge u -> v is the packed k-mer u + v[-1], so a whole graph is
+one uint64 array of edge k-mers with a parallel count array. Degrees,
+reverse-complement pairing and high-weight edge queries are answered with
+array operations over it: degrees with bincount, pairings with one sorted
+join (sort once, searchsorted the transformed k-mers), and top edges with
+argpartition, so no per-edge Python work is done. Lookups search with
+sorted queries, which keeps the binary searches cache-friendly.
+"""
+
+import numpy as np
+
+from kmer_batch import reverse_complement_codes
+from kmer_encoding import kmer_mask
+from kmer_table import sorted_unique
+
+
+def edge_endpoints(edge_kmers, kmer_length):
+    """Packed (k-1)-mer source and target nodes of oriented edge k-mers."""
+    return edge_kmers >> np.uint64(2), edge_kmers & np.uint64(kmer_mask(kmer_length - 1))
+
+
+def degree_arrays(edge_kmers, kmer_length, nodes=None):
+    """
+    In- and out-degree of every node.
+
+    Args:
+        edge_kmers (np.ndarray): Oriented edge k-mers
+        kmer_length (int): K-mer length
+        nodes (np.ndarray): Sorted packed nodes; derived from the edges if None
+
+    Returns:
+        tuple: (nodes, in-degrees, out-degrees)
+    """
+    sources, targets = edge_endpoints(edge_kmers, kmer_length)
+    sources = np.sort(sources)
+    targets = np.sort(targets)
+    if nodes is None:
+        nodes = sorted_unique(np.concatenate((sources, targets)))
+    return nodes, _run_lengths(targets, nodes), _run_lengths(sources, nodes)
+
+
+def _run_lengths(sorted_codes, nodes):
+    """Occurrences of each node in a sorted array whose values are all nodes."""
+    degrees = np.zeros(len(nodes), dtype=np.int64)
+    if not len(sorted_codes):
+        return degrees
+    starts = np.flatnonzero(np.concatenate(([True], sorted_codes[1:] != sorted_codes[:-1])))
+    lengths = np.diff(np.append(starts, len(sorted_codes)))
+    degrees[np.searchsorted(nodes, sorted_codes[starts])] = lengths
+    return degrees
+
+
+def degree_histogram(degrees):
+    """Number of nodes with each degree, indexed by degree."""
+    return np.bincount(degrees, minlength=1)
+
+
+def search_sorted(sorted_kmers, queries):
+    """
+    Positions of queries in a sorted array, searched in sorted order.
+
+    Returns:
+        tuple: (index, found mask); index is 0 where the query is missing
+    """
+    index = np.zeros(len(queries), dtype=np.int64)
+    found = np.zeros(len(queries), dtype=bool)
+    if not len(sorted_kmers) or not len(queries):
+        return index, found
+    order = np.argsort(queries)
+    ordered = queries[order]
+    positions = np.searchsorted(sorted_kmers, ordered)
+    positions[positions == len(sorted_kmers)] = 0
+    index[order] = positions
+    found[order] = sorted_kmers[positions] == ordered
+    return index, found
+
+
+def present_in(sorted_kmers, queries):
+    """Mask of queries found in a sorted array, searched in sorted order."""
+    return search_sorted(sorted_kmers, queries)[1]
+
+
+def complement_mask(edge_kmers, kmer_length):
+    """
+    Mask of edges whose reverse complement edge is also in the graph.
+
+    The reverse complement of u -> v is rc(v) -> rc(u), i.e. the edge of
+    the reverse-complemented k-mer.
+    """
+    return present_in(np.sort(edge_kmers), reverse_complement_codes(edge_kmers, kmer_length))
+
+
+def reciprocal_mask(edge_kmers, kmer_length):
+    """Mask of edges u -> v for which v -> u is also in the graph."""
+    node_mask = np.uint64(kmer_mask(kmer_length - 1))
+    sources, targets = edge_endpoints(edge_kmers, kmer_length)
+    # v -> u would be the k-mer v + u[-1]; it is only an edge of the graph
+    # if its suffix is u again, which holds for few (periodic) nodes
+    reverse = (targets << np.uint64(2)) | (sources & np.uint64(3))
+    consistent = np.flatnonzero((reverse & node_mask) == sources)
+    mask = np.zeros(len(edge_kmers), dtype=bool)
+    mask[consistent] = present_in(np.sort(edge_kmers), reverse[consistent])
+    return mask
+
+
+def top_edges(counts, threshold, limit):
+    """
+    Indices of the heaviest edges with count >= threshold.
+
+    Only the `limit` heaviest are selected and sorted (ties by position),
+    with argpartition rather than a sort of every qualifying edge.
+
+    Returns:
+        tuple: (indices by decreasing count, number of edges above threshold)
+    """
+    above = np.flatnonzero(counts >= threshold)
+    if limit is not None and len(above) > limit:
+        if limit <= 0:
+            return np.empty(0, dtype=np.int64), len(above)
+        selected = above[np.argpartition(-counts[above].astype(np.int64), limit - 1)[:limit]]
+    else:
+        selected = above
+    order = np.lexsort((selected, -counts[selected].astype(np.int64)))
+    return selected[order], len(above)
@@ -0,0 +1,178 @@
+"""
+Streaming GFA and FASTA export of de Bruijn graphs.
+
+Records are produced in chunks straight from the packed arrays: sequences
+are decoded with vector operations, links are found with vector lookups,
+and each chunk is written as one buffered block. Memory use therefore
+stays flat however large the graph is. Paths ending in '.gz' are written
+gzip-compressed.
+
+The k-mer graph is exported in bidirected form: one segment per canonical
+k-mer and one link per adjacency (a link and its reverse complement are
+the same adjacency, so only one of the two is written). A networkx graph,
+whose k-mers may be too long to pack, is exported the same way from its
+edges, with string lookups in place of the vector ones.
+"""
+
+import gzip
+
+import numpy as np
+
+from kmer_batch import canonical_codes_of, decode_codes, reverse_complement_codes
+from kmer_encoding import BASES, kmer_mask, reverse_complement
+
+
+EXPORT_CHUNK_SIZE = 1 << 16
+WRITE_BUFFER_SIZE = 1 << 20
+ORIENTATIONS = ('+', '-')
+
+
+def open_output(path):
+    """Open a binary output file, gzip-compressed when the path ends in '.gz'."""
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'wb', compresslevel=6)
+    return open(path, 'wb', buffering=WRITE_BUFFER_SIZE)
+
+
+def _kmer_links(kmers, start, end, kmer_length):
+    """
+    Find the links leaving k-mers [start, end) in both orientations.
+
+    Returns:
+        tuple: (source index, source strand, target index, target strand) arrays
+    """
+    mask = np.uint64(kmer_mask(kmer_length))
+    chunk = kmers[start:end]
+    sources = np.arange(start, end, dtype=np.int64)
+    exits = (chunk, reverse_complement_codes(chunk, kmer_length))
+    parts = []
+    for source_strand, oriented in enumerate(exits):
+        for base in range(4):
+            following = ((oriented << np.uint64(2)) | np.uint64(base)) & mask
+            canonical = canonical_codes_of(following, kmer_length)
+            target = np.searchsorted(kmers, canonical)
+            target[target == len(kmers)] = 0
+            found = kmers[target] == canonical
+            target_strand = (following != canonical).astype(np.int64)
+            parts.append((sources[found], np.full(int(found.sum()), source_strand, dtype=np.int64),
+                          target[found], target_strand[found]))
+    source, source_strand, target, target_strand = (np.concatenate(column) for column in zip(*parts))
+    # Keep a link only if it is not larger than its mirror (target flipped -> source flipped)
+    keep = (source < target) | ((source == target) & (source_strand <= 1 - target_strand))
+    return source[keep], source_strand[keep], target[keep], target_strand[keep]
+
+
+def _write_links(out, source, source_strand, target, target_strand, overlap):
+    if not len(source):
+        return
+    cigar = f"{overlap}M"
+    lines = [
+        f"L\t{s + 1}\t{ORIENTATIONS[so]}\t{t + 1}\t{ORIENTATIONS[to]}\t{cigar}\n"
+        for s, so, t, to in zip(source.tolist(), source_strand.tolist(), target.tolist(), target_strand.tolist())
+    ]
+    out.write(''.join(lines).encode('ascii'))
+
+
+def write_kmer_gfa(graph, path, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Write a CompactDeBruijnGraph as GFA 1: one segment per canonical k-mer.
+
+    Segments carry KC (k-mer count) tags; links overlap by k - 1 bases.
+    Segment names are the 1-based positions in the sorted k-mer table.
+    """
+    k = graph.kmer_length
+    kmers = graph.table.kmers
+    counts = graph.table.counts
+    with open_output(path) as out:
+        out.write(b"H\tVN:Z:1.0\n")
+        for start in range(0, len(kmers), chunk_size):
+            end = min(start + chunk_size, len(kmers))
+            sequences = decode_codes(kmers[start:end], k).tolist()
+            lines = [
+                f"S\t{start + offset + 1}\t{sequence.decode('ascii')}\tKC:i:{count}\n"
+                for offset, (sequence, count) in enumerate(zip(sequences, counts[start:end].tolist()))
+            ]
+            out.write(''.join(lines).encode('ascii'))
+        for start in range(0, len(kmers), chunk_size):
+            end = min(start + chunk_size, len(kmers))
+            _write_links(out, *_kmer_links(kmers, start, end, k), overlap=k - 1)
+
+
+def write_networkx_gfa(graph, kmer_length, path, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Write a networkx de Bruijn graph as GFA 1, in the same form as
+    write_kmer_gfa: one segment per canonical k-mer, named by its 1-based
+    position in sorted order, with a KC (k-mer count) tag.
+
+    Args:
+        graph (networkx.DiGraph): (k-1)-mer nodes; the edge u -> v is the
+            k-mer u + v[-1] and carries its count
+        kmer_length (int): K-mer length, any size
+        path (str): Output path
+    """
+    counts = {}
+    for u, v, count in graph.edges(data='count'):
+        kmer = u + v[-1]
+        counts[min(kmer, reverse_complement(kmer))] = count
+    kmers = sorted(counts)
+    index = {kmer: position for position, kmer in enumerate(kmers)}
+    with open_output(path) as out:
+        out.write(b"H\tVN:Z:1.0\n")
+        for start in range(0, len(kmers), chunk_size):
+            lines = [f"S\t{start + offset + 1}\t{kmer}\tKC:i:{counts[kmer]}\n"
+                     for offset, kmer in enumerate(kmers[start:start + chunk_size])]
+            out.write(''.join(lines).encode('ascii'))
+        for start in range(0, len(kmers), chunk_size):
+            links = []
+            for source, kmer in enumerate(kmers[start:start + chunk_size], start):
+                for source_strand, oriented in enumerate((kmer, reverse_complement(kmer))):
+                    for base in BASES:
+                        following = oriented[1:] + base
+                        reverse = reverse_complement(following)
+                        target = index.get(min(following, reverse))
+                        if target is None:
+                            continue
+                        target_strand = int(following > reverse)
+                        # Keep a link only if it is not larger than its mirror
+                        if source < target or (source == target and source_strand <= 1 - target_strand):
+                            links.append((source, source_strand, target, target_strand))
+            if links:
+                columns = (np.array(column, dtype=np.int64) for column in zip(*links))
+                _write_links(out, *columns, overlap=kmer_length - 1)
+
+
+def write_unitig_gfa(unitig_graph, path, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Write a UnitigGraph as GFA 1.
+
+    Segments carry LN (length), KC (total k-mer count) and km (mean k-mer
+    coverage) tags; links overlap by k - 1 bases.
+    """
+    overlap = unitig_graph.kmer_length - 1
+    with open_output(path) as out:
+        out.write(b"H\tVN:Z:1.0\n")
+        for start in range(0, len(unitig_graph), chunk_size):
+            end = min(start + chunk_size, len(unitig_graph))
+            lines = [
+                f"S\t{unitig + 1}\t{unitig_graph.sequence(unitig)}\tLN:i:{unitig_graph.lengths[unitig]}"
+                f"\tKC:i:{unitig_graph.total_coverage[unitig]}\tkm:f:{unitig_graph.mean_coverage(unitig):.2f}\n"
+                for unitig in range(start, end)
+            ]
+            out.write(''.join(lines).encode('ascii'))
+        links = unitig_graph.links
+        for start in range(0, len(links), chunk_size):
+            chunk = links[start:start + chunk_size]
+            _write_links(out, chunk[:, 0], chunk[:, 1], chunk[:, 2], chunk[:, 3], overlap)
+
+
+def write_unitig_fasta(unitig_graph, path, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write unitig sequences as FASTA with length and coverage in the headers."""
+    with open_output(path) as out:
+        for start in range(0, len(unitig_graph), chunk_size):
+            end = min(start + chunk_size, len(unitig_graph))
+            lines = [
+                f">{unitig + 1} LN:i:{unitig_graph.lengths[unitig]} KC:i:{unitig_graph.total_coverage[unitig]}"
+                f" km:f:{unitig_graph.mean_coverage(unitig):.2f}\n{unitig_graph.sequence(unitig)}\n"
+                for unitig in range(start, end)
+            ]
+            out.write(''.join(lines).encode('ascii'))
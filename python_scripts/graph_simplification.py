@@ -0,0 +1,319 @@
+"""
+Tip clipping and bubble popping on a unitig graph.
+
+Sequencing errors leave two shapes in a de Bruijn graph. An error near the
+end of a read branches off a short dead-end path, a tip. An error inside a
+read branches off a path that rejoins the graph k bases later, a bubble,
+usually with far less coverage than the path it runs alongside.
+
+Both are found on the compacted graph, where each is a short chain of one
+or a few unitigs. A tip is a chain without branches that ends in a dead
+end, is shorter than max_tip_length bases (or has a mean coverage below
+min_tip_coverage) and leaves another path at every point it hangs off. A
+bubble branch is such a chain of at most max_bubble_length bases that is
+entered from one unitig end, the source, and rejoins the graph at one
+other, the sink. It is popped when a search bounded by the same length
+finds another path from source to sink with higher coverage. Only the
+branch has to be simple, so bubbles that overlap other bubbles are popped
+too, one branch at a time.
+
+Oriented unitigs are 2 * unitig + strand, with strand 1 the reverse
+complement, so flipping the strand is x ^ 1 and the predecessors of x are
+the flipped successors of x ^ 1. Removed unitigs are only flagged, which
+removes their links too.
+
+The work is driven by a worklist of oriented unitigs. The first pass
+queues every dead end (tip candidates) and every branching end (bubble
+sources). Removing a chain only changes the graph around the points it
+was attached to, so afterwards only the non-branching chains through
+those points are queued again, as far as a tip or bubble could reach.
+Each removal therefore costs time proportional to the region it affects,
+and repeated passes never rescan the graph. to_unitig_graph() then joins
+the unitigs that no longer branch.
+"""
+
+import heapq
+from collections import deque
+
+import numpy as np
+
+from unitigs import UnitigGraph, find_links
+
+
+# Default limits in multiples of k: error tips are usually shorter than
+# 2k bases, and a substitution bubble branch is 2k - 1 bases long
+TIP_LENGTH_FACTOR = 2
+BUBBLE_LENGTH_FACTOR = 3
+INFINITY = float('inf')
+
+
+def oriented_adjacency(graph):
+    """
+    Successors of every oriented unitig, in compressed sparse row form.
+
+    Each link also reads backwards on the opposite strands, so both
+    directions are added.
+
+    Returns:
+        tuple: (offsets, targets) lists; the successors of oriented unitig
+        x are targets[offsets[x]:offsets[x + 1]]
+    """
+    oriented = 2 * len(graph)
+    links = graph.links
+    sources = links[:, 0] * 2 + links[:, 1]
+    targets = links[:, 2] * 2 + links[:, 3]
+    codes = np.sort(np.concatenate((sources * oriented + targets, (targets ^ 1) * oriented + (sources ^ 1))))
+    if len(codes):
+        codes = codes[np.concatenate(([True], codes[1:] != codes[:-1]))]
+    sources, targets = np.divmod(codes, oriented)
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(sources, minlength=oriented))))
+    return offsets.tolist(), targets.tolist()
+
+
+class GraphSimplifier:
+    def __init__(self, graph, kmers, max_tip_length=None, min_tip_coverage=0, max_bubble_length=None):
+        """
+        Args:
+            graph (UnitigGraph): Unitig graph with links; it is not modified
+            kmers (np.ndarray): Sorted canonical k-mers the graph was built from
+            max_tip_length (int): Clip dead-end chains shorter than this
+                many bases (default TIP_LENGTH_FACTOR * k)
+            min_tip_coverage (float): Also clip dead-end chains of any length
+                whose mean k-mer coverage is below this
+            max_bubble_length (int): Longest bubble branch in bases
+                (default BUBBLE_LENGTH_FACTOR * k)
+        """
+        k = graph.kmer_length
+        self.graph = graph
+        self.kmers = kmers
+        self.max_tip_length = max_tip_length or TIP_LENGTH_FACTOR * k
+        self.min_tip_coverage = min_tip_coverage
+        self.max_bubble_length = max_bubble_length or BUBBLE_LENGTH_FACTOR * k
+        # With a coverage threshold, tips of any length are candidates
+        self.tip_walk_limit = INFINITY if min_tip_coverage else self.max_tip_length
+        self.offsets, self.targets = oriented_adjacency(graph)
+        self.removed = bytearray(len(graph))
+        self.tips_clipped = 0
+        self.bubbles_popped = 0
+        self.unitigs_removed = 0
+
+        degrees = np.diff(np.asarray(self.offsets, dtype=np.int64))
+        self.worklist = deque(np.flatnonzero(degrees != 1).tolist())
+        self.queued = bytearray(2 * len(graph))
+        for oriented in self.worklist:
+            self.queued[oriented] = 1
+
+    def successors(self, oriented):
+        removed = self.removed
+        return [target for target in self.targets[self.offsets[oriented]:self.offsets[oriented + 1]]
+                if not removed[target >> 1]]
+
+    def predecessors(self, oriented):
+        return [source ^ 1 for source in self.successors(oriented ^ 1)]
+
+    def _chain_stats(self, chain):
+        """Length in bases and mean k-mer coverage of a chain of oriented unitigs."""
+        graph = self.graph
+        units = [oriented >> 1 for oriented in chain]
+        length = sum(graph.lengths[unit] for unit in units) - (len(units) - 1) * (graph.kmer_length - 1)
+        coverage = sum(graph.total_coverage[unit] for unit in units) / sum(graph.kmer_totals[unit] for unit in units)
+        return length, coverage
+
+    def _chain(self, start, limit):
+        """
+        Follow the non-branching path that begins with an oriented unitig.
+
+        Returns:
+            tuple: (chain of oriented unitigs, its length in bases, the
+            successors of its last unitig); the successors are None when
+            the chain grew longer than limit before it ended
+        """
+        lengths = self.graph.lengths
+        overlap = self.graph.kmer_length - 1
+        chain = [start]
+        units = {start >> 1}
+        length = lengths[start >> 1]
+        current = start
+        while length <= limit:
+            following = self.successors(current)
+            if len(following) != 1:
+                return chain, length, following
+            next_oriented = following[0]
+            if next_oriented >> 1 in units or len(self.predecessors(next_oriented)) != 1:
+                return chain, length, following
+            chain.append(next_oriented)
+            units.add(next_oriented >> 1)
+            length += lengths[next_oriented >> 1] - overlap
+            current = next_oriented
+        return chain, length, None
+
+    def _queue(self, oriented):
+        if not self.queued[oriented] and not self.removed[oriented >> 1]:
+            self.queued[oriented] = 1
+            self.worklist.append(oriented)
+
+    def _touch(self, oriented):
+        """Queue the chains through an oriented unitig whose neighbourhood changed."""
+        limit = max(self.max_tip_length, self.max_bubble_length)
+        for start in (oriented, oriented ^ 1):
+            chain, _, following = self._chain(start, limit)
+            for member in chain + (following or []):
+                self._queue(member)
+                self._queue(member ^ 1)
+
+    def _remove(self, chain):
+        for oriented in chain:
+            self.removed[oriented >> 1] = 1
+        self.unitigs_removed += len(chain)
+
+    def _clip_tip(self, dead_end):
+        """Remove the tip ending in an oriented unitig without successors, if it is one."""
+        chain, length, attached = self._chain(dead_end ^ 1, self.tip_walk_limit)
+        # Too long, or an isolated path with no graph to hang off
+        if not attached:
+            return False
+        units = {oriented >> 1 for oriented in chain}
+        if any(oriented >> 1 in units for oriented in attached):
+            return False
+        length, coverage = self._chain_stats(chain)
+        if length >= self.max_tip_length and coverage >= self.min_tip_coverage:
+            return False
+        # Clipping must leave every attachment point another way to go
+        if any(len(self.predecessors(oriented)) < 2 for oriented in attached):
+            return False
+        self._remove(chain)
+        self.tips_clipped += 1
+        for oriented in attached:
+            self._touch(oriented)
+        return True
+
+    def _alternative_path(self, source, sink, excluded):
+        """
+        Shortest path from source to sink that avoids the excluded unitigs,
+        by the bases it adds, up to max_bubble_length.
+
+        Returns:
+            list: Oriented unitigs strictly between source and sink, or None
+        """
+        lengths = self.graph.lengths
+        overlap = self.graph.kmer_length - 1
+        distances = {source: 0}
+        parents = {}
+        heap = [(0, source)]
+        while heap:
+            distance, oriented = heapq.heappop(heap)
+            if oriented == sink:
+                path = []
+                while parents[oriented] != source:
+                    oriented = parents[oriented]
+                    path.append(oriented)
+                return path[::-1]
+            if distance > distances[oriented]:
+                continue
+            for following in self.successors(oriented):
+                if following >> 1 in excluded:
+                    continue
+                step = 0 if following == sink else lengths[following >> 1] - overlap
+                if distance + step > self.max_bubble_length or distance + step >= distances.get(following, INFINITY):
+                    continue
+                distances[following] = distance + step
+                parents[following] = oriented
+                heapq.heappush(heap, (distance + step, following))
+        return None
+
+    def _pop_bubbles(self, source):
+        """
+        Pop the bubble branches leaving an oriented unitig with several successors.
+
+        A branch is a non-branching chain entered only from source that
+        rejoins the graph at a single sink. It is removed when another path
+        from source to sink exists and has a higher mean coverage; branches
+        of equal coverage, such as the two alleles of a heterozygous site,
+        are kept.
+        """
+        popped = False
+        for start in self.successors(source):
+            if self.removed[start >> 1] or self.predecessors(start) != [source]:
+                continue
+            chain, _, following = self._chain(start, self.max_bubble_length)
+            if following is None or len(following) != 1:
+                continue
+            sink = following[0]
+            units = {oriented >> 1 for oriented in chain}
+            if source >> 1 in units or sink >> 1 in units:
+                continue
+            alternative = self._alternative_path(source, sink, units)
+            if alternative is None:
+                continue
+            if alternative:
+                alternative_coverage = self._chain_stats(alternative)[1]
+            else:
+                alternative_coverage = min(self.graph.mean_coverage(source >> 1), self.graph.mean_coverage(sink >> 1))
+            if self._chain_stats(chain)[1] >= alternative_coverage:
+                continue
+            self._remove(chain)
+            self.bubbles_popped += 1
+            self._touch(sink)
+            popped = True
+        if popped:
+            self._touch(source)
+        return popped
+
+    def simplify(self):
+        """
+        Clip tips and pop bubbles until the worklist is empty.
+
+        Returns:
+            tuple: (tips clipped, bubbles popped) by this call
+        """
+        tips = self.tips_clipped
+        bubbles = self.bubbles_popped
+        worklist = self.worklist
+        while worklist:
+            oriented = worklist.popleft()
+            self.queued[oriented] = 0
+            if self.removed[oriented >> 1]:
+                continue
+            degree = len(self.successors(oriented))
+            if degree == 0:
+                self._clip_tip(oriented)
+            elif degree > 1:
+                self._pop_bubbles(oriented)
+        return self.tips_clipped - tips, self.bubbles_popped - bubbles
+
+    def _extend(self, oriented, visited):
+        """Unitigs that continue an oriented unitig without branching, marking them visited."""
+        chain = []
+        while True:
+            following = self.successors(oriented)
+            if len(following) != 1:
+                return chain
+            next_oriented = following[0]
+            if visited[next_oriented >> 1] or len(self.predecessors(next_oriented)) != 1:
+                return chain
+            visited[next_oriented >> 1] = 1
+            chain.append(next_oriented)
+            oriented = next_oriented
+
+    def to_unitig_graph(self):
+        """
+        Build the simplified graph: the remaining unitigs, joined where
+        removals left them without branches, and their links.
+
+        Returns:
+            UnitigGraph: Simplified unitig graph
+        """
+        graph = self.graph
+        simplified = UnitigGraph(graph.kmer_length)
+        visited = bytearray(self.removed)
+        for seed in range(len(graph)):
+            if visited[seed]:
+                continue
+            visited[seed] = 1
+            forward = self._extend(2 * seed, visited)
+            backward = self._extend(2 * seed + 1, visited)
+            chain = [oriented ^ 1 for oriented in reversed(backward)] + [2 * seed] + forward
+            simplified.add_chain(graph, [(oriented >> 1, oriented & 1) for oriented in chain])
+        simplified.links = find_links(simplified, self.kmers)
+        return simplified
+
@@ -0,0 +1,190 @@
+"""
+Incrementally extended k-mer count index.
+
+Sequencing runs arrive over time. Instead of re-counting every file for
+each new lane, an incremental index keeps the unfiltered counts of all
+inputs added so far (in the kmer_index file format, with min_count 1) and
+merges the counts of each new input into it. The abundance threshold is
+applied when the graph is built, so a k-mer that was too rare in the
+first lanes can still become solid later.
+
+Next to the index, a '.inputs' file lists the digest and path of every
+input already added, one per line, so a lane is never counted twice. The
+index checksum is chained over those digests. Count caches written with
+--index record their inputs the same way; an index without the list
+cannot tell which files it already holds and is not extended.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+from kmer_index import CHECKSUM_SIZE, KmerIndex, write_index
+from kmer_table import COUNT_DTYPE, KMER_DTYPE, insert_counts
+
+
+INPUTS_SUFFIX = '.inputs'
+
+
+def chain_checksum(checksum, input_digest):
+    """Digest identifying the previous inputs followed by one more input."""
+    if checksum is None:
+        return input_digest
+    return hashlib.blake2b(checksum + input_digest, digest_size=CHECKSUM_SIZE).digest()
+
+
+def is_extendable(index_path):
+    """
+    Whether add() can extend the index at a path: it is new, or it holds
+    unfiltered canonical counts and lists its inputs.
+    """
+    if not os.path.exists(index_path):
+        return True
+    if not os.path.exists(index_path + INPUTS_SUFFIX):
+        return False
+    index = KmerIndex(index_path)
+    return index.min_count == 1 and index.canonical
+
+
+def write_inputs(index_path, inputs):
+    """
+    Write the inputs list of an index, replacing it atomically.
+
+    Args:
+        index_path (str): Index file path; the list goes next to it
+        inputs (list): (hex digest, path) of every input counted
+    """
+    inputs_path = index_path + INPUTS_SUFFIX
+    temp_path = f"{inputs_path}.tmp{os.getpid()}"
+    with open(temp_path, 'w') as f:
+        for digest, source in inputs:
+            f.write(f"{digest}\t{source}\n")
+    os.replace(temp_path, inputs_path)
+
+
+def remove_inputs(index_path):
+    """Delete the inputs list of an index, if it has one."""
+    try:
+        os.remove(index_path + INPUTS_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+class CountDelta:
+    """
+    What adding one input changed in the counts.
+
+    All arrays are parallel to `kmers`, the sorted canonical k-mers the
+    input contained.
+    """
+
+    def __init__(self, kmers, added, previous, min_count=1):
+        self.kmers = kmers
+        self.added = added
+        self.previous = previous
+        self.total = previous + added
+        self.min_count = min_count
+
+    @property
+    def new_kmers(self):
+        """K-mers seen for the first time."""
+        return self.kmers[self.previous == 0]
+
+    @property
+    def crossed_kmers(self):
+        """K-mers that reached min_count with this input."""
+        return self.kmers[(self.previous < self.min_count) & (self.total >= self.min_count)]
+
+    def solid_increments(self):
+        """
+        Count changes of the solid k-mers as seen by a graph holding only
+        k-mers at or above min_count: k-mers that were already solid grow by
+        the added count, k-mers that just crossed enter with their total.
+
+        Returns:
+            tuple: (kmers, count increments)
+        """
+        solid = self.total >= self.min_count
+        increments = np.where(self.previous >= self.min_count, self.added, self.total)
+        return self.kmers[solid], increments[solid]
+
+    def summary(self):
+        return {
+            'kmer_occurrences': int(self.added.sum()),
+            'distinct_kmers': len(self.kmers),
+            'new_kmers': int(np.count_nonzero(self.previous == 0)),
+            'crossed_threshold': len(self.crossed_kmers),
+        }
+
+
+class IncrementalKmerIndex:
+    def __init__(self, path, kmer_length):
+        self.path = path
+        self.kmer_length = kmer_length
+        self.kmers = np.empty(0, dtype=KMER_DTYPE)
+        self.counts = np.empty(0, dtype=COUNT_DTYPE)
+        self.checksum = None
+        # (hex digest, path) of every input already counted
+        self.inputs = []
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        index = KmerIndex(self.path)
+        if index.kmer_length != self.kmer_length:
+            raise ValueError(f"{self.path} holds {index.kmer_length}-mers, not {self.kmer_length}-mers")
+        if index.min_count != 1 or not index.canonical:
+            raise ValueError(f"{self.path} holds filtered counts and cannot be extended")
+        self.kmers = index.kmers
+        self.counts = index.counts
+        self.checksum = index.checksum
+        inputs_path = self.path + INPUTS_SUFFIX
+        if not os.path.exists(inputs_path):
+            raise ValueError(f"{self.path} has no {INPUTS_SUFFIX} list of the files it was counted from "
+                             "and cannot be extended")
+        with open(inputs_path) as f:
+            self.inputs = [tuple(line.rstrip('\n').split('\t', 1)) for line in f if line.strip()]
+
+    def __len__(self):
+        return len(self.kmers)
+
+    def has_input(self, digest):
+        return any(seen == digest.hex() for seen, _ in self.inputs)
+
+    def add(self, kmers, counts, digest, source, min_count=1):
+        """
+        Merge the counts of one input into the index.
+
+        Existing k-mers are incremented in place and new ones inserted at
+        their sorted positions, so the work is proportional to the new
+        input plus one copy of the arrays.
+
+        Args:
+            kmers (np.ndarray): Sorted canonical packed k-mers of the input
+            counts (np.ndarray): Their counts
+            digest (bytes): Checksum of the input file
+            source (str): Input path, recorded in the inputs list
+            min_count (int): Abundance threshold to report crossings against
+
+        Returns:
+            CountDelta: Changes made by this input
+        """
+        kmers = np.asarray(kmers, dtype=KMER_DTYPE)
+        counts = np.asarray(counts, dtype=COUNT_DTYPE)
+        self.kmers, self.counts, previous = insert_counts(self.kmers, self.counts, kmers, counts)
+        self.checksum = chain_checksum(self.checksum, digest)
+        self.inputs.append((digest.hex(), str(source)))
+        return CountDelta(kmers, counts, previous, min_count)
+
+    def solid_arrays(self, min_count=1):
+        """Sorted k-mers and counts at or above min_count."""
+        if min_count <= 1:
+            return self.kmers, self.counts
+        keep = self.counts >= min_count
+        return self.kmers[keep], self.counts[keep]
+
+    def save(self):
+        """Write the index and its inputs list, each replaced atomically."""
+        write_index(self.path, self.kmer_length, self.kmers, self.counts, self.checksum or bytes(CHECKSUM_SIZE))
+        write_inputs(self.path, self.inputs)
@@ -0,0 +1,189 @@
+"""
+Threaded FASTQ ingestion with bounded queues between the stages.
+
+Reading a gzipped FASTQ file has three stages: inflating compressed
+blocks, splitting the inflated text into records and counting the k-mers
+of each batch. Run one after another, each stage waits for the others.
+Here they overlap:
+
+    inflate thread   decompressed blocks  -> block queue
+    parse thread     batches of records   -> batch queue
+    caller           iterates over the batches and counts them
+
+zlib releases the GIL while inflating and the record splitting and
+counting spend most of their time in NumPy, so the stages run largely in
+parallel and the rate approaches that of the slowest stage. The queues
+are bounded: a stage that gets ahead blocks once its queue holds
+queue_depth items, which caps memory at about queue_depth blocks plus
+queue_depth batches.
+
+Errors in a stage thread are passed down the queues and raised in the
+caller. When the caller stops iterating early, the threads are told to
+stop and exit at their next queue operation.
+"""
+
+import queue
+import threading
+import time
+
+
+DEFAULT_QUEUE_DEPTH = 4
+# How often blocked queue operations check whether the pipeline was stopped
+STOP_POLL_SECONDS = 0.1
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+class _Stopped(Exception):
+    pass
+
+
+class StageStats:
+    """Busy and waiting time of one pipeline stage thread."""
+
+    def __init__(self):
+        self.items = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.wait = 0.0
+
+    @property
+    def busy(self):
+        return max(self.wall - self.wait, 0.0)
+
+
+class BatchPipeline:
+    def __init__(self, reader, batch_size, queue_depth=DEFAULT_QUEUE_DEPTH, profiler=None):
+        """
+        Args:
+            reader (FastqReader): Reader providing the blocks and the parser
+            batch_size (int): Reads per batch
+            queue_depth (int): Blocks and batches each queue may hold
+            profiler (StageProfiler): Receives the busy time of the stage
+                threads as the 'inflate' and 'parse' stages
+        """
+        if queue_depth < 1:
+            raise ValueError(f"Queue depth must be at least 1, got {queue_depth}")
+        self.reader = reader
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth
+        self.profiler = profiler
+        self.stats = {'inflate': StageStats(), 'parse': StageStats()}
+
+    def __iter__(self):
+        """
+        Yield batches of reads while the next ones are being inflated and
+        parsed.
+
+        Yields:
+            list: Up to batch_size read sequences (memoryviews)
+        """
+        blocks = queue.Queue(self.queue_depth)
+        batches = queue.Queue(self.queue_depth)
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._inflate, args=(blocks, stop), name='fastq-inflate', daemon=True),
+            threading.Thread(target=self._parse, args=(blocks, batches, stop), name='fastq-parse', daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self._report()
+
+    def _put(self, out_queue, item, stop, stats):
+        start = time.perf_counter()
+        try:
+            while True:
+                if stop.is_set():
+                    raise _Stopped()
+                try:
+                    out_queue.put(item, timeout=STOP_POLL_SECONDS)
+                    return
+                except queue.Full:
+                    pass
+        finally:
+            stats.wait += time.perf_counter() - start
+
+    def _get(self, in_queue, stop, stats):
+        start = time.perf_counter()
+        try:
+            while True:
+                if stop.is_set():
+                    raise _Stopped()
+                try:
+                    return in_queue.get(timeout=STOP_POLL_SECONDS)
+                except queue.Empty:
+                    pass
+        finally:
+            stats.wait += time.perf_counter() - start
+
+    def _run_stage(self, name, work, out_queue, stop):
+        """Run a stage body, timing it and passing its end or failure downstream."""
+        stats = self.stats[name]
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            work(stats)
+            self._put(out_queue, _DONE, stop, stats)
+        except _Stopped:
+            pass
+        except BaseException as error:
+            try:
+                self._put(out_queue, _Failure(error), stop, stats)
+            except _Stopped:
+                pass
+        finally:
+            stats.wall = time.perf_counter() - wall
+            stats.cpu = time.thread_time() - cpu
+
+    def _inflate(self, blocks, stop):
+        def work(stats):
+            for block in self.reader.iter_blocks():
+                stats.items += 1
+                self._put(blocks, block, stop, stats)
+        self._run_stage('inflate', work, blocks, stop)
+
+    def _parse(self, blocks, batches, stop):
+        def incoming(stats):
+            while True:
+                item = self._get(blocks, stop, stats)
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+
+        def work(stats):
+            batch = []
+            for seq in self.reader.parse_blocks(incoming(stats)):
+                batch.append(seq)
+                if len(batch) >= self.batch_size:
+                    stats.items += 1
+                    self._put(batches, batch, stop, stats)
+                    batch = []
+            if batch:
+                stats.items += 1
+                self._put(batches, batch, stop, stats)
+        self._run_stage('parse', work, batches, stop)
+
+    def _report(self):
+        if self.profiler is None:
+            return
+        for name, stats in self.stats.items():
+            self.profiler.add_stage_time(name, stats.busy, stats.cpu, stats.items)
@@ -0,0 +1,216 @@
+"""
+NumPy-vectorized k-mer extraction for batches of reads.
+
+A batch of reads is joined into one uint8 base array, with an invalid base
+between reads so that no window spans two reads. Forward and reverse
+complement packed codes for every window are then built with k shifted
+vector operations, and windows containing a non-ACGT base are masked out.
+"""
+
+import numpy as np
+
+from kmer_encoding import BASE_TO_CODE, INVALID_BASE
+from kmer_table import KMER_DTYPE, MAX_ARRAY_K
+
+
+CODE_LOOKUP = np.array(BASE_TO_CODE, dtype=np.uint8)
+ASCII_BASES = np.frombuffer(b'ACGT', dtype=np.uint8)
+
+READ_SEPARATOR = b'N'
+
+_MASK_2BIT = np.uint64(0x3333333333333333)
+_MASK_4BIT = np.uint64(0x0F0F0F0F0F0F0F0F)
+
+
+def sequences_to_bases(sequences):
+    """
+    Convert a batch of reads into one array of 2-bit base codes.
+
+    Args:
+        sequences (iterable): Reads as str or bytes
+
+    Returns:
+        np.ndarray: uint8 base codes, INVALID_BASE between reads and for non-ACGT bases
+    """
+    data = READ_SEPARATOR.join(
+        seq if isinstance(seq, (bytes, bytearray, memoryview)) else seq.encode('ascii', 'replace')
+        for seq in sequences
+    )
+    return CODE_LOOKUP[np.frombuffer(data, dtype=np.uint8)]
+
+
+def canonical_codes(bases, kmer_length):
+    """
+    Compute the canonical packed code of every valid window in a base array.
+
+    Args:
+        bases (np.ndarray): uint8 base codes from sequences_to_bases
+        kmer_length (int): K-mer length, at most 32
+
+    Returns:
+        np.ndarray: uint64 canonical codes of windows without invalid bases
+    """
+    return multi_canonical_codes(bases, [kmer_length])[kmer_length]
+
+
+def multi_canonical_codes(bases, kmer_lengths):
+    """
+    Compute canonical packed codes for several k in one pass over a base array.
+
+    The forward and reverse complement codes are built one base at a time
+    for the largest k. After k steps they hold the codes of every k-long
+    window, so each smaller k is a snapshot taken on the way and shares the
+    shifts done for it.
+
+    Args:
+        bases (np.ndarray): uint8 base codes from sequences_to_bases
+        kmer_lengths (iterable): K-mer lengths, each at most 32
+
+    Returns:
+        dict: k -> uint64 canonical codes of the windows without invalid bases
+    """
+    kmer_lengths = sorted(set(kmer_lengths))
+    if kmer_lengths[-1] > MAX_ARRAY_K:
+        raise ValueError(f"Vectorized counting supports k <= {MAX_ARRAY_K}, got {kmer_lengths[-1]}")
+    shortest = kmer_lengths[0]
+    longest = kmer_lengths[-1]
+    n_windows = len(bases) - shortest + 1
+    if n_windows <= 0:
+        return {k: np.empty(0, dtype=KMER_DTYPE) for k in kmer_lengths}
+
+    # Pad with invalid bases so windows of every k start at each position;
+    # windows running into the padding are masked out like any other
+    if longest > shortest:
+        bases = np.concatenate((bases, np.full(longest - shortest, INVALID_BASE, dtype=np.uint8)))
+    invalid = bases == INVALID_BASE
+    codes = np.where(invalid, 0, bases).astype(KMER_DTYPE)
+    complements = np.uint64(3) - codes
+    # A window is valid when the running count of invalid bases does not
+    # change across it.
+    invalid_seen = np.concatenate(([0], np.cumsum(invalid, dtype=np.int64)))
+
+    two = np.uint64(2)
+    forward = np.zeros(n_windows, dtype=KMER_DTYPE)
+    reverse = np.zeros(n_windows, dtype=KMER_DTYPE)
+    by_length = {}
+    for offset in range(longest):
+        forward <<= two
+        forward |= codes[offset:offset + n_windows]
+        reverse |= complements[offset:offset + n_windows] << np.uint64(2 * offset)
+        k = offset + 1
+        if k in kmer_lengths:
+            valid = invalid_seen[k:k + n_windows] == invalid_seen[:n_windows]
+            by_length[k] = np.minimum(forward, reverse)[valid]
+    return by_length
+
+
+def pack_kmers(kmers, kmer_length):
+    """
+    Forward packed codes of k-mer strings, packed a base column at a time.
+
+    Args:
+        kmers (list): K-mer strings, each exactly kmer_length bases long
+        kmer_length (int): K-mer length, at most 32
+
+    Returns:
+        tuple: (uint64 forward codes, mask of the k-mers without invalid bases)
+    """
+    if kmer_length > MAX_ARRAY_K:
+        raise ValueError(f"Vectorized counting supports k <= {MAX_ARRAY_K}, got {kmer_length}")
+    lengths = np.fromiter(map(len, kmers), dtype=np.int64, count=len(kmers))
+    wrong = np.flatnonzero(lengths != kmer_length)
+    if len(wrong):
+        kmer = kmers[wrong[0]]
+        raise ValueError(f"expected {kmer_length} bases, got {len(kmer)} in '{kmer}'")
+    data = ''.join(kmers).encode('ascii', 'replace')
+    rows = CODE_LOOKUP[np.frombuffer(data, dtype=np.uint8)].reshape(len(kmers), kmer_length)
+    valid = (rows != INVALID_BASE).all(axis=1)
+    codes = np.zeros(len(kmers), dtype=KMER_DTYPE)
+    for column in range(kmer_length):
+        codes <<= np.uint64(2)
+        codes |= rows[:, column] & np.uint8(3)
+    return codes, valid
+
+
+def window_codes(bases, kmer_length):
+    """
+    Forward packed code of every window of a base array, in position order.
+
+    Unlike canonical_codes, windows containing an invalid base are kept
+    (with arbitrary codes) so that each code stays at its window start.
+
+    Args:
+        bases (np.ndarray): uint8 base codes from sequences_to_bases
+        kmer_length (int): K-mer length, at most 32
+
+    Returns:
+        tuple: (uint64 forward codes, mask of the windows without invalid bases)
+    """
+    if kmer_length > MAX_ARRAY_K:
+        raise ValueError(f"Vectorized counting supports k <= {MAX_ARRAY_K}, got {kmer_length}")
+    n_windows = len(bases) - kmer_length + 1
+    if n_windows <= 0:
+        return np.empty(0, dtype=KMER_DTYPE), np.empty(0, dtype=bool)
+    invalid = bases == INVALID_BASE
+    codes = np.where(invalid, 0, bases).astype(KMER_DTYPE)
+    forward = np.zeros(n_windows, dtype=KMER_DTYPE)
+    for offset in range(kmer_length):
+        forward <<= np.uint64(2)
+        forward |= codes[offset:offset + n_windows]
+    invalid_seen = np.concatenate(([0], np.cumsum(invalid, dtype=np.int64)))
+    valid = invalid_seen[kmer_length:kmer_length + n_windows] == invalid_seen[:n_windows]
+    return forward, valid
+
+
+def batch_canonical_codes(sequences, kmer_length):
+    """Canonical packed codes of every valid k-mer in a batch of reads."""
+    return canonical_codes(sequences_to_bases(sequences), kmer_length)
+
+
+def batch_multi_canonical_codes(sequences, kmer_lengths):
+    """Canonical packed codes of every valid k-mer in a batch of reads, for several k."""
+    return multi_canonical_codes(sequences_to_bases(sequences), kmer_lengths)
+
+
+def reverse_complement_codes(codes, kmer_length):
+    """
+    Reverse complement an array of packed k-mers without decoding them.
+
+    Complementing a 2-bit base is a bitwise NOT, and reversing the base
+    order is a swap of 2-bit groups, then nibbles, then bytes.
+
+    Args:
+        codes (np.ndarray): uint64 packed k-mers
+        kmer_length (int): K-mer length, at most 32
+
+    Returns:
+        np.ndarray: uint64 packed reverse complements
+    """
+    x = ~np.asarray(codes, dtype=KMER_DTYPE)
+    x = ((x >> np.uint64(2)) & _MASK_2BIT) | ((x & _MASK_2BIT) << np.uint64(2))
+    x = ((x >> np.uint64(4)) & _MASK_4BIT) | ((x & _MASK_4BIT) << np.uint64(4))
+    return x.byteswap() >> np.uint64(64 - 2 * kmer_length)
+
+
+def canonical_codes_of(codes, kmer_length):
+    """Smaller of each packed k-mer and its reverse complement."""
+    return np.minimum(codes, reverse_complement_codes(codes, kmer_length))
+
+
+def decode_codes(codes, kmer_length):
+    """
+    Decode an array of packed k-mers into their ASCII sequences.
+
+    Args:
+        codes (np.ndarray): uint64 packed k-mers
+        kmer_length (int): K-mer length
+
+    Returns:
+        np.ndarray: Fixed-width bytes array (dtype S<k>), one entry per k-mer
+    """
+    codes = np.asarray(codes, dtype=KMER_DTYPE)
+    letters = np.empty((len(codes), kmer_length), dtype=np.uint8)
+    for position in range(kmer_length):
+        shift = np.uint64(2 * (kmer_length - 1 - position))
+        letters[:, position] = ASCII_BASES[((codes >> shift) & np.uint64(3)).astype(np.intp)]
+    return letters.view(f'S{kmer_length}').ravel()
@@ -0,0 +1,133 @@
+"""
+2-bit packed k-mer encoding.
+
+Bases are packed two bits each (A=0, C=1, G=2, T=3), most significant base
+first, so comparing two packed codes of the same length gives the same
+order as comparing the uppercase strings. That means the canonical k-mer
+is simply the smaller of the forward and reverse complement codes.
+
+For k <= 32 a code fits in one unsigned 64-bit word. Python integers grow
+as needed, so larger k transparently spill into several machine words.
+"""
+
+BASES = 'ACGT'
+INVALID_BASE = 4
+
+# Complement of each base, either case, for reversing sequence strings
+COMPLEMENT_TABLE = str.maketrans('ACGTacgt', 'TGCAtgca')
+
+# Lookup table from byte value to 2-bit code; anything that is not
+# A/C/G/T (either case) maps to INVALID_BASE.
+BASE_TO_CODE = [INVALID_BASE] * 256
+for _code, _base in enumerate(BASES):
+    BASE_TO_CODE[ord(_base)] = _code
+    BASE_TO_CODE[ord(_base.lower())] = _code
+del _code, _base
+
+
+def kmer_mask(k):
+    """Bit mask covering the 2k low bits of a packed k-mer."""
+    return (1 << (2 * k)) - 1
+
+
+def reverse_complement(sequence):
+    """Reverse complement of a DNA sequence string."""
+    return sequence.translate(COMPLEMENT_TABLE)[::-1]
+
+
+def encode_kmer(kmer):
+    """
+    Pack a DNA k-mer into an integer.
+
+    Args:
+        kmer (str or bytes): DNA k-mer made only of A/C/G/T
+
+    Returns:
+        int: 2-bit packed code
+    """
+    if isinstance(kmer, str):
+        kmer = kmer.encode('ascii')
+    code = 0
+    for byte in kmer:
+        base = BASE_TO_CODE[byte]
+        if base == INVALID_BASE:
+            raise ValueError(f"Cannot encode non-ACGT base {chr(byte)!r}")
+        code = (code << 2) | base
+    return code
+
+
+def decode_kmer(code, k):
+    """
+    Unpack a 2-bit packed code back into its k-mer string.
+
+    Args:
+        code (int): Packed k-mer
+        k (int): K-mer length
+
+    Returns:
+        str: Uppercase DNA k-mer
+    """
+    bases = []
+    for _ in range(k):
+        bases.append(BASES[code & 3])
+        code >>= 2
+    return ''.join(reversed(bases))
+
+
+def reverse_complement_code(code, k):
+    """
+    Reverse complement a packed k-mer without decoding it.
+
+    Args:
+        code (int): Packed k-mer
+        k (int): K-mer length
+
+    Returns:
+        int: Packed reverse complement
+    """
+    result = 0
+    for _ in range(k):
+        result = (result << 2) | (3 - (code & 3))
+        code >>= 2
+    return result
+
+
+def canonical_code(code, k):
+    """Smaller of a packed k-mer and its reverse complement."""
+    return min(code, reverse_complement_code(code, k))
+
+
+def iter_canonical_codes(sequence, k):
+    """
+    Yield the canonical packed code of every k-mer in a sequence.
+
+    The forward and reverse complement codes are rolled one base at a time,
+    so each window costs a couple of integer operations instead of a string
+    slice and translation. Windows containing a non-ACGT base are skipped.
+
+    Args:
+        sequence (str or bytes): DNA sequence
+        k (int): K-mer length
+
+    Yields:
+        int: Canonical packed code for each valid window, in read order
+    """
+    if isinstance(sequence, str):
+        sequence = sequence.encode('ascii', 'replace')
+    mask = kmer_mask(k)
+    shift = 2 * (k - 1)
+    forward = 0
+    reverse = 0
+    valid = 0
+    for byte in sequence:
+        base = BASE_TO_CODE[byte]
+        if base == INVALID_BASE:
+            valid = 0
+            forward = 0
+            reverse = 0
+            continue
+        forward = ((forward << 2) | base) & mask
+        reverse = (reverse >> 2) | ((3 - base) << shift)
+        valid += 1
+        if valid >= k:
+            yield forward if forward < reverse else reverse
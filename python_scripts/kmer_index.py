@@ -0,0 +1,130 @@
+"""
+Persistent, memory-mapped k-mer count index.
+
+An index file holds a fixed 64-byte header followed by the sorted packed
+canonical k-mers (uint64) and their counts. The header records what the
+counts were computed from, so a later run can reuse them instead of
+re-counting:
+
+    offset  size  field
+    0       8     magic b'SAKMIDX1'
+    8       4     format version
+    12      4     k
+    16      4     canonical flag (1 = canonical k-mers)
+    20      4     bytes per count (4 or 8)
+    24      4     min_count used when counting
+    28      4     reserved
+    32      8     number of k-mers
+    40      16    BLAKE2b digest of the input file(s)
+    56      8     reserved
+
+Arrays are read through np.memmap, so loading is near-instant, nothing is
+copied, and several processes mapping the same index share its pages.
+"""
+
+import hashlib
+import os
+import struct
+
+import numpy as np
+
+from kmer_table import KMER_DTYPE
+
+
+INDEX_MAGIC = b'SAKMIDX1'
+INDEX_VERSION = 1
+HEADER_SIZE = 64
+HEADER_FORMAT = '<8sIIIIII Q16s8x'
+CHECKSUM_SIZE = 16
+CHECKSUM_BLOCK_SIZE = 1 << 20
+
+COUNT_DTYPES = {4: np.dtype('<u4'), 8: np.dtype('<i8')}
+
+
+def input_checksum(paths):
+    """
+    Digest the contents of one or more input files.
+
+    Args:
+        paths (str or list): Input file path(s)
+
+    Returns:
+        bytes: 16-byte BLAKE2b digest
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    digest = hashlib.blake2b(digest_size=CHECKSUM_SIZE)
+    for path in paths:
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(CHECKSUM_BLOCK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+        # Separate files so that moving bytes between them changes the digest
+        digest.update(b'\0')
+    return digest.digest()
+
+
+class KmerIndex:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"{path} is too short to be a k-mer index")
+        (magic, version, self.kmer_length, canonical, count_size, self.min_count,
+         _, self.size, self.checksum) = struct.unpack(HEADER_FORMAT, header)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{path} is not a k-mer index")
+        if version != INDEX_VERSION:
+            raise ValueError(f"Unsupported k-mer index version {version} in {path}")
+        if count_size not in COUNT_DTYPES:
+            raise ValueError(f"Unsupported count width {count_size} in {path}")
+        self.canonical = bool(canonical)
+        self.kmers = self._map(KMER_DTYPE, HEADER_SIZE)
+        self.counts = self._map(COUNT_DTYPES[count_size], HEADER_SIZE + 8 * self.size)
+
+    def _map(self, dtype, offset):
+        if not self.size:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=(self.size,))
+
+    def __len__(self):
+        return self.size
+
+    def matches(self, kmer_length, checksum, min_count=1, canonical=True):
+        """True when the index was built with the given parameters from the same input."""
+        return (self.kmer_length == kmer_length and self.checksum == checksum
+                and self.min_count == min_count and self.canonical == canonical)
+
+
+def write_index(path, kmer_length, kmers, counts, checksum, min_count=1, canonical=True):
+    """
+    Write a sorted count table to an index file.
+
+    Counts are stored as uint32 when they fit, halving the count array.
+    The file is written next to its destination and renamed into place,
+    so readers never see a partial index.
+    """
+    counts = np.asarray(counts)
+    count_size = 4 if not len(counts) or int(counts.max()) <= np.iinfo(np.uint32).max else 8
+    header = struct.pack(HEADER_FORMAT, INDEX_MAGIC, INDEX_VERSION, kmer_length, int(canonical),
+                         count_size, min_count, 0, len(kmers), checksum)
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        np.asarray(kmers).astype(KMER_DTYPE, copy=False).tofile(f)
+        counts.astype(COUNT_DTYPES[count_size], copy=False).tofile(f)
+    os.replace(temp_path, path)
+
+
+def load_matching_index(path, kmer_length, checksum, min_count=1):
+    """Open an index if it exists and matches the parameters, else return None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        index = KmerIndex(path)
+    except ValueError:
+        return None
+    return index if index.matches(kmer_length, checksum, min_count) else None
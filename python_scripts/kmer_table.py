@@ -0,0 +1,227 @@
+"""
+Array-backed table of canonical k-mer counts.
+
+The table keeps packed canonical k-mers (see kmer_encoding) in a sorted
+uint64 array with a parallel count array. Batches of k-mers are reduced
+with sort-and-reduce and merged lazily, so appending many small chunks
+does not re-sort the whole table every time.
+"""
+
+import numpy as np
+
+from kmer_encoding import canonical_code, decode_kmer, encode_kmer
+
+
+KMER_DTYPE = np.uint64
+COUNT_DTYPE = np.int64
+
+# Largest k whose packed code fits in one uint64
+MAX_ARRAY_K = 32
+
+
+def reduce_codes(codes):
+    """
+    Count the occurrences of each packed code.
+
+    Args:
+        codes (np.ndarray): Packed k-mers, in any order
+
+    Returns:
+        tuple: (sorted unique codes, counts)
+    """
+    kmers, counts = np.unique(codes, return_counts=True)
+    return kmers.astype(KMER_DTYPE, copy=False), counts.astype(COUNT_DTYPE, copy=False)
+
+
+def sorted_unique(codes):
+    """
+    Sorted unique packed codes.
+
+    Sorts and drops repeats directly: np.unique without return_counts
+    takes a hash-based path on recent NumPy that is many times slower
+    for large uint64 arrays.
+    """
+    codes = np.sort(codes)
+    if len(codes):
+        codes = codes[np.concatenate(([True], codes[1:] != codes[:-1]))]
+    return codes.astype(KMER_DTYPE, copy=False)
+
+
+def merge_counts(kmers_a, counts_a, kmers_b, counts_b):
+    """
+    Merge two (kmers, counts) tables, summing counts of shared k-mers.
+
+    Returns:
+        tuple: (sorted unique codes, counts)
+    """
+    return reduce_counts(np.concatenate((kmers_a, kmers_b)), np.concatenate((counts_a, counts_b)))
+
+
+def reduce_counts(kmers, counts):
+    """
+    Sum the counts of repeated k-mers in (kmers, counts) arrays in any order.
+
+    Returns:
+        tuple: (sorted unique codes, counts)
+    """
+    if len(kmers) == 0:
+        return kmers.astype(KMER_DTYPE), counts.astype(COUNT_DTYPE)
+    order = np.argsort(kmers, kind='stable')
+    kmers = kmers[order]
+    counts = counts[order]
+    starts = np.flatnonzero(np.concatenate(([True], kmers[1:] != kmers[:-1])))
+    return kmers[starts], np.add.reduceat(counts, starts).astype(COUNT_DTYPE, copy=False)
+
+
+def insert_counts(kmers, counts, new_kmers, new_counts):
+    """
+    Add a sorted (kmers, counts) chunk to a sorted table without re-sorting it.
+
+    Counts of k-mers already in the table are incremented where they are;
+    the new k-mers are inserted at their sorted positions in one pass.
+
+    Returns:
+        tuple: (kmers, counts, previous counts of new_kmers, 0 where absent)
+    """
+    index = np.searchsorted(kmers, new_kmers)
+    found = np.zeros(len(new_kmers), dtype=bool)
+    inside = index < len(kmers)
+    found[inside] = kmers[index[inside]] == new_kmers[inside]
+    previous = np.zeros(len(new_kmers), dtype=COUNT_DTYPE)
+    previous[found] = counts[index[found]]
+    # Widen and copy, so read-only memory-mapped counts can be updated
+    counts = counts.astype(COUNT_DTYPE)
+    counts[index[found]] += new_counts[found]
+    missing = ~found
+    kmers = np.insert(kmers, index[missing], new_kmers[missing])
+    counts = np.insert(counts, index[missing], new_counts[missing])
+    return kmers, counts, previous
+
+
+class KmerCountTable:
+    def __init__(self, kmer_length, kmers=None, counts=None):
+        if kmer_length > MAX_ARRAY_K:
+            raise ValueError(f"Array-backed k-mer tables support k <= {MAX_ARRAY_K}, got {kmer_length}")
+        self.kmer_length = kmer_length
+        self._kmers = np.asarray(kmers if kmers is not None else [], dtype=KMER_DTYPE)
+        # Counts keep their integer dtype so memory-mapped tables stay zero-copy
+        self._counts = np.asarray(counts) if counts is not None else np.empty(0, dtype=COUNT_DTYPE)
+        self._pending = []
+        self._pending_size = 0
+
+    def add_codes(self, codes):
+        """Count a chunk of canonical packed codes into the table."""
+        if len(codes):
+            self.add_counts(*reduce_codes(codes))
+
+    def add_counts(self, kmers, counts):
+        """Add an already reduced, sorted (kmers, counts) chunk to the table."""
+        if not len(kmers):
+            return
+        self._pending.append((kmers, counts))
+        self._pending_size += len(kmers)
+        # Merge once the pending chunks outgrow the table, which keeps the
+        # total merge work proportional to n log n over the whole run.
+        if self._pending_size >= max(len(self._kmers), 1 << 20):
+            self._flush()
+
+    def update(self, kmers, counts):
+        """
+        Add a sorted (kmers, counts) chunk right away, in time proportional to
+        the chunk plus one copy of the table rather than a full re-sort.
+
+        Returns:
+            np.ndarray: Counts the chunk's k-mers had before the update
+        """
+        self._flush()
+        self._kmers, self._counts, previous = insert_counts(self._kmers, self._counts, kmers, counts)
+        return previous
+
+    def _flush(self):
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        self._pending_size = 0
+        kmers = np.concatenate([chunk[0] for chunk in pending])
+        counts = np.concatenate([chunk[1] for chunk in pending])
+        self._kmers, self._counts = merge_counts(self._kmers, self._counts, kmers, counts)
+
+    @property
+    def kmers(self):
+        """Sorted unique canonical packed k-mers."""
+        self._flush()
+        return self._kmers
+
+    @property
+    def counts(self):
+        """Counts parallel to `kmers`."""
+        self._flush()
+        return self._counts
+
+    def __len__(self):
+        return len(self.kmers)
+
+    def approximate_size(self):
+        """Upper bound on the distinct k-mers, without merging pending chunks."""
+        return len(self._kmers) + self._pending_size
+
+    def filter_min_count(self, min_count):
+        """Drop k-mers seen fewer than min_count times."""
+        keep = self.counts >= min_count
+        self._kmers = self._kmers[keep]
+        self._counts = self._counts[keep]
+
+    def spectrum(self):
+        """K-mer spectrum: entry c is the number of distinct k-mers seen c times."""
+        return np.bincount(np.asarray(self.counts, dtype=np.int64))
+
+    def lookup(self, codes):
+        """
+        Look up the counts of many canonical packed k-mers at once.
+
+        Args:
+            codes (np.ndarray): Canonical packed k-mers
+
+        Returns:
+            np.ndarray: Counts, 0 for k-mers missing from the table
+        """
+        kmers = self.kmers
+        codes = np.asarray(codes, dtype=KMER_DTYPE)
+        if not len(kmers):
+            return np.zeros(len(codes), dtype=COUNT_DTYPE)
+        index = np.searchsorted(kmers, codes)
+        index[index == len(kmers)] = 0
+        found = kmers[index] == codes
+        return np.where(found, self.counts[index], 0).astype(COUNT_DTYPE, copy=False)
+
+    def lookup_kmers(self, kmers):
+        """Counts of k-mer strings, either strand (0 for unseen k-mers)."""
+        k = self.kmer_length
+        codes = np.array([canonical_code(encode_kmer(kmer), k) for kmer in kmers], dtype=KMER_DTYPE)
+        return self.lookup(codes).tolist()
+
+    def index_of(self, code):
+        """Position of a single canonical packed k-mer in the table, or -1."""
+        kmers = self.kmers
+        # Search with a uint64 scalar; a Python int would make NumPy cast
+        # the whole table to a common dtype on every call
+        code = KMER_DTYPE(code)
+        index = int(kmers.searchsorted(code))
+        if index < len(kmers) and kmers[index] == code:
+            return index
+        return -1
+
+    def count_of(self, code):
+        """Count of a single canonical packed k-mer (0 when absent)."""
+        index = self.index_of(code)
+        return int(self._counts[index]) if index >= 0 else 0
+
+    def items(self):
+        """Iterate over (packed code, count) pairs in sorted order."""
+        return zip(self.kmers.tolist(), self.counts.tolist())
+
+    def to_dict(self):
+        """Decode the table into a k-mer string -> count dict."""
+        k = self.kmer_length
+        return {decode_kmer(code, k): count for code, count in self.items()}
@@ -0,0 +1,159 @@
+"""
+Multi-core k-mer counting with range-partitioned shards.
+
+Read batches are counted in a process pool. Each worker cuts its sorted
+batch counts into shards at fixed code boundaries, so every shard owns a
+disjoint, ordered range of canonical k-mers. The main process only queues
+the pieces of each shard; merging them into the shard's table is itself a
+pool task, so the shards are merged in parallel, in the workers. As the
+shards are ordered ranges, the final table is their concatenation in
+shard order: no counts are summed across shards and nothing is re-sorted.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from kmer_batch import READ_SEPARATOR, batch_canonical_codes
+from kmer_table import COUNT_DTYPE, KMER_DTYPE, KmerCountTable, merge_counts, reduce_codes
+
+
+# Pieces are merged into their shard once they outgrow it, as in
+# KmerCountTable, but never in rounds smaller than this many k-mers
+MIN_MERGE_SIZE = 1 << 20
+
+
+def shard_bounds(kmer_length, num_shards):
+    """
+    Code boundaries that cut canonical k-mers into ranges of similar size.
+
+    A canonical k-mer is the smaller code of its two strands, so the codes
+    of random sequence crowd the low end of the code range, with a density
+    of about 2 (1 - x) over it; the boundaries are quantiles of that density.
+
+    Args:
+        kmer_length (int): K-mer length
+        num_shards (int): Number of shards
+
+    Returns:
+        np.ndarray: num_shards - 1 increasing uint64 codes; shard i holds
+        the codes from boundary i - 1 up to, but excluding, boundary i
+    """
+    quantiles = 1 - np.sqrt(1 - np.arange(1, num_shards) / num_shards)
+    return (quantiles * float(4 ** kmer_length)).astype(KMER_DTYPE)
+
+
+def split_into_shards(kmers, counts, bounds):
+    """Cut a sorted (kmers, counts) table into per-shard sorted tables."""
+    cuts = np.concatenate(([0], np.searchsorted(kmers, bounds), [len(kmers)]))
+    return [(kmers[start:end], counts[start:end]) for start, end in zip(cuts[:-1], cuts[1:])]
+
+
+def count_batch_shards(batch_data, kmer_length, bounds):
+    """
+    Worker task: count one read batch and cut the result into shards.
+
+    Args:
+        batch_data (bytes): Reads of the batch joined by READ_SEPARATOR
+        kmer_length (int): K-mer length
+        bounds (np.ndarray): Shard boundaries from shard_bounds()
+
+    Returns:
+        list: (kmers, counts) per shard
+    """
+    kmers, counts = reduce_codes(batch_canonical_codes([batch_data], kmer_length))
+    return split_into_shards(kmers, counts, bounds)
+
+
+def merge_shard(kmers, counts, pieces):
+    """
+    Worker task: merge queued pieces into the table of one shard.
+
+    Returns:
+        tuple: (sorted unique codes, counts) of the shard
+    """
+    new_kmers = np.concatenate([piece[0] for piece in pieces])
+    new_counts = np.concatenate([piece[1] for piece in pieces])
+    return merge_counts(kmers, counts, new_kmers, new_counts)
+
+
+class ShardedKmerCounter:
+    def __init__(self, kmer_length, workers=None, num_shards=None, min_merge_size=MIN_MERGE_SIZE):
+        self.kmer_length = kmer_length
+        self.workers = workers or os.cpu_count() or 1
+        self.num_shards = num_shards or self.workers
+        self.bounds = shard_bounds(kmer_length, self.num_shards)
+        self.min_merge_size = min_merge_size
+        empty = (np.empty(0, dtype=KMER_DTYPE), np.empty(0, dtype=COUNT_DTYPE))
+        self.tables = [empty] * self.num_shards
+        self.pending = [[] for _ in range(self.num_shards)]
+        self.pending_sizes = [0] * self.num_shards
+        # Shard -> future of the merge running on it
+        self.merging = {}
+
+    def count(self, batches):
+        """
+        Count the canonical k-mers of an iterable of read batches.
+
+        At most two batches per worker are in flight, so the reader never
+        runs far ahead of the pool.
+
+        Args:
+            batches (iterable): Lists of read sequences
+
+        Returns:
+            KmerCountTable: Counts for all batches
+        """
+        max_in_flight = 2 * self.workers
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = []
+            for batch in batches:
+                # Ship the batch as one joined buffer; the separator keeps
+                # windows from spanning two reads, exactly as in the serial path
+                batch_data = READ_SEPARATOR.join(batch)
+                in_flight.append(pool.submit(count_batch_shards, batch_data, self.kmer_length, self.bounds))
+                if len(in_flight) >= max_in_flight:
+                    self._queue_pieces(pool, in_flight.pop(0).result())
+            for future in in_flight:
+                self._queue_pieces(pool, future.result())
+            # Merge the remaining pieces of all shards at once
+            self._finish_merges()
+            for shard in range(self.num_shards):
+                self._start_merge(pool, shard)
+            self._finish_merges()
+        return self.merged_table()
+
+    def _queue_pieces(self, pool, shard_counts):
+        """Queue the shard pieces of a batch and start merges on shards they filled."""
+        self._finish_merges(only_done=True)
+        for shard, (kmers, counts) in enumerate(shard_counts):
+            if not len(kmers):
+                continue
+            self.pending[shard].append((kmers, counts))
+            self.pending_sizes[shard] += len(kmers)
+            if shard not in self.merging and \
+                    self.pending_sizes[shard] >= max(len(self.tables[shard][0]), self.min_merge_size):
+                self._start_merge(pool, shard)
+
+    def _start_merge(self, pool, shard):
+        if not self.pending[shard]:
+            return
+        kmers, counts = self.tables[shard]
+        self.merging[shard] = pool.submit(merge_shard, kmers, counts, self.pending[shard])
+        self.pending[shard] = []
+        self.pending_sizes[shard] = 0
+
+    def _finish_merges(self, only_done=False):
+        """Take the tables of finished merges, waiting for running ones unless only_done."""
+        for shard, future in list(self.merging.items()):
+            if only_done and not future.done():
+                continue
+            self.tables[shard] = future.result()
+            del self.merging[shard]
+
+    def merged_table(self):
+        """Concatenate the shards, which are ordered ranges, into one sorted KmerCountTable."""
+        kmers = np.concatenate([table[0] for table in self.tables]).astype(KMER_DTYPE, copy=False)
+        counts = np.concatenate([table[1] for table in self.tables]).astype(COUNT_DTYPE, copy=False)
+        return KmerCountTable(self.kmer_length, kmers, counts)
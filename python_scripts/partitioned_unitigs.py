@@ -0,0 +1,219 @@
+"""
+Minimizer-partitioned unitig construction across worker processes.
+
+The k-mers of a read split into super-k-mers, runs of consecutive k-mers
+that share their minimizer (the smallest hashed m-mer). Partitioning the
+canonical k-mer table by minimizer therefore puts each super-k-mer, and so
+almost every edge, inside one partition. Each worker walks the
+non-branching paths of its partitions only, stopping where a path would
+step into another partition, and returns the resulting fragments. The
+parent then stitches fragments whose ends continue into each other, which
+only needs lookups for the few fragment ends, and finds the unitig links.
+
+Minimizers are taken over canonical m-mers, so a k-mer and its reverse
+complement always fall in the same partition. The workers are forked and
+read the table arrays they inherit, so only fragments travel between
+processes.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from kmer_batch import canonical_codes_of
+from kmer_encoding import kmer_mask
+from unitigs import UnitigGraph, find_links, neighbour_arrays, walk_paths
+
+
+DEFAULT_MINIMIZER_LENGTH = 9
+# Partitions per worker, so that uneven partitions even out
+PARTITIONS_PER_WORKER = 4
+
+# Table arrays inherited by forked workers: (kmers, counts, k, partition of each k-mer)
+_shared_table = None
+
+
+def hash_codes(codes):
+    """Invertible 64-bit mix of packed codes, so minimizers are not biased towards poly-A."""
+    with np.errstate(over='ignore'):
+        hashed = codes ^ (codes >> np.uint64(31))
+        hashed = hashed * np.uint64(0x7fb5d329728ea185)
+        hashed ^= hashed >> np.uint64(27)
+        hashed = hashed * np.uint64(0x81dadef4bc2dd44d)
+        hashed ^= hashed >> np.uint64(33)
+    return hashed
+
+
+def kmer_minimizers(kmers, kmer_length, minimizer_length=DEFAULT_MINIMIZER_LENGTH):
+    """
+    Hashed canonical minimizer of every packed k-mer.
+
+    Args:
+        kmers (np.ndarray): Packed k-mers
+        kmer_length (int): K-mer length
+        minimizer_length (int): Minimizer length, capped at the k-mer length
+
+    Returns:
+        np.ndarray: uint64 minimizer hashes, equal for a k-mer and its
+        reverse complement
+    """
+    length = min(minimizer_length, kmer_length)
+    mask = np.uint64(kmer_mask(length))
+    minimizers = np.full(len(kmers), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for offset in range(kmer_length - length + 1):
+        window = (kmers >> np.uint64(2 * offset)) & mask
+        np.minimum(minimizers, hash_codes(canonical_codes_of(window, length)), out=minimizers)
+    return minimizers
+
+
+def minimizer_partitions(kmers, kmer_length, num_partitions, minimizer_length=DEFAULT_MINIMIZER_LENGTH):
+    """Partition number of every k-mer, from its minimizer."""
+    minimizers = kmer_minimizers(kmers, kmer_length, minimizer_length)
+    return ((minimizers >> np.uint64(32)) % np.uint64(num_partitions)).astype(np.int32)
+
+
+def _walk_partition(partition):
+    kmers, counts, kmer_length, partitions = _shared_table
+    members = np.flatnonzero(partitions == partition)
+    return walk_paths(kmers, counts, kmer_length, members)
+
+
+def _next_oriented(kmers, kmer_length, indices, strands):
+    """
+    Unique successor of each oriented k-mer, if it has no other predecessor.
+
+    Returns:
+        tuple: (index, strand) arrays; index is -1 where the path ends
+    """
+    # Successors of the reverse strand are the (flipped) predecessors of
+    # the canonical k-mer
+    forward = strands == 0
+    out_degree, succ_index, succ_strand = neighbour_arrays(kmers, kmer_length, True, indices)
+    in_degree, pred_index, pred_strand = neighbour_arrays(kmers, kmer_length, False, indices)
+    degree = np.where(forward, out_degree, in_degree)
+    following = np.where(forward, succ_index, pred_index)
+    following_strand = np.where(forward, succ_strand, 1 - pred_strand).astype(np.int64)
+    unique = np.flatnonzero(degree == 1)
+
+    following_index = np.full(len(indices), -1, dtype=np.int64)
+    out_degree, _, _ = neighbour_arrays(kmers, kmer_length, True, following[unique])
+    in_degree, _, _ = neighbour_arrays(kmers, kmer_length, False, following[unique])
+    following_in = np.where(following_strand[unique] == 0, in_degree, out_degree)
+    joined = unique[following_in == 1]
+    following_index[joined] = following[joined]
+    return following_index, following_strand
+
+
+def stitch_fragments(fragments, kmers, kmer_length):
+    """
+    Join path fragments that continue into each other into unitigs.
+
+    A fragment end continues into another fragment when its unique
+    successor has no other predecessor; the successor then starts (or,
+    entered in reverse, ends) a fragment of a neighbouring partition.
+    Chains are walked like k-mer paths in unitigs.walk_paths, from a seed
+    fragment in both directions, so cycles stop where they close.
+
+    Args:
+        fragments (list): UnitigGraph fragments of every partition
+        kmers (np.ndarray): Sorted canonical packed k-mers of the table
+        kmer_length (int): K-mer length
+
+    Returns:
+        UnitigGraph: Unitigs without links
+    """
+    k = kmer_length
+    merged = UnitigGraph(k)
+    for graph in fragments:
+        merged.sequences.extend(graph.sequences)
+        merged.lengths.extend(graph.lengths)
+        merged.kmer_totals.extend(graph.kmer_totals)
+        merged.total_coverage.extend(graph.total_coverage)
+        merged.first_kmer.extend(graph.first_kmer)
+        merged.last_kmer.extend(graph.last_kmer)
+    count = len(merged)
+    if not count:
+        return merged
+
+    # Oriented k-mer -> (fragment, orientation) it starts
+    starts = {}
+    for fragment in range(count):
+        starts[merged.first_kmer[fragment]] = (fragment, 0)
+        index, strand = merged.last_kmer[fragment]
+        starts[(index, 1 - strand)] = (fragment, 1)
+
+    # Orientation 0 leaves through the last k-mer, 1 through the flipped first k-mer
+    exits = np.array(merged.last_kmer + [(index, 1 - strand) for index, strand in merged.first_kmer],
+                     dtype=np.int64)
+    following_index, following_strand = _next_oriented(kmers, k, exits[:, 0], exits[:, 1])
+    following_index = following_index.tolist()
+    following_strand = following_strand.tolist()
+
+    def next_fragment(fragment, orientation):
+        exit = fragment + orientation * count
+        if following_index[exit] < 0:
+            return None
+        return starts.get((following_index[exit], following_strand[exit]))
+
+    def walk(fragment, orientation):
+        chain = []
+        current = (fragment, orientation)
+        while True:
+            following = next_fragment(*current)
+            if following is None or visited[following[0]]:
+                return chain
+            visited[following[0]] = 1
+            chain.append(following)
+            current = following
+
+    unitigs = UnitigGraph(k)
+    visited = bytearray(count)
+    for seed in range(count):
+        if visited[seed]:
+            continue
+        visited[seed] = 1
+        forward_chain = walk(seed, 0)
+        backward_chain = walk(seed, 1)
+        chain = [(fragment, 1 - orientation) for fragment, orientation in reversed(backward_chain)]
+        chain.append((seed, 0))
+        chain.extend(forward_chain)
+        unitigs.add_chain(merged, chain)
+    return unitigs
+
+
+def build_unitigs_partitioned(table, workers, num_partitions=None, minimizer_length=DEFAULT_MINIMIZER_LENGTH):
+    """
+    Compact a canonical k-mer count table into its unitig graph in parallel.
+
+    Gives the same unitigs as unitigs.build_unitigs, up to the choice of
+    starting k-mer on circular unitigs.
+
+    Args:
+        table (KmerCountTable): Canonical k-mer counts
+        workers (int): Worker processes; partitions are walked in this
+            process when 1 or when fork is unavailable
+        num_partitions (int): Minimizer partitions (PARTITIONS_PER_WORKER
+            per worker by default)
+        minimizer_length (int): Minimizer length
+
+    Returns:
+        UnitigGraph: Unitigs with coverage and links
+    """
+    global _shared_table
+    k = table.kmer_length
+    num_partitions = num_partitions or max(workers, 1) * PARTITIONS_PER_WORKER
+    partitions = minimizer_partitions(table.kmers, k, num_partitions, minimizer_length)
+    _shared_table = (table.kmers, table.counts, k, partitions)
+    try:
+        if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                fragments = list(executor.map(_walk_partition, range(num_partitions)))
+        else:
+            fragments = [_walk_partition(partition) for partition in range(num_partitions)]
+    finally:
+        _shared_table = None
+    graph = stitch_fragments(fragments, table.kmers, k)
+    graph.links = find_links(graph, table.kmers)
+    return graph
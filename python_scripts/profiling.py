@@ -0,0 +1,208 @@
+"""
+Stage profiling and throughput reporting.
+
+A StageProfiler accumulates wall and CPU time per named stage (reading,
+counting, graph construction, ...), counts reads and k-mers as they are
+processed, samples the k-mer table size and reports progress on stderr at
+a fixed interval. Stage times are exclusive: when stages nest (reading
+batches inside a counting call), the inner time is not counted again in
+the outer stage. Stages that run in helper threads (the inflate and parse
+threads of the ingestion pipeline) overlap the others instead. At the end
+of a run it produces a JSON-serializable summary that includes the peak
+RSS.
+
+Code paths always talk to a profiler; when profiling is off they get the
+NullProfiler, whose methods do nothing, so instrumented loops cost one
+no-op call per batch.
+
+CPU time is process time, so it includes helper threads (BGZF
+decompression) but not worker processes, whose peak RSS is reported
+separately.
+"""
+
+import contextlib
+import json
+import resource
+import sys
+import time
+
+
+DEFAULT_PROGRESS_INTERVAL = 5.0
+
+
+def peak_rss_bytes(who=resource.RUSAGE_SELF):
+    """Peak resident set size of this process (or of its waited-for children)."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageTimer:
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.calls = 0
+
+
+class StageProfiler:
+    enabled = True
+
+    def __init__(self, progress_interval=DEFAULT_PROGRESS_INTERVAL, stream=None):
+        self.progress_interval = progress_interval
+        self.stream = stream if stream is not None else sys.stderr
+        self.stages = {}
+        self.reads = 0
+        self.kmers = 0
+        # (seconds since start, distinct k-mers) samples
+        self.table_sizes = []
+        self._size_probe = None
+        # Inclusive wall/CPU time of the nested stages of each open stage
+        self._open_stages = []
+        self._start = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._last_report = self._start
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a block of work under a stage name; repeated blocks accumulate."""
+        nested = [0.0, 0.0]
+        self._open_stages.append(nested)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            self._open_stages.pop()
+            if self._open_stages:
+                self._open_stages[-1][0] += wall
+                self._open_stages[-1][1] += cpu
+            self.add_stage_time(name, wall - nested[0], cpu - nested[1])
+
+    def add_stage_time(self, name, wall, cpu=0.0, calls=1):
+        """Add time measured elsewhere, such as in a pipeline thread, to a stage."""
+        timer = self.stages.get(name)
+        if timer is None:
+            timer = self.stages[name] = StageTimer()
+        timer.wall += wall
+        timer.cpu += cpu
+        timer.calls += calls
+
+    def iter_stage(self, name, iterable):
+        """Yield from an iterable, timing each step as the named stage."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def set_size_probe(self, probe):
+        """Register a callable returning the current number of distinct k-mers (or None)."""
+        self._size_probe = probe
+
+    def add(self, reads=0, kmers=0):
+        """Count processed reads and k-mers, reporting progress when the interval has passed."""
+        self.reads += reads
+        self.kmers += kmers
+        now = time.perf_counter()
+        if now - self._last_report >= self.progress_interval:
+            self._last_report = now
+            self.sample_table_size()
+            self.report_progress()
+
+    def sample_table_size(self):
+        size = self._size_probe() if self._size_probe is not None else None
+        if size is not None:
+            self.table_sizes.append((round(self.elapsed(), 3), int(size)))
+        return size
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def report_progress(self):
+        elapsed = self.elapsed()
+        message = (f"[profile] {elapsed:8.1f}s  reads {self.reads} ({self.reads / elapsed:,.0f}/s)  "
+                   f"k-mers {self.kmers} ({self.kmers / elapsed:,.0f}/s)")
+        if self.table_sizes:
+            message += f"  table {self.table_sizes[-1][1]}"
+        message += f"  rss {peak_rss_bytes() / 2 ** 20:,.0f} MB"
+        print(message, file=self.stream, flush=True)
+
+    def summary(self):
+        """
+        Return the profile as a JSON-serializable dict.
+
+        Returns:
+            dict: Totals, throughput, per-stage wall/CPU seconds, table size
+            samples and peak RSS
+        """
+        self.sample_table_size()
+        elapsed = self.elapsed()
+        return {
+            'wall_seconds': elapsed,
+            'cpu_seconds': time.process_time() - self._start_cpu,
+            'reads': self.reads,
+            'kmers': self.kmers,
+            'reads_per_second': self.reads / elapsed if elapsed else 0.0,
+            'kmers_per_second': self.kmers / elapsed if elapsed else 0.0,
+            'stages': {
+                name: {'wall_seconds': timer.wall, 'cpu_seconds': timer.cpu, 'calls': timer.calls}
+                for name, timer in self.stages.items()
+            },
+            'table_sizes': self.table_sizes,
+            'peak_rss_bytes': peak_rss_bytes(),
+            'children_peak_rss_bytes': peak_rss_bytes(resource.RUSAGE_CHILDREN),
+        }
+
+    def print_summary(self):
+        summary = self.summary()
+        print("\n=== Profile ===", file=self.stream)
+        for name, stage in summary['stages'].items():
+            print(f"  {name:<12} wall {stage['wall_seconds']:8.2f}s  cpu {stage['cpu_seconds']:8.2f}s  "
+                  f"calls {stage['calls']}", file=self.stream)
+        print(f"  {'total':<12} wall {summary['wall_seconds']:8.2f}s  cpu {summary['cpu_seconds']:8.2f}s",
+              file=self.stream)
+        print(f"  Reads: {summary['reads']} ({summary['reads_per_second']:,.0f}/s), "
+              f"k-mers: {summary['kmers']} ({summary['kmers_per_second']:,.0f}/s)", file=self.stream)
+        print(f"  Peak RSS: {summary['peak_rss_bytes'] / 2 ** 20:,.1f} MB", file=self.stream)
+        return summary
+
+    def write_summary(self, path):
+        """Print the summary on stderr and write it as JSON to path ('-' for stderr)."""
+        summary = self.print_summary()
+        if path == '-':
+            json.dump(summary, self.stream, indent=2)
+            self.stream.write('\n')
+        elif path:
+            with open(path, 'w') as f:
+                json.dump(summary, f, indent=2)
+                f.write('\n')
+        return summary
+
+
+class NullProfiler:
+    """Profiler stand-in used when profiling is off; every method is a no-op."""
+    enabled = False
+
+    _NO_STAGE = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._NO_STAGE
+
+    def iter_stage(self, name, iterable):
+        return iterable
+
+    def add_stage_time(self, name, wall, cpu=0.0, calls=1):
+        pass
+
+    def set_size_probe(self, probe):
+        pass
+
+    def add(self, reads=0, kmers=0):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
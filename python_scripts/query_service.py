@@ -0,0 +1,288 @@
+"""
+Long-lived k-mer and path queries over a loaded count index.
+
+Mapping a k-mer index (kmer_index) is near-instant, but starting a process
+for every question is not. A KmerQueryService keeps the sorted canonical
+k-mers and their counts loaded and answers each batch of queries with one
+vectorized search: the queries are packed and canonicalized with NumPy and
+looked up together by binary search over the sorted table, in sorted
+order (graph_analysis.search_sorted).
+
+Queries follow the graph's conventions: nodes are (k-1)-mers, and the edge
+u -> v exists, with its count, when the k-mer u + v[-1] or its reverse
+complement was counted. The line protocol answers one request line with
+one reply line:
+
+    count KMER...          count of each k-mer (either strand), 0 if unseen
+    neighbours NODE...     per node, the bases b of its edges out to
+                           NODE[1:] + b and in from b + NODE[:-1], as
+                           'out:A=3,T=1;in:G=4' ('-' when there are none)
+    path SEQUENCE...       'yes' when all k-mers of a sequence are in the
+                           graph, so the sequence spells a path, else 'no'
+    coverage SEQUENCE      count of each k-mer along the sequence
+    info                   k and the number of k-mers
+    quit                   end the session
+
+serve_stream speaks it over a pair of text streams such as stdin and
+stdout, make_server over a local Unix or TCP socket, one thread per
+connection. Malformed requests get an 'error <message>' reply and the
+session goes on.
+"""
+
+import io
+import os
+import stat
+
+import numpy as np
+
+from graph_analysis import search_sorted
+from kmer_batch import canonical_codes_of, pack_kmers, sequences_to_bases, window_codes
+from kmer_encoding import BASES, reverse_complement
+from kmer_index import KmerIndex
+from kmer_table import KMER_DTYPE, MAX_ARRAY_K
+
+
+class KmerQueryService:
+    def __init__(self, kmer_length, kmers, counts):
+        """
+        Args:
+            kmer_length (int): K-mer length, at most 32
+            kmers (np.ndarray): Sorted canonical packed k-mers, possibly memory-mapped
+            counts (np.ndarray): Counts parallel to kmers
+        """
+        if kmer_length > MAX_ARRAY_K:
+            raise ValueError(f"Queries need packed k-mers, k <= {MAX_ARRAY_K}; got {kmer_length}")
+        self.kmer_length = kmer_length
+        self.kmers = kmers
+        self.counts = counts
+
+    @classmethod
+    def from_index(cls, path):
+        """Serve the memory-mapped counts of a k-mer index file."""
+        index = KmerIndex(path)
+        return cls(index.kmer_length, index.kmers, index.counts)
+
+    def __len__(self):
+        return len(self.kmers)
+
+    def lookup(self, codes):
+        """
+        Counts of canonical packed k-mers.
+
+        Args:
+            codes (np.ndarray): Canonical packed k-mers
+
+        Returns:
+            np.ndarray: int64 counts, 0 for k-mers missing from the table
+        """
+        codes = np.asarray(codes, dtype=KMER_DTYPE)
+        if not len(self.kmers):
+            return np.zeros(len(codes), dtype=np.int64)
+        index, found = search_sorted(self.kmers, codes)
+        return np.where(found, self.counts[index], 0).astype(np.int64, copy=False)
+
+    def _encode(self, sequences, length):
+        """Forward packed codes of sequences of exactly `length` A/C/G/T bases."""
+        codes, valid = pack_kmers(sequences, length)
+        invalid = np.flatnonzero(~valid)
+        if len(invalid):
+            raise ValueError(f"'{sequences[invalid[0]]}' contains bases other than A/C/G/T")
+        return codes
+
+    def kmer_counts(self, kmers):
+        """
+        Counts of k-mer strings, either strand.
+
+        Returns:
+            np.ndarray: int64 counts, 0 for unseen k-mers
+
+        Raises:
+            ValueError: When a k-mer has the wrong length or a non-ACGT base
+        """
+        return self.lookup(canonical_codes_of(self._encode(kmers, self.kmer_length), self.kmer_length))
+
+    def neighbour_counts(self, nodes):
+        """
+        Counts of the edges around (k-1)-mer nodes.
+
+        Args:
+            nodes (list): Node sequences of k - 1 bases
+
+        Returns:
+            tuple: (out, in) int64 arrays of shape (nodes, 4); out[i, b] is
+            the count of the edge from node i to node[1:] + BASES[b] and
+            in[i, b] that of the edge from BASES[b] + node[:-1] to node i
+        """
+        k = self.kmer_length
+        codes = self._encode(nodes, k - 1)[:, None]
+        bases = np.arange(4, dtype=KMER_DTYPE)
+        outgoing = (codes << np.uint64(2)) | bases
+        incoming = (bases << np.uint64(2 * (k - 1))) | codes
+        edges = canonical_codes_of(np.concatenate((outgoing.ravel(), incoming.ravel())), k)
+        counts = self.lookup(edges).reshape(2, len(nodes), 4)
+        return counts[0], counts[1]
+
+    def coverages(self, sequences):
+        """
+        Count of every k-mer along each sequence, looked up in one batch.
+
+        Returns:
+            list: One int64 array per sequence, with an entry per k-mer
+            position; k-mers with non-ACGT bases count 0
+        """
+        k = self.kmer_length
+        codes, valid = window_codes(sequences_to_bases(sequences), k)
+        counts = np.zeros(len(codes), dtype=np.int64)
+        counts[valid] = self.lookup(canonical_codes_of(codes[valid], k))
+        coverages = []
+        start = 0
+        for sequence in sequences:
+            positions = max(len(sequence) - k + 1, 0)
+            coverages.append(counts[start:start + positions])
+            start += len(sequence) + 1
+        return coverages
+
+    def paths_exist(self, sequences):
+        """Whether each sequence spells a path of the graph: it has k-mers, and all of them were counted."""
+        return [len(coverage) > 0 and bool(coverage.all()) for coverage in self.coverages(sequences)]
+
+
+def print_kmer_analysis(kmer, forward_count, reverse_count=None):
+    """
+    Print the reverse complement relationships of a k-mer and whether its
+    edges are in the graph.
+
+    Args:
+        kmer (str): K-mer to analyze
+        forward_count (int): Count of the edge kmer[:-1] -> kmer[1:], 0 if absent
+        reverse_count (int): Count of the reverse complement edge; the
+            same as forward_count by default, as both come from the
+            count of the canonical k-mer
+    """
+    if reverse_count is None:
+        reverse_count = forward_count
+    rev_comp = reverse_complement(kmer)
+    print(f"\n=== Reverse Complement Analysis for '{kmer}' ===")
+    print(f"  Original k-mer: {kmer}")
+    print(f"  Reverse complement: {rev_comp}")
+    print(f"  Canonical form: {min(kmer, rev_comp)}")
+    print(f"  Self-complementary: {'Yes' if kmer == rev_comp else 'No'}")
+    print(f"  Forward edge: {kmer[:-1]} -> {kmer[1:]}")
+    print(f"  Reverse complement edge: {rev_comp[:-1]} -> {rev_comp[1:]}")
+    for name, count in (('Forward', forward_count), ('Reverse', reverse_count)):
+        if count:
+            print(f"  {name} edge exists in graph: Yes (count: {count})")
+        else:
+            print(f"  {name} edge exists in graph: No")
+
+
+def _base_counts(counts):
+    return ','.join(f"{BASES[base]}={count}" for base, count in enumerate(counts) if count) or '-'
+
+
+def handle_request(service, line):
+    """
+    Answer one protocol request.
+
+    Args:
+        service (KmerQueryService): Loaded counts
+        line (str): Request line
+
+    Returns:
+        str: Reply line without its newline, or None when the session ends
+    """
+    fields = line.split()
+    if not fields:
+        return "error empty request"
+    command, arguments = fields[0].lower(), fields[1:]
+    try:
+        if command == 'quit':
+            return None
+        if command == 'info':
+            return f"k={service.kmer_length} kmers={len(service)}"
+        if command not in ('count', 'neighbours', 'neighbors', 'path', 'coverage'):
+            raise ValueError(f"unknown command '{command}'")
+        if not arguments:
+            raise ValueError(f"'{command}' needs at least one argument")
+        if command == 'count':
+            return ' '.join(map(str, service.kmer_counts(arguments).tolist()))
+        if command in ('neighbours', 'neighbors'):
+            outgoing, incoming = service.neighbour_counts(arguments)
+            return ' '.join(f"out:{_base_counts(out_counts)};in:{_base_counts(in_counts)}"
+                            for out_counts, in_counts in zip(outgoing.tolist(), incoming.tolist()))
+        if command == 'path':
+            return ' '.join('yes' if exists else 'no' for exists in service.paths_exist(arguments))
+        if len(arguments) != 1:
+            raise ValueError("'coverage' takes one sequence")
+        return ' '.join(map(str, service.coverages(arguments)[0].tolist()))
+    except ValueError as error:
+        return f"error {error}"
+
+
+def serve_stream(service, infile, outfile):
+    """
+    Answer request lines from infile on outfile until 'quit' or the end of
+    the input. Blank lines are skipped.
+
+    Returns:
+        int: Number of requests answered
+    """
+    answered = 0
+    for line in infile:
+        if not line.strip():
+            continue
+        reply = handle_request(service, line)
+        if reply is None:
+            break
+        outfile.write(reply + '\n')
+        outfile.flush()
+        answered += 1
+    return answered
+
+
+def make_server(service, address):
+    """
+    Create a socket server for the protocol, one thread per connection.
+
+    Args:
+        service (KmerQueryService): Loaded counts, shared read-only by the connections
+        address (str or tuple): Unix socket path, or (host, port) for TCP
+
+    Returns:
+        socketserver.BaseServer: Bound server; call serve_forever() to run it
+    """
+    # Imported here so that stdin sessions and the Python API do not load it
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            infile = io.TextIOWrapper(self.rfile, encoding='ascii', errors='replace')
+            outfile = io.TextIOWrapper(self.wfile, encoding='ascii', write_through=True)
+            serve_stream(service, infile, outfile)
+
+    if isinstance(address, tuple):
+        base_class = socketserver.ThreadingTCPServer
+    else:
+        base_class = socketserver.ThreadingUnixStreamServer
+        # Replace the socket a previous server left behind, but nothing else
+        if os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+            os.unlink(address)
+
+    class Server(base_class):
+        allow_reuse_address = True
+        daemon_threads = True
+
+    return Server(address, Handler)
+
+
+def serve_socket(service, address):
+    """Serve the protocol on a local socket until interrupted."""
+    server = make_server(service, address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if not isinstance(address, tuple) and os.path.exists(address):
+            os.unlink(address)
@@ -1,54 +1,513 @@
-import gzip
-from Bio import SeqIO
 import argparse
+import os
+
+import numpy as np
+
+from fastq_reader import FastqReader
+from incremental_index import remove_inputs, write_inputs
+from ingest_pipeline import BatchPipeline
+from kmer_batch import batch_canonical_codes, batch_multi_canonical_codes
+from kmer_index import input_checksum, load_matching_index, write_index
+from kmer_encoding import canonical_code, decode_kmer, encode_kmer, iter_canonical_codes, reverse_complement
+from kmer_table import COUNT_DTYPE, KMER_DTYPE, MAX_ARRAY_K, KmerCountTable
+from profiling import NULL_PROFILER, StageProfiler
+from sample_counts import count_files, merge_sample_tables, resolve_inputs
+
+
+COUNTING_METHODS = ('packed', 'numpy', 'string')
+
+DEFAULT_BATCH_SIZE = 10000
+
+# Memory given to the count-min sketch when filtering solid k-mers
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+
+def default_method(kmer_length, workers=1, min_count=1, max_memory_mb=None):
+    """Counting method to use when none is requested explicitly."""
+    if (workers > 1 or min_count > 1 or max_memory_mb is not None) and kmer_length <= MAX_ARRAY_K:
+        return 'numpy'
+    return 'packed'
 
 
 class FastqProcessor:
-    def __init__(self, reads_file, kmer_length=6):
+    def __init__(self, reads_file, kmer_length=6, method='packed', batch_size=DEFAULT_BATCH_SIZE, workers=1,
+                 min_count=1, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, max_memory_mb=None, work_dir=None,
+                 index_path=None, profiler=None, queue_depth=None, samples=None):
+        if method not in COUNTING_METHODS:
+            raise ValueError(f"Unknown counting method '{method}', expected one of {COUNTING_METHODS}")
+        # A list of k counts every k in the same scan; the first one is the
+        # primary k that the single-k accessors refer to
+        kmer_lengths = tuple(dict.fromkeys(kmer_length)) if isinstance(kmer_length, (list, tuple)) \
+            else (kmer_length,)
+        kmer_length = kmer_lengths[0]
+        if len(kmer_lengths) > 1:
+            if method != 'numpy' or max(kmer_lengths) > MAX_ARRAY_K:
+                raise ValueError(f"Multi-k counting requires the 'numpy' method and k <= {MAX_ARRAY_K}")
+            if workers > 1 or max_memory_mb is not None or index_path is not None:
+                raise ValueError("Multi-k counting runs in one process, without disk buckets or indexes")
+        if workers > 1 and method != 'numpy':
+            raise ValueError("Parallel counting (workers > 1) requires the 'numpy' method")
+        if max_memory_mb is not None and method != 'numpy':
+            raise ValueError("Disk-backed counting (max_memory_mb) requires the 'numpy' method")
+        if index_path is not None and (method == 'string' or kmer_length > MAX_ARRAY_K):
+            raise ValueError(f"K-mer indexes require the 'packed' or 'numpy' method and k <= {MAX_ARRAY_K}")
+        if samples is not None:
+            if method != 'numpy' or len(kmer_lengths) > 1 or kmer_length > MAX_ARRAY_K:
+                raise ValueError(f"Per-sample counts require the 'numpy' method and a single k <= {MAX_ARRAY_K}")
+            if max_memory_mb is not None or index_path is not None:
+                raise ValueError("Per-sample counts are kept in memory, without disk buckets or indexes")
+            reads_file = [path for paths in samples.values() for path in paths]
         self.reads_file = reads_file
+        # Every input file; lists of files are read one after another
+        self.reads_files = [reads_file] if isinstance(reads_file, (str, os.PathLike)) else list(reads_file or [])
+        # Sample name -> files; when set, counts are also kept per sample
+        self.samples = samples
+        self.sample_counts = None
         self.kmer_length = kmer_length
+        self.kmer_lengths = kmer_lengths
+        self.method = method
+        self.batch_size = batch_size
+        self.workers = workers
+        # K-mers seen fewer than min_count times are dropped as likely errors
+        self.min_count = min_count
+        self.memory_budget_mb = memory_budget_mb
+        # When set, k-mers are counted through on-disk buckets under work_dir
+        self.max_memory_mb = max_memory_mb
+        self.work_dir = work_dir
+        self.external_table = None
+        self._scratch_dir = None
+        # Saved counts are reused from index_path when they match this input
+        self.index_path = index_path
+        self.kmer_index = None
+        self._checksum = None
+        # String-keyed counts for the 'string' method
         self.kmer_counts = {}
-    
+        # Canonical 2-bit packed code -> count for the 'packed' method
+        self.packed_counts = {}
+        # Sorted packed code / count arrays for the 'numpy' method
+        self.count_table = KmerCountTable(kmer_length) if method == 'numpy' else None
+        # Tables of the other k values when counting several at once
+        self.extra_tables = {k: KmerCountTable(k) for k in kmer_lengths[1:]}
+        # Stage timings and throughput; a no-op unless profiling is on
+        self.profiler = profiler or NULL_PROFILER
+        # When set, reads are inflated and parsed in pipeline threads that
+        # stay up to this many blocks and batches ahead of the counting
+        self.queue_depth = queue_depth
+
     def reverse_complement(self, sequence):
-        complement = str.maketrans('ACGTacgt', 'TGCAtgca')
-        return sequence.translate(complement)[::-1]
-    
+        return reverse_complement(sequence)
+
     def process_fastq(self):
-        with gzip.open(self.reads_file, 'rt') as f:
-            for record in SeqIO.parse(f, "fastq"):
-                seq = str(record.seq)
-                for i in range(len(seq) - self.kmer_length + 1):
-                    kmer = seq[i:i+self.kmer_length]
-                    revcomp = self.reverse_complement(kmer)
-                    canonical = min(kmer, revcomp)
-                    
-                    if canonical in self.kmer_counts:
-                        self.kmer_counts[canonical] += 1
-                    else:
-                        self.kmer_counts[canonical] = 1
-    
+        profiler = self.profiler
+        profiler.set_size_probe(self.table_size)
+        if self.index_path is not None:
+            with profiler.stage('index'):
+                if self.load_index(self.index_path):
+                    return
+        if self.method == 'numpy':
+            self._process_batches()
+        else:
+            for batch in self.iter_batches():
+                with profiler.stage('count'):
+                    for seq in batch:
+                        if self.method == 'packed':
+                            self._count_packed(seq)
+                        else:
+                            self._count_strings(bytes(seq).decode('ascii'))
+        if self.min_count > 1 and self.external_table is None:
+            with profiler.stage('filter'):
+                self._drop_weak_kmers()
+        if self.index_path is not None:
+            with profiler.stage('index'):
+                self.save_index(self.index_path)
+
+    def table_size(self):
+        """
+        Distinct k-mers counted so far, or None while counting happens in
+        worker processes or on disk.
+        """
+        if self.count_table is not None:
+            if (self.workers > 1 or self.max_memory_mb is not None) and self.external_table is None:
+                return None
+            return self.count_table.approximate_size()
+        if self.method == 'packed':
+            return len(self.packed_counts)
+        return len(self.kmer_counts)
+
+    def input_checksum(self):
+        """Digest of the input file, computed once."""
+        if self._checksum is None:
+            self._checksum = input_checksum(self.reads_file)
+        return self._checksum
+
+    def load_index(self, path):
+        """
+        Memory-map saved counts if they were built from this input with the
+        same k and abundance threshold.
+
+        Returns:
+            bool: True if the index was loaded
+        """
+        index = load_matching_index(path, self.kmer_length, self.input_checksum(), self.min_count)
+        if index is None:
+            return False
+        print(f"Reusing k-mer index {path} ({len(index)} k-mers)")
+        self.kmer_index = index
+        self.count_table = KmerCountTable(self.kmer_length, index.kmers, index.counts)
+        return True
+
+    def save_index(self, path):
+        """
+        Write the counts to a k-mer index file for later runs, with the
+        list of input files that lets --add-reads extend it. Filtered counts
+        cannot be extended, so they get no list.
+        """
+        kmers, counts = self.get_count_arrays()
+        write_index(path, self.kmer_length, kmers, counts, self.input_checksum(), self.min_count)
+        if self.min_count > 1:
+            remove_inputs(path)
+            return
+        if len(self.reads_files) == 1:
+            digests = [self.input_checksum()]
+        else:
+            digests = [input_checksum(reads_file) for reads_file in self.reads_files]
+        write_inputs(path, [(digest.hex(), str(reads_file)) for digest, reads_file in zip(digests, self.reads_files)])
+
+    def iter_reads(self):
+        """Yield each read sequence of the input files as a bytes-like view."""
+        for path in self.reads_files:
+            yield from FastqReader(path, threads=self.workers)
+
+    def iter_batches(self, track=True):
+        """
+        Yield the reads of the input file in lists of `batch_size` sequences.
+
+        Reading is timed as the 'read' stage. With `track`, the reads and
+        k-mers of each batch are added to the profiler's totals; passes
+        that re-read the input turn it off.
+        """
+        profiler = self.profiler
+        for batch in profiler.iter_stage('read', self._read_batches()):
+            if track and profiler.enabled:
+                k = self.kmer_length
+                profiler.add(reads=len(batch), kmers=sum(max(len(seq) - k + 1, 0) for seq in batch))
+            yield batch
+
+    def _read_batches(self):
+        if self.queue_depth:
+            for path in self.reads_files:
+                reader = FastqReader(path, threads=self.workers)
+                yield from BatchPipeline(reader, self.batch_size, self.queue_depth, self.profiler)
+            return
+        batch = []
+        for seq in self.iter_reads():
+            batch.append(seq)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _process_batches(self):
+        if self.max_memory_mb is not None:
+            self._count_external()
+            return
+        if self.samples is not None or (self.workers > 1 and len(self.reads_files) > 1):
+            self._count_files()
+            return
+        if self.workers > 1:
+            # The process-pool counters are imported on use; plain counting
+            # runs should not pay for loading multiprocessing
+            from parallel_counting import ShardedKmerCounter
+            counter = ShardedKmerCounter(self.kmer_length, self.workers)
+            with self.profiler.stage('count'):
+                self.count_table = counter.count(self.iter_batches())
+            return
+        if self.extra_tables:
+            # Exact counts per k, filtered at the end: a sketch per k would
+            # split the memory budget between the tables
+            for batch in self.iter_batches():
+                with self.profiler.stage('count'):
+                    self._count_multi_batch(batch)
+            return
+        if self.min_count > 1:
+            self._count_solid_batches()
+            return
+        for batch in self.iter_batches():
+            with self.profiler.stage('count'):
+                self._count_batch(batch)
+
+    def _count_files(self):
+        """
+        Count whole input files concurrently and merge them per sample.
+
+        The shared count table holds the totals over all files; with
+        samples, sample_counts also keeps one column per sample.
+        """
+        samples = self.samples or {None: self.reads_files}
+        sample_of = {path: name for name, paths in samples.items() for path in paths}
+        tables = {name: KmerCountTable(self.kmer_length) for name in samples}
+        with self.profiler.stage('count'):
+            for path, kmers, counts, reads, occurrences in count_files(list(sample_of), self.kmer_length,
+                                                                       self.batch_size, self.workers):
+                tables[sample_of[path]].add_counts(kmers, counts)
+                self.profiler.add(reads=reads, kmers=occurrences)
+            if self.samples is None:
+                self.count_table = tables[None]
+                return
+            self.sample_counts = merge_sample_tables(
+                self.kmer_length, {name: (table.kmers, table.counts) for name, table in tables.items()})
+            self.count_table = KmerCountTable(self.kmer_length, self.sample_counts.kmers, self.sample_counts.totals())
+
+    def _count_external(self):
+        """
+        Count through prefix-partitioned bucket files so memory use stays
+        near max_memory_mb regardless of input size.
+
+        The abundance threshold is applied exactly while the buckets are
+        counted, so no sketch pass is needed.
+        """
+        from external_counting import ExternalKmerCounter, make_work_dir
+        work_dir = self.work_dir
+        if work_dir is None:
+            self._scratch_dir = make_work_dir()
+            work_dir = self._scratch_dir.name
+        counter = ExternalKmerCounter(self.kmer_length, work_dir, self.max_memory_mb,
+                                      workers=self.workers, min_count=self.min_count)
+        with self.profiler.stage('count'):
+            self.external_table = counter.count(self.iter_batches())
+        self.count_table = KmerCountTable(self.kmer_length, self.external_table.kmers, self.external_table.counts)
+
+    def _count_solid_batches(self):
+        """
+        Two-pass counting that only gives exact counters to solid k-mers.
+
+        The first pass feeds every k-mer into a count-min sketch of
+        memory_budget_mb; the second pass counts exactly only the k-mers whose
+        sketch estimate reaches min_count. Estimates never undercount, so no
+        solid k-mer is lost.
+        """
+        from solid_filter import CountMinSketch
+        sketch = CountMinSketch(self.memory_budget_mb * 1024 * 1024)
+        for batch in self.iter_batches(track=False):
+            with self.profiler.stage('sketch'):
+                sketch.add(batch_canonical_codes(batch, self.kmer_length))
+        for batch in self.iter_batches():
+            with self.profiler.stage('count'):
+                codes = batch_canonical_codes(batch, self.kmer_length)
+                self.count_table.add_codes(codes[sketch.estimate(codes) >= self.min_count])
+
+    def _drop_weak_kmers(self):
+        if self.sample_counts is not None:
+            self.sample_counts.filter_min_count(self.min_count)
+        for table in self.extra_tables.values():
+            table.filter_min_count(self.min_count)
+        if self.count_table is not None:
+            self.count_table.filter_min_count(self.min_count)
+        elif self.method == 'packed':
+            self.packed_counts = {code: count for code, count in self.packed_counts.items() if count >= self.min_count}
+        else:
+            self.kmer_counts = {kmer: count for kmer, count in self.kmer_counts.items() if count >= self.min_count}
+
+    def _count_batch(self, sequences):
+        """
+        Count the canonical k-mers of a batch of reads with vector operations.
+
+        Per-batch counts come from a sort-and-reduce and are merged into the
+        running count table.
+        """
+        self.count_table.add_codes(batch_canonical_codes(sequences, self.kmer_length))
+
+    def _count_multi_batch(self, sequences):
+        """Count a batch of reads for every k, parsing and encoding it once."""
+        for k, codes in batch_multi_canonical_codes(sequences, self.kmer_lengths).items():
+            self.get_count_table(k).add_codes(codes)
+
+    def _count_strings(self, seq):
+        for i in range(len(seq) - self.kmer_length + 1):
+            kmer = seq[i:i+self.kmer_length]
+            revcomp = self.reverse_complement(kmer)
+            canonical = min(kmer, revcomp)
+
+            if canonical in self.kmer_counts:
+                self.kmer_counts[canonical] += 1
+            else:
+                self.kmer_counts[canonical] = 1
+
+    def _count_packed(self, seq):
+        """
+        Count canonical k-mers of one read as 2-bit packed integers, rolled
+        as the window slides (see kmer_encoding.iter_canonical_codes).
+
+        Unlike the string method, lowercase bases count as their uppercase
+        forms and windows containing N (or any other non-ACGT byte) are
+        skipped, as in the numpy method.
+        """
+        counts = self.packed_counts
+        for canonical in iter_canonical_codes(seq, self.kmer_length):
+            counts[canonical] = counts.get(canonical, 0) + 1
+
+    def lookup_kmers(self, kmers):
+        """
+        Look up k-mers (either strand) in the counts, without building a graph.
+
+        Args:
+            kmers (list): K-mer strings of length kmer_length
+
+        Returns:
+            list: Counts of the k-mers' canonical forms, 0 when unseen
+        """
+        if self.count_table is not None:
+            return self.count_table.lookup_kmers(kmers)
+        k = self.kmer_length
+        codes = [canonical_code(encode_kmer(kmer), k) for kmer in kmers]
+        if self.method == 'packed':
+            return [self.packed_counts.get(code, 0) for code in codes]
+        return [self.kmer_counts.get(decode_kmer(code, k), 0) for code in codes]
+
     def print_sample_kmers(self, sample_size=10):
         print("=== K-mer Counts Sample ===")
-        for kmer, count in list(self.kmer_counts.items())[:sample_size]:
-            print(f"{kmer}: {count}")
-    
+        if self.count_table is not None:
+            table = self.count_table
+            for code, count in zip(table.kmers[:sample_size].tolist(), table.counts[:sample_size].tolist()):
+                print(f"{decode_kmer(code, self.kmer_length)}: {count}")
+        elif self.method == 'packed':
+            for code, count in list(self.packed_counts.items())[:sample_size]:
+                print(f"{decode_kmer(code, self.kmer_length)}: {count}")
+        else:
+            for kmer, count in list(self.kmer_counts.items())[:sample_size]:
+                print(f"{kmer}: {count}")
+
+    def print_sample_counts(self):
+        sample_counts = self.sample_counts
+        print("\n=== Per-sample K-mer Counts ===")
+        distinct = np.count_nonzero(sample_counts.columns, axis=0).tolist()
+        for (name, occurrences), sample_distinct in zip(sample_counts.sample_totals().items(), distinct):
+            print(f"  {name}: {len(self.samples[name])} file(s), {occurrences} k-mers, {sample_distinct} distinct")
+        print(f"  Shared table: {len(sample_counts)} distinct k-mers")
+
+    def get_count_arrays(self):
+        """
+        Return the counts as sorted packed-code and count arrays.
+
+        Only available for the 'packed' and 'numpy' methods with k <= 32.
+
+        Returns:
+            tuple: (sorted uint64 canonical codes, int64 counts)
+        """
+        if self.count_table is not None:
+            return self.count_table.kmers, self.count_table.counts
+        if self.method != 'packed':
+            raise ValueError("Count arrays are only available for the 'packed' and 'numpy' methods")
+        kmers = np.fromiter(self.packed_counts.keys(), dtype=KMER_DTYPE, count=len(self.packed_counts))
+        counts = np.fromiter(self.packed_counts.values(), dtype=COUNT_DTYPE, count=len(self.packed_counts))
+        order = np.argsort(kmers)
+        return kmers[order], counts[order]
+
+    def iter_count_buckets(self):
+        """
+        Yield the sorted count table in (kmers, counts) pieces.
+
+        Disk-backed tables are yielded one bucket at a time from their memory
+        maps; in-memory tables come as a single piece.
+        """
+        if self.external_table is not None:
+            yield from self.external_table.iter_buckets()
+        else:
+            yield self.get_count_arrays()
+
+    def get_count_table(self, kmer_length=None):
+        """Count table of one k (the primary k by default); None for the 'packed' and 'string' methods."""
+        if kmer_length is None or kmer_length == self.kmer_length:
+            return self.count_table
+        return self.extra_tables[kmer_length]
+
+    def kmer_spectra(self):
+        """
+        Return the k-mer spectrum (count histogram) of every counted k.
+
+        Returns:
+            dict: k -> array whose entry c is the number of distinct k-mers seen c times
+        """
+        if self.count_table is not None:
+            return {k: self.get_count_table(k).spectrum() for k in self.kmer_lengths}
+        if self.method == 'packed':
+            counts = np.fromiter(self.packed_counts.values(), dtype=COUNT_DTYPE, count=len(self.packed_counts))
+        else:
+            counts = np.fromiter(self.kmer_counts.values(), dtype=COUNT_DTYPE, count=len(self.kmer_counts))
+        return {self.kmer_length: np.bincount(counts)}
+
+    def print_spectra(self):
+        print("=== K-mer Spectra ===")
+        for k, spectrum in self.kmer_spectra().items():
+            multiplicity = np.arange(len(spectrum))
+            distinct = int(spectrum.sum())
+            total = int((spectrum * multiplicity).sum())
+            singletons = int(spectrum[1]) if len(spectrum) > 1 else 0
+            line = f"k={k}: {distinct} distinct, {total} total, {singletons} singletons"
+            if len(spectrum) > 2:
+                # Coverage peak of the solid k-mers, past the error singletons
+                line += f", peak at {int(np.argmax(spectrum[2:])) + 2}x"
+            print(line)
+
+    def write_spectra(self, path):
+        """Write the spectra as tab-separated (k, multiplicity, distinct k-mers) rows."""
+        with open(path, 'w') as f:
+            f.write("k\tmultiplicity\tkmers\n")
+            for k, spectrum in self.kmer_spectra().items():
+                for multiplicity in np.flatnonzero(spectrum).tolist():
+                    f.write(f"{k}\t{multiplicity}\t{spectrum[multiplicity]}\n")
+
     def get_kmer_counts(self):
+        if self.count_table is not None:
+            return self.count_table.to_dict()
+        if self.method == 'packed':
+            k = self.kmer_length
+            return {decode_kmer(code, k): count for code, count in self.packed_counts.items()}
         return self.kmer_counts
 
 
 def main():
+    # Imported here: cli_arguments takes the counting defaults from this module
+    from cli_arguments import add_count_arguments, add_counting_arguments, add_input_arguments, \
+        add_profile_arguments, check_counting_arguments, counting_method
+
     parser = argparse.ArgumentParser()
-    parser.add_argument('--reads', type=str, required=True)
-    parser.add_argument('--kmer', type=int, default=6)
+    add_input_arguments(parser, multi_k=True)
+    add_count_arguments(parser)
+    add_counting_arguments(parser)
+    add_profile_arguments(parser)
     args = parser.parse_args()
-    
-    processor = FastqProcessor(args.reads, args.kmer)
-    
-    print(f"Processing FASTQ file: {args.reads}")
-    print(f"K-mer length: {args.kmer}")
+    if not args.reads and not args.sample_sheet:
+        parser.error("one of --reads or --sample-sheet is required")
+    check_counting_arguments(parser, args)
+
+    reads_files, samples = resolve_inputs(args.reads, args.sample_sheet,
+                                          per_sample=args.sample_counts is not None)
+    reads = reads_files[0] if len(reads_files) == 1 else reads_files
+    profiler = StageProfiler(args.progress_interval) if args.profile else None
+    kmer = args.kmer[0] if len(args.kmer) == 1 else args.kmer
+    processor = FastqProcessor(reads, kmer, counting_method(args), args.batch_size, args.workers,
+                               args.min_count, args.memory_budget, args.max_memory, args.tmp_dir, args.index,
+                               profiler, args.pipeline, samples)
+
+    print(f"Processing FASTQ file(s): {', '.join(reads_files)}")
+    print(f"K-mer length: {', '.join(map(str, args.kmer))}")
     processor.process_fastq()
-    
+
     processor.print_sample_kmers()
+    if len(args.kmer) > 1 or args.spectrum:
+        processor.print_spectra()
+    if args.spectrum:
+        processor.write_spectra(args.spectrum)
+        print(f"Wrote k-mer spectra to {args.spectrum}")
+    if args.sample_counts:
+        processor.print_sample_counts()
+        processor.sample_counts.write_tsv(args.sample_counts)
+        print(f"Wrote per-sample counts to {args.sample_counts}")
+
+    if profiler is not None:
+        profiler.write_summary(args.profile)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+"""
+Deterministic synthetic genome and short-read simulator.
+
+Reads are sampled uniformly from a random genome, taken from either strand
+with equal probability, and given substitution errors at a fixed per-base
+rate. Everything is drawn from seeded NumPy generators and the gzip header
+carries no timestamp, so the same parameters always produce byte-identical
+FASTQ files.
+"""
+
+import argparse
+import gzip
+
+import numpy as np
+
+from kmer_batch import ASCII_BASES
+
+
+DEFAULT_READ_LENGTH = 150
+DEFAULT_COVERAGE = 10
+DEFAULT_ERROR_RATE = 0.001
+DEFAULT_SEED = 42
+
+# Reads generated and written per chunk
+READS_PER_CHUNK = 10000
+QUALITY_CHAR = b'I'
+
+
+def random_genome(length, seed=DEFAULT_SEED):
+    """
+    Generate a random genome as an array of 2-bit base codes (A=0 .. T=3).
+
+    Args:
+        length (int): Genome length in bases
+        seed (int): Random seed
+
+    Returns:
+        np.ndarray: uint8 base codes
+    """
+    return np.random.default_rng(seed).integers(0, 4, size=length, dtype=np.uint8)
+
+
+class ReadSimulator:
+    def __init__(self, genome_length, read_length=DEFAULT_READ_LENGTH, coverage=DEFAULT_COVERAGE,
+                 error_rate=DEFAULT_ERROR_RATE, seed=DEFAULT_SEED):
+        if read_length > genome_length:
+            raise ValueError(f"Read length {read_length} exceeds genome length {genome_length}")
+        self.genome_length = genome_length
+        self.read_length = read_length
+        self.coverage = coverage
+        self.error_rate = error_rate
+        self.seed = seed
+        self.genome = random_genome(genome_length, seed)
+        self.num_reads = max(int(coverage * genome_length // read_length), 1)
+
+    def iter_read_chunks(self):
+        """
+        Yield simulated reads in chunks.
+
+        Yields:
+            np.ndarray: (reads, read_length) array of uint8 base codes
+        """
+        # A separate stream from the genome's, so read sampling does not
+        # shift when the genome length changes
+        rng = np.random.default_rng((self.seed, 1))
+        offsets = np.arange(self.read_length)
+        for start in range(0, self.num_reads, READS_PER_CHUNK):
+            count = min(READS_PER_CHUNK, self.num_reads - start)
+            positions = rng.integers(0, self.genome_length - self.read_length + 1, size=count)
+            reads = self.genome[positions[:, None] + offsets]
+            # Reverse strand reads are reverse complemented (3 - code is the complement)
+            reverse = rng.random(count) < 0.5
+            reads[reverse] = 3 - reads[reverse, ::-1]
+            errors = rng.random(reads.shape) < self.error_rate
+            # Substitute a different base: shift by 1-3 positions around ACGT
+            shifts = rng.integers(1, 4, size=int(errors.sum()), dtype=np.uint8)
+            reads[errors] = (reads[errors] + shifts) % 4
+            yield reads
+
+    def write_fastq_gz(self, path):
+        """
+        Write the simulated reads as a gzipped FASTQ file.
+
+        Returns:
+            int: Number of reads written
+        """
+        quality = QUALITY_CHAR * self.read_length
+        read_id = 0
+        with open(path, 'wb') as raw, gzip.GzipFile(filename='', mode='wb', fileobj=raw,
+                                                     compresslevel=1, mtime=0) as f:
+            for reads in self.iter_read_chunks():
+                sequences = ASCII_BASES[reads]
+                records = []
+                for sequence in sequences:
+                    records.append(b"@sim%d\n%s\n+\n%s\n" % (read_id, sequence.tobytes(), quality))
+                    read_id += 1
+                f.write(b''.join(records))
+        return read_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate short reads from a random genome")
+    parser.add_argument('--output', type=str, required=True, help="Output FASTQ file (gzipped)")
+    parser.add_argument('--genome-size', type=int, default=100000, help="Genome length in bases")
+    parser.add_argument('--read-length', type=int, default=DEFAULT_READ_LENGTH, help="Read length")
+    parser.add_argument('--coverage', type=float, default=DEFAULT_COVERAGE, help="Mean sequencing depth")
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_ERROR_RATE,
+                        help="Per-base substitution error rate")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Random seed")
+    args = parser.parse_args()
+
+    simulator = ReadSimulator(args.genome_size, args.read_length, args.coverage, args.error_rate, args.seed)
+    reads = simulator.write_fastq_gz(args.output)
+    print(f"Wrote {reads} reads of {args.read_length} bp ({args.coverage}x of a {args.genome_size} bp genome) "
+          f"to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Multi-file and multi-sample inputs.
+
+A run can read many FASTQ files: explicit lists, glob patterns, the R1/R2
+mates of paired-end lanes and interleaved files. K-mer counting treats
+a mate as just another read, so paired and interleaved inputs need no
+pairing logic; every file of a sample is counted into the same table.
+
+Files are grouped into samples by a sample sheet or, by default, by their
+names with lane, mate and chunk suffixes removed, so S1_L001_R1_001.fastq.gz
+and S1_L002_R2_001.fastq.gz both belong to sample S1. Whole files are
+counted concurrently, one per worker process, each reading and inflating
+its own file. The per-file tables are merged into per-sample tables, and
+those into a SampleCountTable: the union of the k-mers with one count
+column per sample. Its row sums are the shared table the graph is built
+from.
+"""
+
+import glob
+import os
+import re
+
+import numpy as np
+
+from fastq_reader import FastqReader
+from graph_export import EXPORT_CHUNK_SIZE, open_output
+from kmer_batch import batch_canonical_codes, decode_codes
+from kmer_table import COUNT_DTYPE, KmerCountTable, sorted_unique
+
+
+FASTQ_EXTENSION = re.compile(r'(\.(fastq|fq))?(\.gz|\.bgz)?$', re.IGNORECASE)
+# Illumina lane (_L001), mate (_R1, _2, .R1) and chunk (_001) suffixes
+SAMPLE_SUFFIX = re.compile(r'(_L\d{3})?([_.]R?[12])?(_\d{3})?$')
+GLOB_CHARACTERS = '*?['
+
+
+def expand_inputs(patterns):
+    """
+    Expand input paths and glob patterns into a list of files.
+
+    Args:
+        patterns (list): Paths and glob patterns, in the order to read them
+
+    Returns:
+        list: Matching files, each pattern's matches sorted, without repeats
+
+    Raises:
+        FileNotFoundError: When a path does not exist or a pattern matches nothing
+    """
+    paths = []
+    for pattern in patterns:
+        if any(character in pattern for character in GLOB_CHARACTERS):
+            matches = sorted(glob.glob(pattern))
+        else:
+            matches = [pattern] if os.path.exists(pattern) else []
+        if not matches:
+            raise FileNotFoundError(f"No input files match '{pattern}'")
+        paths.extend(path for path in matches if path not in paths)
+    return paths
+
+
+def sample_name(path):
+    """Sample a FASTQ file belongs to, from its name without lane and mate suffixes."""
+    name = FASTQ_EXTENSION.sub('', os.path.basename(path))
+    return SAMPLE_SUFFIX.sub('', name) or name
+
+
+def group_samples(paths):
+    """
+    Group files into samples by name.
+
+    Returns:
+        dict: Sample name -> list of files, in order of first appearance
+    """
+    samples = {}
+    for path in paths:
+        samples.setdefault(sample_name(path), []).append(path)
+    return samples
+
+
+def read_sample_sheet(path):
+    """
+    Read a tab-separated sample sheet of 'sample<TAB>file or glob' lines.
+
+    Blank lines and lines starting with '#' are skipped; a sample may be
+    listed on several lines.
+
+    Returns:
+        dict: Sample name -> list of files
+    """
+    patterns = {}
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            if len(fields) != 2:
+                raise ValueError(f"{path}:{line_number}: expected 'sample<TAB>file', got {line!r}")
+            patterns.setdefault(fields[0], []).append(fields[1])
+    return {name: expand_inputs(sample_patterns) for name, sample_patterns in patterns.items()}
+
+
+def resolve_inputs(patterns=None, sample_sheet=None, per_sample=False):
+    """
+    Resolve the input options of a run into files and samples.
+
+    Args:
+        patterns (list): Input files and glob patterns
+        sample_sheet (str): Sample sheet defining the samples instead
+        per_sample (bool): Group the inputs into samples by file name
+
+    Returns:
+        tuple: (list of files, sample name -> files or None)
+    """
+    if sample_sheet:
+        if patterns:
+            raise ValueError("Give the inputs either as files or in a sample sheet, not both")
+        samples = read_sample_sheet(sample_sheet)
+        return [path for paths in samples.values() for path in paths], samples
+    paths = expand_inputs(patterns or [])
+    if not paths:
+        raise ValueError("No input files given")
+    return paths, group_samples(paths) if per_sample else None
+
+
+def count_file(path, kmer_length, batch_size):
+    """
+    Worker task: count the canonical k-mers of one FASTQ file.
+
+    Returns:
+        tuple: (path, sorted k-mers, counts, reads, k-mer occurrences)
+    """
+    table = KmerCountTable(kmer_length)
+    reads = 0
+    occurrences = 0
+    batch = []
+    for seq in FastqReader(path, threads=1):
+        batch.append(seq)
+        if len(batch) >= batch_size:
+            codes = batch_canonical_codes(batch, kmer_length)
+            table.add_codes(codes)
+            reads += len(batch)
+            occurrences += len(codes)
+            batch = []
+    if batch:
+        codes = batch_canonical_codes(batch, kmer_length)
+        table.add_codes(codes)
+        reads += len(batch)
+        occurrences += len(codes)
+    return path, table.kmers, table.counts, reads, occurrences
+
+
+def count_files(paths, kmer_length, batch_size, workers=1):
+    """
+    Count whole files concurrently, one file per worker process.
+
+    Yields:
+        tuple: count_file results, in order of completion
+    """
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield count_file(path, kmer_length, batch_size)
+        return
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        futures = [executor.submit(count_file, path, kmer_length, batch_size) for path in paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+class SampleCountTable:
+    """
+    K-mer counts with one column per sample.
+
+    `kmers` are the sorted canonical k-mers seen in any sample and
+    `columns` a (k-mers x samples) count matrix in the order of `samples`.
+    """
+
+    def __init__(self, kmer_length, samples, kmers, columns):
+        self.kmer_length = kmer_length
+        self.samples = list(samples)
+        self.kmers = kmers
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.kmers)
+
+    def totals(self):
+        """Counts summed over the samples, parallel to `kmers`."""
+        return self.columns.sum(axis=1, dtype=np.int64).astype(COUNT_DTYPE, copy=False)
+
+    def sample_totals(self):
+        """K-mer occurrences counted in each sample."""
+        return dict(zip(self.samples, self.columns.sum(axis=0, dtype=np.int64).tolist()))
+
+    def filter_min_count(self, min_count):
+        """Drop k-mers whose total count is below min_count."""
+        keep = self.totals() >= min_count
+        self.kmers = self.kmers[keep]
+        self.columns = self.columns[keep]
+
+    def write_tsv(self, path):
+        """
+        Write one 'kmer<TAB>count per sample' row per k-mer, with a header.
+
+        Returns:
+            int: Number of k-mers written
+        """
+        with open_output(path) as f:
+            f.write(('kmer\t' + '\t'.join(self.samples) + '\n').encode())
+            for start in range(0, len(self.kmers), EXPORT_CHUNK_SIZE):
+                end = start + EXPORT_CHUNK_SIZE
+                sequences = decode_codes(self.kmers[start:end], self.kmer_length).tolist()
+                rows = self.columns[start:end].tolist()
+                f.write(''.join(sequence.decode('ascii') + '\t' + '\t'.join(map(str, row)) + '\n'
+                                for sequence, row in zip(sequences, rows)).encode('ascii'))
+        return len(self.kmers)
+
+
+def merge_sample_tables(kmer_length, tables):
+    """
+    Align per-sample count tables into one SampleCountTable.
+
+    Args:
+        kmer_length (int): K-mer length
+        tables (dict): Sample name -> sorted (kmers, counts)
+
+    Returns:
+        SampleCountTable: Union of the k-mers with a column per sample
+    """
+    kmers = sorted_unique(np.concatenate([sample_kmers for sample_kmers, _ in tables.values()]))
+    columns = np.zeros((len(kmers), len(tables)), dtype=COUNT_DTYPE)
+    for column, (sample_kmers, counts) in enumerate(tables.values()):
+        columns[np.searchsorted(kmers, sample_kmers), column] = counts
+    return SampleCountTable(kmer_length, tables.keys(), kmers, columns)
@@ -0,0 +1,297 @@
+"""
+Command-line entry point with one subcommand per job.
+
+    count   count k-mers (optionally several k) and print spectra
+    build   build the de Bruijn graph, optionally compact, simplify and export it
+    stats   build the graph and print its statistics and heaviest edges
+    query   look up k-mers and their reverse complements in the counts
+    serve   keep the counts loaded and answer queries on stdin or a socket
+
+Each subcommand imports only the modules it needs: counting and queries
+never load the graph code, and networkx is only imported when the
+networkx backend is used. A query is answered from the count table (or
+straight from a memory-mapped --index), since a k-mer's forward and
+reverse complement edges exist exactly when its canonical form was
+counted. For many queries, serve loads the counts once and answers the
+line protocol of query_service.
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+
+from cli_arguments import DEFAULT_KMER, add_count_arguments, add_counting_arguments, add_graph_arguments, \
+    add_input_arguments, add_output_arguments, add_profile_arguments, add_stats_arguments, check_counting_arguments, \
+    check_graph_arguments, check_output_arguments, counting_method, kmer_lengths_of
+from kmer_table import MAX_ARRAY_K
+from profiling import NULL_PROFILER, StageProfiler
+from read_fastq_gz import FastqProcessor
+from sample_counts import expand_inputs, resolve_inputs
+
+
+def make_profiler(args):
+    return StageProfiler(args.progress_interval) if args.profile else NULL_PROFILER
+
+
+def make_processor(args, profiler):
+    kmer_lengths = kmer_lengths_of(args)
+    kmer_length = kmer_lengths[0] if len(kmer_lengths) == 1 else kmer_lengths
+    return FastqProcessor(args.inputs, kmer_length, counting_method(args), args.batch_size, args.workers,
+                          args.min_count, args.memory_budget, args.max_memory, args.tmp_dir, args.index, profiler,
+                          args.pipeline, args.samples)
+
+
+def make_builder(args, profiler):
+    from de_bruijn_graph_builder import DeBruijnGraphBuilder
+
+    return DeBruijnGraphBuilder(args.inputs, args.kmer, args.workers, args.backend, args.min_count,
+                                args.memory_budget, args.max_memory, args.tmp_dir, args.index, profiler,
+                                args.batch_size, args.pipeline, args.samples)
+
+
+def build_graph(args, builder):
+    if getattr(args, 'add_reads', None):
+        reads_files = args.reads_files + expand_inputs(args.add_reads)
+        print(f"Adding {len(reads_files)} file(s) to {args.index} with k-mer length {args.kmer}")
+        builder.add_reads(reads_files)
+    else:
+        print(f"Processing {', '.join(args.reads_files)} with k-mer length {args.kmer}")
+        builder.build_graph_from_kmers()
+        write_sample_counts(args, builder.processor)
+
+
+def write_sample_counts(args, processor):
+    if args.sample_counts and processor.sample_counts is not None:
+        processor.print_sample_counts()
+        processor.sample_counts.write_tsv(args.sample_counts)
+        print(f"Wrote per-sample counts to {args.sample_counts}")
+
+
+def run_count(args):
+    profiler = make_profiler(args)
+    processor = make_processor(args, profiler)
+    print(f"Processing FASTQ file(s): {', '.join(args.reads_files)}")
+    print(f"K-mer length: {', '.join(map(str, args.kmer))}")
+    processor.process_fastq()
+    processor.print_sample_kmers()
+    write_sample_counts(args, processor)
+    if len(args.kmer) > 1 or args.spectrum:
+        processor.print_spectra()
+    if args.spectrum:
+        processor.write_spectra(args.spectrum)
+        print(f"Wrote k-mer spectra to {args.spectrum}")
+    return profiler
+
+
+def run_build(args):
+    profiler = make_profiler(args)
+    builder = make_builder(args, profiler)
+    build_graph(args, builder)
+    print(f"Graph: {builder.graph.number_of_nodes()} nodes, {builder.graph.number_of_edges()} edges")
+    if args.compact or args.simplify or args.unitig_fasta:
+        with profiler.stage('compact'):
+            builder.compact()
+        if args.simplify:
+            with profiler.stage('simplify'):
+                builder.simplify(args.tip_length, args.tip_coverage, args.bubble_length)
+        builder.print_unitig_stats()
+    with profiler.stage('export'):
+        if args.unitig_fasta:
+            builder.write_unitig_fasta(args.unitig_fasta)
+        if args.gfa:
+            builder.write_gfa(args.gfa)
+    return profiler
+
+
+def run_stats(args):
+    profiler = make_profiler(args)
+    builder = make_builder(args, profiler)
+    build_graph(args, builder)
+    with profiler.stage('stats'):
+        builder.print_graph_stats()
+        if args.demonstrate:
+            builder.demonstrate_bidirected_nature()
+    if args.validate:
+        with profiler.stage('validate'):
+            builder.validate_bidirected_structure()
+    with profiler.stage('stats'):
+        builder.print_high_weight_edges(args.threshold)
+    return profiler
+
+
+def query_counts(args, profiler):
+    """
+    Counts of the queried k-mers, from the index alone when no reads are
+    given, otherwise from counting the reads (which reuses a matching index).
+    """
+    kmers = [kmer.upper() for kmer in args.kmers]
+    if not args.reads_files:
+        from kmer_index import KmerIndex
+        from kmer_table import KmerCountTable
+
+        with profiler.stage('index'):
+            index = KmerIndex(args.index)
+            counts = KmerCountTable(args.kmer, index.kmers, index.counts)
+    else:
+        counts = make_processor(args, profiler)
+        counts.process_fastq()
+    with profiler.stage('query'):
+        return kmers, counts.lookup_kmers(kmers)
+
+
+def run_query(args):
+    from query_service import print_kmer_analysis
+
+    profiler = make_profiler(args)
+    kmers, counts = query_counts(args, profiler)
+    for kmer, count in zip(kmers, counts):
+        print_kmer_analysis(kmer, count)
+    return profiler
+
+
+def run_serve(args):
+    from query_service import KmerQueryService, serve_socket, serve_stream
+
+    profiler = make_profiler(args)
+    # stdout carries the replies of a stdin session, so loading reports go to stderr
+    with contextlib.redirect_stdout(sys.stderr), profiler.stage('load'):
+        if args.reads_files:
+            processor = make_processor(args, profiler)
+            processor.process_fastq()
+            kmers, counts = processor.get_count_arrays()
+            service = KmerQueryService(args.kmer, kmers, counts)
+        else:
+            service = KmerQueryService.from_index(args.index)
+    served = f"Serving {len(service)} {service.kmer_length}-mers"
+    if args.socket or args.port is not None:
+        print(f"{served} on {args.socket or f'{args.host}:{args.port}'}", file=sys.stderr)
+        serve_socket(service, args.socket or (args.host, args.port))
+    else:
+        print(f"{served} on stdin", file=sys.stderr)
+        serve_stream(service, sys.stdin, sys.stdout)
+    return profiler
+
+
+def add_common_arguments(parser, multi_k=False, samples=True):
+    add_input_arguments(parser, multi_k, samples)
+    add_counting_arguments(parser)
+    add_profile_arguments(parser)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description="Count k-mers and build bidirected de Bruijn graphs from short reads")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    count = subparsers.add_parser('count', help="Count canonical k-mers")
+    add_common_arguments(count, multi_k=True)
+    add_count_arguments(count)
+    count.set_defaults(run=run_count)
+
+    build = subparsers.add_parser('build', help="Build the de Bruijn graph and optionally export it")
+    add_common_arguments(build)
+    add_graph_arguments(build)
+    add_output_arguments(build)
+    build.set_defaults(run=run_build)
+
+    stats = subparsers.add_parser('stats', help="Build the graph and print its statistics")
+    add_common_arguments(stats)
+    add_graph_arguments(stats)
+    add_stats_arguments(stats)
+    stats.set_defaults(run=run_stats)
+
+    query = subparsers.add_parser('query', help="Look up k-mers in the counts, without building a graph")
+    add_common_arguments(query, samples=False)
+    query.add_argument('kmers', nargs='+', metavar='KMER', help="K-mers to look up (either strand)")
+    # Without --reads the k-mer length comes from the index (see resolve_kmer_length)
+    query.set_defaults(kmer=None, run=run_query)
+
+    serve = subparsers.add_parser('serve', help="Answer k-mer, neighbour and path queries from loaded counts")
+    add_common_arguments(serve, samples=False)
+    serve.add_argument('--socket', type=str, help="Listen on this Unix socket instead of stdin")
+    serve.add_argument('--port', type=int, help="Listen on this TCP port instead of stdin")
+    serve.add_argument('--host', type=str, default='127.0.0.1', help="Address to bind with --port")
+    # Without --reads the k-mer length comes from the index (see resolve_kmer_length)
+    serve.set_defaults(kmer=None, run=run_serve)
+    return parser
+
+
+def resolve_arguments(parser, args):
+    """
+    Expand the input files and samples into args.reads_files, args.samples
+    and args.inputs (a single path or a list, as FastqProcessor takes them).
+    """
+    sample_sheet = getattr(args, 'sample_sheet', None)
+    args.reads_files, args.samples = [], None
+    if args.reads or sample_sheet:
+        try:
+            args.reads_files, args.samples = resolve_inputs(args.reads, sample_sheet,
+                                                            per_sample=bool(getattr(args, 'sample_counts', None)))
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+    args.inputs = args.reads_files[0] if len(args.reads_files) == 1 else args.reads_files or None
+
+
+def resolve_kmer_length(parser, args):
+    """
+    Take the k-mer length of a query or serve run from its index when no
+    reads are given, and from --kmer (or its default) otherwise.
+    """
+    if not args.reads_files:
+        if not args.index:
+            parser.error(f"{args.command} needs --reads or an existing --index")
+        if not os.path.exists(args.index):
+            parser.error(f"index {args.index} does not exist; give --reads to count them")
+        from kmer_index import KmerIndex
+
+        try:
+            index_length = KmerIndex(args.index).kmer_length
+        except (OSError, ValueError) as error:
+            parser.error(f"cannot read index {args.index}: {error}")
+        if args.kmer is not None and args.kmer != index_length:
+            parser.error(f"{args.index} holds {index_length}-mers, not {args.kmer}-mers")
+        args.kmer = index_length
+    elif args.kmer is None:
+        args.kmer = DEFAULT_KMER
+
+
+def check_arguments(parser, args):
+    resolve_arguments(parser, args)
+    if args.command in ('query', 'serve'):
+        resolve_kmer_length(parser, args)
+    if args.command in ('build', 'stats'):
+        check_graph_arguments(parser, args)
+        if not args.reads_files and not args.add_reads:
+            parser.error("one of --reads, --sample-sheet or --add-reads is required")
+        if args.add_reads and args.samples is not None:
+            parser.error("--add-reads cannot be combined with per-sample counts")
+    if args.command == 'build':
+        check_output_arguments(parser, args)
+    check_counting_arguments(parser, args)
+    if args.command == 'count' and not args.reads_files:
+        parser.error("one of --reads or --sample-sheet is required")
+    if args.command == 'serve':
+        if args.socket and args.port is not None:
+            parser.error("give either --socket or --port")
+        if args.reads_files and args.kmer > MAX_ARRAY_K:
+            parser.error(f"serve needs k <= {MAX_ARRAY_K}")
+    if args.command == 'query':
+        for kmer in args.kmers:
+            if len(kmer) != args.kmer:
+                parser.error(f"k-mer length must be {args.kmer}, but '{kmer}' has length {len(kmer)}")
+            if set(kmer.upper()) - set('ACGT'):
+                parser.error(f"k-mer '{kmer}' contains bases other than A/C/G/T")
+
+
+def main(argv=None):
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    check_arguments(parser, args)
+    profiler = args.run(args)
+    if args.profile:
+        profiler.write_summary(args.profile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
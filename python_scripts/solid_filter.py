@@ -0,0 +1,63 @@
+"""
+Fixed-memory abundance filtering for solid k-mers.
+
+Most distinct k-mers in short-read data are sequencing-error singletons. A
+count-min sketch counts every k-mer in a fixed amount of memory during a
+first pass; its estimates never undercount, so in the second pass only
+k-mers whose estimate reaches the threshold need an exact counter. The
+exact table then holds the solid k-mers plus a few sketch collisions,
+which the final threshold removes.
+"""
+
+import numpy as np
+
+from kmer_table import KMER_DTYPE, reduce_codes
+
+
+SKETCH_DEPTH = 4
+COUNTER_DTYPE = np.uint32
+# Odd 64-bit multipliers, one per sketch row
+ROW_MULTIPLIERS = (
+    0x9E3779B97F4A7C15,
+    0xC2B2AE3D27D4EB4F,
+    0x165667B19E3779F9,
+    0xD6E8FEB86659FD93,
+    0xFF51AFD7ED558CCD,
+    0xC4CEB9FE1A85EC53,
+    0x94D049BB133111EB,
+    0xBF58476D1CE4E5B9,
+)
+
+
+class CountMinSketch:
+    def __init__(self, memory_bytes, depth=SKETCH_DEPTH):
+        if not 1 <= depth <= len(ROW_MULTIPLIERS):
+            raise ValueError(f"Sketch depth must be between 1 and {len(ROW_MULTIPLIERS)}")
+        self.depth = depth
+        self.width = max(int(memory_bytes) // (depth * np.dtype(COUNTER_DTYPE).itemsize), 1)
+        self.table = np.zeros((depth, self.width), dtype=COUNTER_DTYPE)
+
+    def _columns(self, codes, row):
+        """Hash packed k-mers to counter columns of one row."""
+        mixed = codes ^ (codes >> np.uint64(29))
+        with np.errstate(over='ignore'):
+            mixed = mixed * np.uint64(ROW_MULTIPLIERS[row])
+        return (mixed >> np.uint64(16)) % np.uint64(self.width)
+
+    def add(self, codes):
+        """Count a chunk of canonical packed k-mers."""
+        kmers, counts = reduce_codes(codes)
+        if not len(kmers):
+            return
+        counts = counts.astype(COUNTER_DTYPE)
+        for row in range(self.depth):
+            np.add.at(self.table[row], self._columns(kmers, row), counts)
+
+    def estimate(self, codes):
+        """Upper-bound count estimates for canonical packed k-mers."""
+        codes = np.asarray(codes, dtype=KMER_DTYPE)
+        estimates = self.table[0][self._columns(codes, 0)]
+        for row in range(1, self.depth):
+            estimates = np.minimum(estimates, self.table[row][self._columns(codes, row)])
+        return estimates
+
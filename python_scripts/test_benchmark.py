@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for the read simulator and the benchmark harness.
+"""
+
+from benchmark import run_benchmarks
+from fastq_reader import FastqReader
+from kmer_batch import ASCII_BASES
+from read_simulator import ReadSimulator
+
+
+def test_simulated_reads_are_deterministic_genome_substrings(tmp_path):
+    simulator = ReadSimulator(2000, read_length=50, coverage=5, error_rate=0.0, seed=3)
+    first = simulator.write_fastq_gz(tmp_path / "a.fastq.gz")
+    ReadSimulator(2000, read_length=50, coverage=5, error_rate=0.0, seed=3).write_fastq_gz(tmp_path / "b.fastq.gz")
+    assert first == simulator.num_reads == 200
+    assert (tmp_path / "a.fastq.gz").read_bytes() == (tmp_path / "b.fastq.gz").read_bytes()
+
+    genome = ASCII_BASES[simulator.genome].tobytes().decode('ascii')
+    reverse = genome[::-1].translate(str.maketrans('ACGT', 'TGCA'))
+    reads = [bytes(seq).decode('ascii') for seq in FastqReader(str(tmp_path / "a.fastq.gz"))]
+    assert len(reads) == 200
+    assert all(read in genome or read in reverse for read in reads)
+    assert any(read in reverse and read not in genome for read in reads)
+
+
+def test_simulated_error_rate():
+    simulator = ReadSimulator(5000, read_length=100, coverage=20, error_rate=0.05, seed=1)
+    genome = simulator.genome.tobytes()
+    reverse = (3 - simulator.genome[::-1]).tobytes()
+    errors = 0
+    for reads in simulator.iter_read_chunks():
+        for read in reads:
+            if read.tobytes() not in genome and read.tobytes() not in reverse:
+                errors += 1
+    # Nearly every 100 bp read at 5% errors carries at least one substitution
+    assert errors > 0.9 * simulator.num_reads
+
+
+def test_benchmark_report(tmp_path):
+    report = run_benchmarks(sizes=['tiny'], kmer_lengths=[11], scenarios=['count', 'graph'],
+                            work_dir=str(tmp_path))
+    assert [result['scenario'] for result in report['results']] == ['count', 'graph']
+    for result in report['results']:
+        assert result['seconds'] > 0
+        assert result['kmers'] == result['reads'] * (150 - 11 + 1)
+        assert result['peak_rss_bytes'] > 0
+    assert report['results'][1]['edges'] > 0
+    assert report['results'][1]['count_seconds'] > 0
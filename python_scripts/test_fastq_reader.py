@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the built-in streaming FASTQ reader.
+"""
+
+import gzip
+import struct
+import threading
+import zlib
+
+import pytest
+
+from fastq_reader import FastqReader, detect_format
+from ingest_pipeline import BatchPipeline
+from test_kmer_counting import random_reads
+
+
+def fastq_text(sequences):
+    return ''.join(f"@read{i}\n{seq}\n+\n{'F' * len(seq)}\n" for i, seq in enumerate(sequences)).encode('ascii')
+
+
+def write_bgzf(path, data, block_size=1000):
+    """Write data as BGZF: independent deflate blocks with a 'BC' extra field."""
+    with open(path, 'wb') as f:
+        for start in range(0, len(data) + 1, block_size):
+            chunk = data[start:start + block_size]
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+            payload = compressor.compress(chunk) + compressor.flush()
+            header = (b'\x1f\x8b\x08\x04' + b'\x00' * 4 + b'\x00\xff' + struct.pack('<H', 6)
+                      + b'BC' + struct.pack('<HH', 2, 18 + len(payload) + 8 - 1))
+            f.write(header + payload + struct.pack('<II', zlib.crc32(chunk), len(chunk)))
+    return str(path)
+
+
+def test_reads_plain_gzip_and_bgzf(tmp_path):
+    reads = random_reads(count=300, length=75)
+    data = fastq_text(reads)
+
+    plain = tmp_path / "reads.fastq"
+    plain.write_bytes(data)
+    gzipped = tmp_path / "reads.fastq.gz"
+    gzipped.write_bytes(gzip.compress(data[:5000]) + gzip.compress(data[5000:]))
+    bgzf = write_bgzf(tmp_path / "reads.bgzf.fastq.gz", data)
+
+    assert detect_format(str(plain)) == 'plain'
+    assert detect_format(str(gzipped)) == 'gzip'
+    assert detect_format(bgzf) == 'bgzf'
+    for path in (str(plain), str(gzipped), bgzf):
+        sequences = [bytes(seq).decode('ascii') for seq in FastqReader(path, block_size=777, threads=2)]
+        assert sequences == reads
+
+
+def test_quality_lines_on_request(tmp_path):
+    path = tmp_path / "reads.fastq"
+    path.write_bytes(b"@r1\nACGT\n+\nABCD\n@r2\nGG\n+r2\nEF")
+    records = [(bytes(seq), bytes(qual)) for seq, qual in FastqReader(str(path), with_quality=True)]
+    assert records == [(b"ACGT", b"ABCD"), (b"GG", b"EF")]
+
+
+def test_pipeline_batches_match_serial_reading(tmp_path):
+    reads = random_reads(count=500, length=75)
+    bgzf = write_bgzf(tmp_path / "reads.bgzf.fastq.gz", fastq_text(reads))
+    pipeline = BatchPipeline(FastqReader(bgzf, block_size=777), batch_size=64, queue_depth=2)
+    batches = [[bytes(seq).decode('ascii') for seq in batch] for batch in pipeline]
+    assert [len(batch) for batch in batches[:-1]] == [64] * (len(batches) - 1)
+    assert [seq for batch in batches for seq in batch] == reads
+    assert pipeline.stats['parse'].items == len(batches)
+
+
+def test_pipeline_raises_stage_errors_and_stops_early(tmp_path):
+    path = tmp_path / "reads.fastq"
+    path.write_bytes(fastq_text(random_reads(count=200, length=50)) + b"@broken\nACGT\n")
+    with pytest.raises(ValueError, match="Truncated"):
+        for batch in BatchPipeline(FastqReader(str(path), block_size=500), batch_size=10, queue_depth=1):
+            pass
+
+    threads_before = threading.active_count()
+    for batch in BatchPipeline(FastqReader(str(path), block_size=500), batch_size=10, queue_depth=1):
+        break
+    assert threading.active_count() == threads_before
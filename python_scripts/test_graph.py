@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Tests for the de Bruijn graph backends.
+"""
+
+import gzip
+import os
+
+import numpy as np
+import pytest
+
+from de_bruijn_graph_builder import DeBruijnGraphBuilder
+from graph_analysis import degree_arrays, reciprocal_mask, top_edges
+from graph_simplification import GraphSimplifier
+from incremental_index import INPUTS_SUFFIX, is_extendable
+from kmer_encoding import decode_kmer
+from partitioned_unitigs import build_unitigs_partitioned
+from test_kmer_counting import random_reads, write_fastq_gz
+
+
+def build(reads_file, kmer_length, backend, min_count=1):
+    builder = DeBruijnGraphBuilder(reads_file, kmer_length, backend=backend, min_count=min_count)
+    builder.build_graph_from_kmers()
+    return builder
+
+
+def test_compact_graph_matches_networkx_structure(tmp_path):
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", random_reads(count=40, length=50))
+    for k in (4, 9):
+        compact = build(reads_file, k, 'compact').get_graph()
+        legacy = build(reads_file, k, 'networkx').get_graph()
+
+        assert compact.number_of_nodes() == legacy.number_of_nodes()
+        assert compact.number_of_edges() == legacy.number_of_edges()
+        assert set(compact.edges()) == set(legacy.edges())
+        assert dict(compact.in_degree()) == dict(legacy.in_degree())
+        assert dict(compact.out_degree()) == dict(legacy.out_degree())
+
+        debug_graph = compact.to_networkx()
+        assert set(debug_graph.nodes()) == set(legacy.nodes())
+        for u, v, data in legacy.edges(data=True):
+            assert compact.has_edge(u, v)
+            assert compact.get_edge_data(u, v)['count'] == data['count'] == debug_graph[u][v]['count']
+            assert set(compact.successors(u)) == set(legacy.successors(u))
+            assert set(compact.predecessors(v)) == set(legacy.predecessors(v))
+
+
+def test_non_acgt_kmer_is_missing_on_both_backends(tmp_path, capsys):
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", random_reads(count=20, length=40))
+    for backend in ('compact', 'networkx'):
+        builder = build(reads_file, 5, backend)
+        graph = builder.get_graph()
+        assert not graph.has_node('ACNT')
+        assert not graph.has_edge('ACNT', 'CNTA')
+        assert graph.get_edge_data('ACNT', 'CNTA') is None
+        builder.get_reverse_complement_analysis('ACGNT')
+        assert 'ACGNT' in capsys.readouterr().out
+
+
+def test_bidirected_by_construction(tmp_path):
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", random_reads(count=20, length=40) + ["ACGTACGT" * 4])
+    for backend in ('compact', 'networkx'):
+        builder = build(reads_file, 6, backend)
+        assert builder.bidirected_by_construction
+        assert builder.validate_bidirected_structure()
+        assert builder.validate_bidirected_structure(full_scan=True)
+
+
+def reverse_complement(sequence):
+    return sequence.translate(str.maketrans('ACGT', 'TGCA'))[::-1]
+
+
+def oriented(unitig_graph, unitig, strand):
+    sequence = unitig_graph.sequence(unitig)
+    return sequence if strand == 0 else reverse_complement(sequence)
+
+
+def test_unitigs_reconstruct_linear_genome(tmp_path):
+    genome = random_reads(count=1, length=600, seed=3)[0]
+    reads = [genome[i:i + 80] for i in range(0, len(genome) - 80 + 1, 20)]
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    builder = build(reads_file, 21, 'compact')
+    unitig_graph = builder.compact()
+    assert len(unitig_graph) == 1
+    assert unitig_graph.sequence(0) in (genome, reverse_complement(genome))
+    assert unitig_graph.number_of_links() == 0
+
+
+def test_unitigs_partition_kmers_and_links_overlap(tmp_path):
+    genome = random_reads(count=1, length=400, seed=5)[0]
+    # A repeated segment and a SNP variant create branches
+    genome = genome + genome[100:160] + random_reads(count=1, length=200, seed=6)[0]
+    variant = genome[:300] + ('A' if genome[300] != 'A' else 'C') + genome[301:]
+    reads = [g[i:i + 60] for g in (genome, variant) for i in range(0, len(g) - 60 + 1, 7)]
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    k = 11
+    builder = build(reads_file, k, 'compact')
+    unitig_graph = builder.compact()
+    counts = builder.get_kmer_counts()
+
+    seen = []
+    for unitig in range(len(unitig_graph)):
+        sequence = unitig_graph.sequence(unitig)
+        kmers = [sequence[i:i + k] for i in range(len(sequence) - k + 1)]
+        canonical = [min(kmer, reverse_complement(kmer)) for kmer in kmers]
+        seen.extend(canonical)
+        assert unitig_graph.total_coverage[unitig] == sum(counts[kmer] for kmer in canonical)
+    assert sorted(seen) == sorted(counts)
+    assert len(unitig_graph) > 1
+
+    assert unitig_graph.number_of_links() > 0
+    assert set(map(tuple, unitig_graph.links.tolist())) == overlap_links(unitig_graph, k)
+
+
+def overlap_links(unitig_graph, k):
+    """Links between every pair of oriented unitigs that overlap by k - 1 bases, by brute force."""
+    links = set()
+    ends = [(u, s) for u in range(len(unitig_graph)) for s in (0, 1)]
+    for source, source_strand in ends:
+        for target, target_strand in ends:
+            if (oriented(unitig_graph, source, source_strand)[-(k - 1):]
+                    == oriented(unitig_graph, target, target_strand)[:k - 1]):
+                link = (source, source_strand, target, target_strand)
+                links.add(min(link, (target, 1 - target_strand, source, 1 - source_strand)))
+    return links
+
+
+def test_links_of_palindromic_kmers_with_even_k(tmp_path):
+    # With even k a k-mer can be its own reverse complement, and is then
+    # entered on either strand
+    reads = ["ACGCGCGTTA", "TTCGCGAA", "GGCGCGCC", "ATGCGCAT"] + random_reads(count=20, length=30, seed=13)
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    for k in (4, 6):
+        unitig_graph = build(reads_file, k, 'compact').compact()
+        assert set(map(tuple, unitig_graph.links.tolist())) == overlap_links(unitig_graph, k)
+
+
+def test_partitioned_unitigs_match_serial_compaction(tmp_path):
+    genome = random_reads(count=1, length=3000, seed=8)[0]
+    genome = genome + genome[500:700] + genome[1200:1300]
+    reads = [genome[i:i + 100] for i in range(0, len(genome) - 100 + 1, 9)]
+    reads += random_reads(count=40, length=100, seed=9)
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    k = 21
+    builder = build(reads_file, k, 'compact')
+    serial = builder.compact()
+
+    def canonical_unitigs(unitig_graph):
+        return sorted((min(unitig_graph.sequence(u), reverse_complement(unitig_graph.sequence(u))),
+                       unitig_graph.total_coverage[u]) for u in range(len(unitig_graph)))
+
+    for workers, partitions in ((1, 1), (1, 7), (2, 16)):
+        partitioned = build_unitigs_partitioned(builder.graph.table, workers, partitions, minimizer_length=7)
+        assert canonical_unitigs(partitioned) == canonical_unitigs(serial)
+        assert partitioned.number_of_links() == serial.number_of_links()
+
+
+def substitute(sequence, position):
+    return sequence[:position] + 'ACGT'[('ACGT'.index(sequence[position]) + 1) % 4] + sequence[position + 1:]
+
+
+def test_simplify_clips_tips_and_pops_bubbles(tmp_path):
+    genome = random_reads(count=1, length=2000, seed=11)[0]
+    reads = [genome[i:i + 100] for i in range(0, len(genome) - 100 + 1, 5)]
+    reads = [read if i % 2 else reverse_complement(read) for i, read in enumerate(reads)]
+    # Errors near read ends leave tips, errors inside reads leave bubbles
+    reads += [substitute(genome[300:400], 95), reverse_complement(substitute(genome[1000:1100], 3))]
+    reads += [substitute(genome[600:700], 50), reverse_complement(substitute(genome[1500:1600], 40))]
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    builder = build(reads_file, 21, 'compact')
+    compacted = builder.compact()
+    assert len(compacted) > 1
+
+    simplifier = GraphSimplifier(compacted, builder.graph.table.kmers)
+    assert simplifier.simplify() == (2, 2)
+    assert simplifier.unitigs_removed == 4
+    assert simplifier.simplify() == (0, 0)
+
+    simplified = builder.simplify()
+    assert len(simplified) == 1 and simplified.number_of_links() == 0
+    assert simplified.sequence(0) in (genome, reverse_complement(genome))
+    assert simplified.kmer_totals[0] == len(genome) - 20
+
+
+def test_networkx_graph_from_disk_buckets(tmp_path):
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", random_reads(count=30, length=50))
+    in_memory = build(reads_file, 7, 'networkx').get_graph()
+    builder = DeBruijnGraphBuilder(reads_file, 7, backend='networkx', max_memory_mb=1, work_dir=str(tmp_path / "buckets"))
+    builder.build_graph_from_kmers()
+    assert set(builder.get_graph().edges(data='count')) == set(in_memory.edges(data='count'))
+
+
+def read_gfa(path):
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        lines = [line.rstrip('\n').split('\t') for line in f]
+    segments = {fields[1]: fields[2] for fields in lines if fields[0] == 'S'}
+    links = [fields[1:6] for fields in lines if fields[0] == 'L']
+    return segments, links
+
+
+def test_gfa_export_of_kmer_and_unitig_graphs(tmp_path):
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", random_reads(count=30, length=40))
+    k = 7
+    builder = build(reads_file, k, 'compact')
+    graph = builder.get_graph()
+
+    builder.write_gfa(tmp_path / "kmers.gfa.gz")
+    segments, links = read_gfa(tmp_path / "kmers.gfa.gz")
+    assert sorted(segments.values()) == sorted(builder.get_kmer_counts())
+    oriented_edges = set()
+    for source, source_strand, target, target_strand, cigar in links:
+        assert cigar == f"{k - 1}M"
+        source_seq = segments[source] if source_strand == '+' else reverse_complement(segments[source])
+        target_seq = segments[target] if target_strand == '+' else reverse_complement(segments[target])
+        assert source_seq[1:] == target_seq[:-1]
+        oriented_edges.add((source_seq, target_seq[-1]))
+        oriented_edges.add((reverse_complement(target_seq), reverse_complement(source_seq)[-1]))
+    # Every pair of consecutive edges in the node graph is one k-mer-level link
+    expected = {(u + v[-1], w[-1]) for u, v in graph.edges() for w in graph.successors(v)}
+    assert oriented_edges == expected
+
+    # The networkx backend exports the same records from its edges
+    build(reads_file, k, 'networkx').write_gfa(tmp_path / "networkx.gfa")
+    networkx_segments, networkx_links = read_gfa(tmp_path / "networkx.gfa")
+    assert networkx_segments == segments
+    assert sorted(networkx_links) == sorted(links)
+    long_k = 35
+    builder_long = build(reads_file, long_k, 'networkx')
+    builder_long.write_gfa(tmp_path / "long.gfa")
+    segments, links = read_gfa(tmp_path / "long.gfa")
+    assert sorted(segments.values()) == sorted(builder_long.get_kmer_counts())
+    assert len(links) > 0
+
+    unitig_graph = builder.compact()
+    builder.write_gfa(tmp_path / "unitigs.gfa")
+    builder.write_unitig_fasta(tmp_path / "unitigs.fa")
+    segments, links = read_gfa(tmp_path / "unitigs.gfa")
+    assert len(segments) == len(unitig_graph)
+    assert len(links) == unitig_graph.number_of_links()
+    fasta = (tmp_path / "unitigs.fa").read_text().split('\n')
+    assert fasta[1::2][:len(unitig_graph)] == [unitig_graph.sequence(u) for u in range(len(unitig_graph))]
+
+
+def test_incremental_ingestion_matches_full_rebuild(tmp_path):
+    reads = random_reads(count=40, length=50)
+    lanes = [write_fastq_gz(tmp_path / f"lane{i}.fastq.gz", reads[i::3]) for i in range(3)]
+    combined = write_fastq_gz(tmp_path / "all.fastq.gz", reads[0::3] + reads[1::3] + reads[2::3])
+    index_path = str(tmp_path / "lanes.idx")
+    k = 9
+    for backend in ('compact', 'networkx'):
+        full = build(combined, k, backend, min_count=2)
+
+        builder = DeBruijnGraphBuilder(None, k, backend=backend, min_count=2, index_path=index_path)
+        first = builder.add_reads(lanes[:2])
+        assert builder.add_reads(lanes[:1]) == []
+        resumed = DeBruijnGraphBuilder(None, k, backend=backend, min_count=2, index_path=index_path)
+        resumed.add_reads(lanes)
+        builder.add_reads(lanes[2:])
+        assert resumed.get_kmer_counts() == full.get_kmer_counts()
+        edges = sorted((u, v, data['count']) for u, v, data in resumed.get_graph().edges(data=True))
+        assert edges == sorted((u, v, data['count']) for u, v, data in full.get_graph().edges(data=True))
+        assert resumed.get_graph().number_of_nodes() == full.get_graph().number_of_nodes()
+        # The in-process graph was updated in place to the same state
+        assert builder.get_kmer_counts() == full.get_kmer_counts()
+        assert len(first[1].new_kmers) < len(first[1].kmers)
+        os.remove(index_path)
+
+
+def test_add_reads_skips_files_already_in_count_cache(tmp_path):
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", random_reads(count=30, length=50))
+    index_path = str(tmp_path / "cache.idx")
+    k = 9
+    cached = DeBruijnGraphBuilder(reads_file, k, index_path=index_path)
+    cached.build_graph_from_kmers()
+
+    builder = DeBruijnGraphBuilder(None, k, index_path=index_path)
+    assert builder.add_reads([reads_file]) == []
+    assert builder.get_kmer_counts() == cached.get_kmer_counts()
+
+    # An index without its inputs list cannot tell what it holds
+    os.remove(index_path + INPUTS_SUFFIX)
+    with pytest.raises(ValueError, match="cannot be extended"):
+        DeBruijnGraphBuilder(None, k, index_path=index_path).add_reads([reads_file])
+
+    # Filtered counts are not extendable, so they get no list either
+    filtered_path = str(tmp_path / "filtered.idx")
+    DeBruijnGraphBuilder(reads_file, k, min_count=2, index_path=filtered_path).build_graph_from_kmers()
+    assert not os.path.exists(filtered_path + INPUTS_SUFFIX)
+    assert not is_extendable(filtered_path)
+    assert is_extendable(str(tmp_path / "new.idx"))
+
+
+def test_top_edges_ranks_unsigned_counts():
+    counts = np.array([0, 5, 3, 5, 0], dtype=np.uint32)
+    assert top_edges(counts, 0, None)[0].tolist() == [1, 3, 2, 0, 4]
+    selected, above = top_edges(counts, 0, 3)
+    assert selected.tolist() == [1, 3, 2] and above == 5
+
+
+def test_bulk_analytics_match_per_edge_checks(tmp_path):
+    # Short k on repetitive reads gives reciprocal edges and palindromes
+    reads = random_reads(count=30, length=40) + ["ACGTACGTACGTTTTTTAAAAA", "ATATATATGCGCGC"]
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    k = 5
+    for backend in ('compact', 'networkx'):
+        builder = build(reads_file, k, backend)
+        graph = builder.get_graph()
+        edge_kmers, _ = builder._edge_arrays()
+        nodes, in_degrees, out_degrees = degree_arrays(edge_kmers, k)
+        in_by_node = dict(graph.in_degree())
+        assert dict(zip((decode_kmer(code, k - 1) for code in nodes.tolist()), in_degrees.tolist())) == in_by_node
+        assert sorted(dict(graph.out_degree()).values()) == sorted(out_degrees.tolist())
+
+        reciprocal = reciprocal_mask(edge_kmers, k)
+        expected = {code: graph.has_edge(kmer[1:], kmer[:-1])
+                    for code, kmer in ((code, decode_kmer(code, k)) for code in edge_kmers.tolist())}
+        assert dict(zip(edge_kmers.tolist(), reciprocal.tolist())) == expected
+        assert any(expected.values())
+
+        all_heavy = sorted(((u, v, data['count']) for u, v, data in graph.edges(data=True) if data['count'] >= 2),
+                           key=lambda edge: edge[2], reverse=True)
+        top = builder.get_high_weight_edges(2, limit=7)
+        assert [count for _, _, count in top] == [count for _, _, count in all_heavy[:7]]
+        assert sorted(builder.get_high_weight_edges(2)) == sorted(all_heavy)
+
+        assert builder.validate_bidirected_structure(full_scan=True)
+
+    # A graph missing one reverse complement edge fails the full scan
+    u, v = next(iter(builder.graph.edges()))
+    builder.graph.remove_edge(builder.get_reverse_complement(v), builder.get_reverse_complement(u))
+    assert not builder.validate_bidirected_structure(full_scan=True)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Tests for the k-mer counting engines in FastqProcessor.
+"""
+
+import gzip
+import random
+
+import numpy as np
+
+from external_counting import ExternalKmerCounter
+from kmer_encoding import (decode_kmer, encode_kmer, iter_canonical_codes,
+                           reverse_complement_code)
+from parallel_counting import ShardedKmerCounter
+from read_fastq_gz import FastqProcessor
+from sample_counts import expand_inputs, group_samples, resolve_inputs
+
+
+def write_fastq_gz(path, sequences):
+    """Write sequences as a gzipped FASTQ file with constant qualities."""
+    with gzip.open(path, 'wt') as f:
+        for i, seq in enumerate(sequences):
+            f.write(f"@read{i}\n{seq}\n+\n{'I' * len(seq)}\n")
+    return str(path)
+
+
+def random_reads(count=50, length=60, seed=7):
+    rng = random.Random(seed)
+    return [''.join(rng.choice('ACGT') for _ in range(length)) for _ in range(count)]
+
+
+def test_encode_decode_roundtrip():
+    for kmer in ["A", "ACGT", "TTTTGCA", "GATTACA" * 6]:
+        code = encode_kmer(kmer)
+        assert decode_kmer(code, len(kmer)) == kmer
+
+
+def test_reverse_complement_code():
+    for kmer, rev_comp in [("ATGC", "GCAT"), ("AAAA", "TTTT"), ("ATAT", "ATAT")]:
+        assert reverse_complement_code(encode_kmer(kmer), 4) == encode_kmer(rev_comp)
+
+
+def test_rolling_codes_skip_invalid_bases():
+    codes = list(iter_canonical_codes("ACGNTTGCA", 3))
+    expected = [min(kmer, FastqProcessor(None).reverse_complement(kmer))
+                for kmer in ["ACG", "TTG", "TGC", "GCA"]]
+    assert [decode_kmer(code, 3) for code in codes] == expected
+
+
+def test_packed_matches_string_counts(tmp_path):
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", random_reads())
+    for k in (5, 21, 40):
+        string_processor = FastqProcessor(reads_file, k, method='string')
+        string_processor.process_fastq()
+        packed_processor = FastqProcessor(reads_file, k, method='packed')
+        packed_processor.process_fastq()
+        assert packed_processor.get_kmer_counts() == string_processor.get_kmer_counts()
+
+
+def test_packed_folds_case_and_skips_non_acgt_windows(tmp_path):
+    reads = random_reads(count=20) + ["ACGTNACGTACGTTTGCAnacgtGGCC", "acgtacgtTTGCA"]
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    upper_file = write_fastq_gz(tmp_path / "upper.fastq.gz", [read.upper() for read in reads])
+    for k in (3, 7):
+        string_processor = FastqProcessor(upper_file, k, method='string')
+        string_processor.process_fastq()
+        expected = {kmer: count for kmer, count in string_processor.get_kmer_counts().items() if 'N' not in kmer}
+        packed_processor = FastqProcessor(reads_file, k, method='packed')
+        packed_processor.process_fastq()
+        assert packed_processor.get_kmer_counts() == expected
+
+
+def test_numpy_matches_packed_counts(tmp_path):
+    reads = random_reads(count=120) + ["ACGTNACGTACGTTTGCAnacgtGGCC", "ACG", ""]
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    for k in (3, 11, 32):
+        packed_processor = FastqProcessor(reads_file, k, method='packed')
+        packed_processor.process_fastq()
+        numpy_processor = FastqProcessor(reads_file, k, method='numpy', batch_size=16)
+        numpy_processor.process_fastq()
+        assert numpy_processor.get_kmer_counts() == packed_processor.get_kmer_counts()
+        packed_kmers, packed_counts = packed_processor.get_count_arrays()
+        numpy_kmers, numpy_counts = numpy_processor.get_count_arrays()
+        assert packed_kmers.tolist() == numpy_kmers.tolist()
+        assert packed_counts.tolist() == numpy_counts.tolist()
+
+
+def test_parallel_matches_serial_counts(tmp_path):
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", random_reads(count=200))
+    serial_processor = FastqProcessor(reads_file, 15, method='numpy')
+    serial_processor.process_fastq()
+    parallel_processor = FastqProcessor(reads_file, 15, method='numpy', batch_size=20, workers=3)
+    parallel_processor.process_fastq()
+    serial_kmers, serial_counts = serial_processor.get_count_arrays()
+    parallel_kmers, parallel_counts = parallel_processor.get_count_arrays()
+    assert parallel_kmers.tolist() == serial_kmers.tolist()
+    assert parallel_counts.tolist() == serial_counts.tolist()
+
+    # Merge after every batch, with more shards than workers
+    counter = ShardedKmerCounter(15, workers=2, num_shards=5, min_merge_size=1)
+    table = counter.count(serial_processor.iter_batches())
+    assert table.kmers.tolist() == serial_kmers.tolist()
+    assert table.counts.tolist() == serial_counts.tolist()
+    assert all(len(kmers) for kmers, _ in counter.tables)
+
+
+def test_min_count_keeps_only_solid_kmers(tmp_path):
+    genome = random_reads(count=1, length=300, seed=11)[0]
+    reads = [genome[i:i + 60] for i in range(0, 240, 5)] + random_reads(count=30, seed=12)
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    exact_processor = FastqProcessor(reads_file, 13, method='numpy')
+    exact_processor.process_fastq()
+    expected = {kmer: count for kmer, count in exact_processor.get_kmer_counts().items() if count >= 3}
+
+    # A tiny sketch forces collisions, which must not change the result
+    for method, budget in (('numpy', 0.001), ('numpy', 64), ('packed', 1)):
+        processor = FastqProcessor(reads_file, 13, method=method, min_count=3, memory_budget_mb=budget)
+        processor.process_fastq()
+        assert processor.get_kmer_counts() == expected
+
+
+def test_external_counting_matches_in_memory(tmp_path):
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", random_reads(count=150) + ["ACGTNNACGTTGCA"])
+    in_memory = FastqProcessor(reads_file, 9, method='numpy')
+    in_memory.process_fastq()
+    expected_kmers, expected_counts = in_memory.get_count_arrays()
+
+    for workers, min_count in ((1, 1), (2, 2)):
+        processor = FastqProcessor(reads_file, 9, method='numpy', batch_size=25, workers=workers,
+                                   min_count=min_count, max_memory_mb=1, work_dir=str(tmp_path / f"buckets{workers}"))
+        processor.process_fastq()
+        keep = expected_counts >= min_count
+        kmers, counts = processor.get_count_arrays()
+        assert kmers.tolist() == expected_kmers[keep].tolist()
+        assert counts.tolist() == expected_counts[keep].tolist()
+        bucket_kmers = [kmer for bucket_kmers, _ in processor.iter_count_buckets() for kmer in bucket_kmers.tolist()]
+        assert bucket_kmers == expected_kmers[keep].tolist()
+
+    # Buckets far larger than a sort chunk are merged from many sorted runs
+    for min_count in (1, 2):
+        work_dir = tmp_path / f"runs{min_count}"
+        counter = ExternalKmerCounter(9, str(work_dir), prefix_bases=1, min_count=min_count)
+        counter.chunk_size = 500
+        table = counter.count(in_memory.iter_batches())
+        keep = expected_counts >= min_count
+        assert np.asarray(table.kmers).tolist() == expected_kmers[keep].tolist()
+        assert np.asarray(table.counts).tolist() == expected_counts[keep].tolist()
+        assert sorted(path.name for path in work_dir.iterdir()) == ["kmer_counts.counts", "kmer_counts.kmers",
+                                                                    "kmer_counts.offsets"]
+
+
+def test_index_is_reused_only_for_matching_input(tmp_path):
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", random_reads(count=80))
+    index_path = str(tmp_path / "reads.k11.idx")
+    first = FastqProcessor(reads_file, 11, method='numpy', index_path=index_path)
+    first.process_fastq()
+    assert first.kmer_index is None
+
+    second = FastqProcessor(reads_file, 11, method='packed', index_path=index_path)
+    second.process_fastq()
+    assert second.kmer_index is not None
+    assert second.get_kmer_counts() == first.get_kmer_counts()
+    assert second.get_count_arrays()[1].dtype.itemsize == 4
+
+    for kmer_length, min_count, source in ((11, 2, reads_file), (12, 1, reads_file),
+                                           (11, 1, write_fastq_gz(tmp_path / "other.fastq.gz", random_reads(count=5)))):
+        processor = FastqProcessor(source, kmer_length, method='numpy', min_count=min_count, index_path=index_path)
+        processor.process_fastq()
+        assert processor.kmer_index is None
+
+
+def test_multi_k_counting_matches_separate_runs(tmp_path):
+    reads = random_reads(count=60, length=45) + ["ACGTNACGTACGTAC", "ACG"]
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    kmer_lengths = [15, 5, 9, 31]
+    for min_count in (2, 1):
+        multi = FastqProcessor(reads_file, kmer_lengths, method='numpy', min_count=min_count, batch_size=7)
+        multi.process_fastq()
+        assert multi.kmer_length == 15
+        spectra = multi.kmer_spectra()
+        for k in kmer_lengths:
+            single = FastqProcessor(reads_file, k, method='packed', min_count=min_count)
+            single.process_fastq()
+            table = multi.get_count_table(k)
+            assert table.to_dict() == single.get_kmer_counts()
+            assert spectra[k].sum() == len(table)
+            assert (spectra[k] * range(len(spectra[k]))).sum() == table.counts.sum()
+
+    multi.write_spectra(tmp_path / "spectra.tsv")
+    rows = (tmp_path / "spectra.tsv").read_text().splitlines()
+    assert rows[0] == "k\tmultiplicity\tkmers"
+    assert {int(row.split('\t')[0]) for row in rows[1:]} == set(kmer_lengths)
+
+
+def test_sample_names_group_lanes_and_mates():
+    paths = ["run/S1_L001_R1_001.fastq.gz", "run/S1_L001_R2_001.fastq.gz", "run/S1_L002_R1_001.fq.gz",
+             "run/S2_1.fq", "run/S2_2.fq", "run/sample3.fastq.gz"]
+    assert group_samples(paths) == {
+        'S1': paths[:3],
+        'S2': paths[3:5],
+        'sample3': paths[5:],
+    }
+
+
+def test_multi_sample_columns_sum_to_shared_counts(tmp_path):
+    reads = random_reads(count=150, length=50)
+    write_fastq_gz(tmp_path / "A_R1.fastq.gz", reads[:40])
+    write_fastq_gz(tmp_path / "A_R2.fastq.gz", reads[40:80])
+    write_fastq_gz(tmp_path / "B.fastq.gz", reads[80:])
+    combined_file = write_fastq_gz(tmp_path / "combined.fastq.gz", reads)
+
+    files = expand_inputs([str(tmp_path / "[AB]*.fastq.gz")])
+    assert [path.rsplit('/', 1)[1] for path in files] == ["A_R1.fastq.gz", "A_R2.fastq.gz", "B.fastq.gz"]
+    files, samples = resolve_inputs(files, per_sample=True)
+    assert list(samples) == ['A', 'B']
+
+    for min_count, workers in ((1, 1), (2, 2)):
+        combined = FastqProcessor(combined_file, 13, method='numpy', min_count=min_count)
+        combined.process_fastq()
+        multi = FastqProcessor(files, 13, method='numpy', min_count=min_count, workers=workers,
+                               samples=samples)
+        multi.process_fastq()
+        assert multi.get_kmer_counts() == combined.get_kmer_counts()
+        sample_counts = multi.sample_counts
+        assert sample_counts.samples == ['A', 'B']
+        assert sample_counts.kmers.tolist() == combined.get_count_arrays()[0].tolist()
+        assert sample_counts.totals().tolist() == combined.get_count_arrays()[1].tolist()
+
+    single = FastqProcessor(str(tmp_path / "B.fastq.gz"), 13, method='numpy')
+    single.process_fastq()
+    b_counts = dict(zip(sample_counts.kmers.tolist(), sample_counts.columns[:, 1].tolist()))
+    kmers, counts = single.get_count_arrays()
+    assert all(b_counts[kmer] == count for kmer, count in zip(kmers.tolist(), counts.tolist()) if kmer in b_counts)
+
+    sample_counts.write_tsv(tmp_path / "samples.tsv")
+    rows = (tmp_path / "samples.tsv").read_text().splitlines()
+    assert rows[0] == "kmer\tA\tB"
+    assert len(rows) == len(sample_counts) + 1
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for stage profiling.
+"""
+
+import io
+import json
+import time
+
+from de_bruijn_graph_builder import DeBruijnGraphBuilder
+from profiling import NULL_PROFILER, StageProfiler
+from test_kmer_counting import random_reads, write_fastq_gz
+
+
+def test_nested_stage_time_is_exclusive():
+    profiler = StageProfiler(stream=io.StringIO())
+    with profiler.stage('outer'):
+        time.sleep(0.02)
+        with profiler.stage('inner'):
+            time.sleep(0.05)
+    assert profiler.stages['inner'].wall >= 0.05
+    assert 0.02 <= profiler.stages['outer'].wall < 0.05
+    assert list(profiler.iter_stage('read', iter([1, 2, 3]))) == [1, 2, 3]
+    assert profiler.stages['read'].calls == 4
+
+
+def test_profiled_build_counts_reads_and_stages(tmp_path):
+    reads = random_reads(count=40, length=30)
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    stream = io.StringIO()
+    for method_args in ({'workers': 1}, {'workers': 2}, {'min_count': 2}):
+        profiler = StageProfiler(progress_interval=0, stream=stream)
+        builder = DeBruijnGraphBuilder(reads_file, 11, profiler=profiler, **method_args)
+        builder.build_graph_from_kmers()
+        summary = profiler.write_summary(str(tmp_path / "profile.json"))
+        assert summary['reads'] == 40
+        assert summary['kmers'] == 40 * (30 - 11 + 1)
+        assert {'read', 'count', 'graph'} <= set(summary['stages'])
+        assert summary['peak_rss_bytes'] > 0
+        assert json.loads((tmp_path / "profile.json").read_text())['reads'] == 40
+    assert "[profile]" in stream.getvalue()
+
+
+def test_null_profiler_is_a_no_op():
+    batches = [[b'ACGT']]
+    assert NULL_PROFILER.iter_stage('read', batches) is batches
+    with NULL_PROFILER.stage('count'):
+        NULL_PROFILER.add(reads=1, kmers=1)
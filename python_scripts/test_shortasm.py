@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Tests for the subcommand command-line interface.
+"""
+
+import io
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from query_service import KmerQueryService, handle_request, make_server
+from read_fastq_gz import FastqProcessor
+from shortasm import main
+from test_kmer_counting import random_reads, write_fastq_gz
+
+
+def reverse_complement(sequence):
+    return sequence.translate(str.maketrans('ACGT', 'TGCA'))[::-1]
+
+
+def test_query_answers_from_counts_and_index(tmp_path, capsys):
+    reads = random_reads(count=60)
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    index_path = str(tmp_path / "reads.k15.idx")
+    present = reads[3][10:25]
+    processor = FastqProcessor(reads_file, 15, method='packed')
+    processor.process_fastq()
+    expected = processor.get_kmer_counts()[min(present, reverse_complement(present))]
+
+    main(['count', '--reads', reads_file, '--kmer', '15', '--method', 'numpy', '--index', index_path])
+    for source in (['--reads', reads_file], ['--index', index_path]):
+        capsys.readouterr()
+        main(['query', *source, '--kmer', '15', reverse_complement(present), 'A' * 15])
+        output = capsys.readouterr().out
+        assert f"Forward edge exists in graph: Yes (count: {expected})" in output
+        assert "Forward edge exists in graph: No" in output
+
+    # Without --reads the k-mer length comes from the index header
+    capsys.readouterr()
+    main(['query', '--index', index_path, present])
+    assert f"Forward edge exists in graph: Yes (count: {expected})" in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        main(['query', '--index', index_path, '--kmer', '6', present[:6]])
+    assert "holds 15-mers, not 6-mers" in capsys.readouterr().err
+
+
+def test_parser_rejects_unsupported_counting_options(tmp_path, capsys):
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", random_reads(count=5))
+    rejected = [
+        ['count', '--kmer', '0'],
+        ['build', '--kmer', '-3'],
+        ['count', '--kmer', '35', '--max-memory', '64'],
+        ['count', '--method', 'packed', '--max-memory', '64'],
+        ['build', '--kmer', '35', '--max-memory', '64'],
+        ['count', '--kmer', '35', '--index', str(tmp_path / "k35.idx")],
+        ['count', '--method', 'string', '--index', str(tmp_path / "k6.idx")],
+        ['count', '--kmer', '5', '7', '--workers', '2'],
+        ['count', '--kmer', '5', '7', '--max-memory', '64'],
+        ['count', '--kmer', '5', '7', '--index', str(tmp_path / "multi.idx")],
+        ['count', '--kmer', '5', '35'],
+        ['count', '--kmer', '35', '--sample-counts', str(tmp_path / "samples.tsv")],
+        ['count', '--method', 'packed', '--sample-counts', str(tmp_path / "samples.tsv")],
+        ['count', '--max-memory', '64', '--sample-counts', str(tmp_path / "samples.tsv")],
+        ['build', '--index', str(tmp_path / "samples.idx"), '--sample-counts', str(tmp_path / "samples.tsv")],
+    ]
+    for argv in rejected:
+        with pytest.raises(SystemExit) as error:
+            main([*argv, '--reads', reads_file])
+        assert error.value.code == 2
+        assert 'error:' in capsys.readouterr().err
+
+
+def test_counting_and_queries_do_not_load_graph_modules(tmp_path):
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", random_reads(count=20))
+    index_path = str(tmp_path / "reads.k11.idx")
+    script = (
+        "import sys\n"
+        "from shortasm import main\n"
+        f"main(['count', '--reads', {reads_file!r}, '--kmer', '11', '--method', 'numpy', '--index', {index_path!r}])\n"
+        f"main(['query', '--index', {index_path!r}, '--kmer', '11', 'ACGTACGTACG'])\n"
+        "print(sorted(m for m in ('networkx', 'de_bruijn_graph_builder', 'compact_graph', 'multiprocessing')"
+        " if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.stdout.strip().splitlines()[-1] == '[]'
+
+
+def test_query_service_answers_counts_neighbours_and_paths(tmp_path):
+    reads = random_reads(count=80)
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    processor = FastqProcessor(reads_file, 13, method='packed')
+    processor.process_fastq()
+    expected = processor.get_kmer_counts()
+    service = KmerQueryService(13, *processor.get_count_arrays())
+
+    kmers = [reads[0][:13], reverse_complement(reads[5][20:33]), 'A' * 13]
+    assert service.kmer_counts(kmers).tolist() == [expected.get(min(kmer, reverse_complement(kmer)), 0)
+                                                   for kmer in kmers]
+    node = reads[7][30:42]
+    outgoing, incoming = service.neighbour_counts([node])
+    for base_index, base in enumerate('ACGT'):
+        for kmer, count in ((node + base, outgoing[0, base_index]), (base + node, incoming[0, base_index])):
+            assert count == expected.get(min(kmer, reverse_complement(kmer)), 0)
+    assert outgoing[0, 'ACGT'.index(reads[7][42])] > 0
+
+    read = reads[9]
+    coverage = service.coverages([read, 'ACG'])
+    assert len(coverage[0]) == len(read) - 12 and coverage[0].min() >= 1
+    assert len(coverage[1]) == 0
+    assert service.paths_exist([read, reverse_complement(read), read[:30] + 'N' + read[31:], 'ACG']) == \
+        [True, True, False, False]
+
+    assert handle_request(service, f"count {kmers[0]} {'A' * 13}").split()[1] == str(service.kmer_counts(['A' * 13])[0])
+    assert handle_request(service, "count ACGT").startswith("error")
+    assert handle_request(service, "bogus") == "error unknown command 'bogus'"
+    assert handle_request(service, "quit") is None
+
+
+def test_serve_answers_line_protocol_on_stdin_and_socket(tmp_path, monkeypatch, capsys):
+    reads = random_reads(count=40)
+    reads_file = write_fastq_gz(tmp_path / "reads.fastq.gz", reads)
+    index_path = str(tmp_path / "reads.k11.idx")
+    main(['count', '--reads', reads_file, '--kmer', '11', '--method', 'numpy', '--index', index_path])
+    capsys.readouterr()
+
+    requests = f"info\ncount {reads[0][:11]}\n\npath {reads[1]}\nquit\ncount {reads[0][:11]}\n"
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(requests))
+    main(['serve', '--index', index_path])
+    replies = capsys.readouterr().out.splitlines()
+    service = KmerQueryService.from_index(index_path)
+    assert replies == [f"k=11 kmers={len(service)}", str(service.kmer_counts([reads[0][:11]])[0]), "yes"]
+
+    server = make_server(service, str(tmp_path / "query.sock"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with socket.socket(socket.AF_UNIX) as client:
+            client.connect(str(tmp_path / "query.sock"))
+            stream = client.makefile('rw')
+            stream.write(f"path {reads[2]} {'A' * 30}\nquit\n")
+            stream.flush()
+            assert stream.read().splitlines() == ["yes no"]
+    finally:
+        server.shutdown()
+        server.server_close()
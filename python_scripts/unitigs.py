@@ -0,0 +1,345 @@
+"""
+Unitig compaction of a bidirected de Bruijn graph.
+
+A unitig is a maximal non-branching path of k-mers. Working from the sorted
+canonical k-mer table, the in/out-degree and unique neighbour of every
+k-mer (in its canonical orientation) are computed once with vector
+lookups. The walk then visits every k-mer exactly once, so compaction is
+linear in the number of k-mers.
+
+Oriented k-mers are (index, strand) pairs: strand 0 is the canonical k-mer
+and strand 1 its reverse complement. The successors of the reverse
+complement are the reverse complements of the canonical k-mer's
+predecessors, which is all the walk needs to follow either strand.
+
+The walk can be restricted to a subset of the table (a partition, see
+partitioned_unitigs); paths then also end where they would leave it.
+Links between unitigs are found with vector lookups from the unitig ends.
+"""
+
+import numpy as np
+
+from graph_analysis import search_sorted
+from kmer_batch import canonical_codes_of, reverse_complement_codes
+from kmer_encoding import decode_kmer, kmer_mask, reverse_complement_code
+
+
+def neighbour_arrays(kmers, kmer_length, successors=True, members=None):
+    """
+    Find the neighbours of canonical k-mers in their canonical orientation.
+
+    Args:
+        kmers (np.ndarray): Sorted canonical packed k-mers
+        kmer_length (int): K-mer length
+        successors (bool): Successors if True, predecessors otherwise
+        members (np.ndarray): Indices of the k-mers to look at (all if None);
+            neighbours are always searched in the whole table
+
+    Returns:
+        tuple: (degree, neighbour index, neighbour strand), parallel to
+        members; the neighbour arrays are only meaningful where degree == 1
+    """
+    queries = kmers if members is None else kmers[members]
+    mask = np.uint64(kmer_mask(kmer_length))
+    shift = np.uint64(2 * (kmer_length - 1))
+    degree = np.zeros(len(queries), dtype=np.int64)
+    neighbour = np.full(len(queries), -1, dtype=np.int64)
+    strand = np.zeros(len(queries), dtype=np.int8)
+    if not len(kmers) or not len(queries):
+        return degree, neighbour, strand
+    for base in range(4):
+        if successors:
+            extended = ((queries << np.uint64(2)) | np.uint64(base)) & mask
+        else:
+            extended = (np.uint64(base) << shift) | (queries >> np.uint64(2))
+        canonical = canonical_codes_of(extended, kmer_length)
+        index, found = search_sorted(kmers, canonical)
+        degree += found
+        neighbour[found] = index[found]
+        strand[found] = (extended[found] != canonical[found])
+    return degree, neighbour, strand
+
+
+class UnitigGraph:
+    def __init__(self, kmer_length):
+        self.kmer_length = kmer_length
+        # Packed unitig sequences (Python ints, 2 bits per base) and lengths in bases
+        self.sequences = []
+        self.lengths = []
+        # Number of k-mers and summed k-mer counts per unitig
+        self.kmer_totals = []
+        self.total_coverage = []
+        # First and last oriented k-mer of each unitig as (index, strand)
+        self.first_kmer = []
+        self.last_kmer = []
+        # Links as rows of (from unitig, from strand, to unitig, to strand);
+        # strand 0 is '+', 1 is '-', and the overlap is always k - 1
+        self.links = np.empty((0, 4), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.sequences)
+
+    def number_of_links(self):
+        return len(self.links)
+
+    def sequence(self, unitig):
+        """Decode the sequence of one unitig."""
+        return decode_kmer(self.sequences[unitig], self.lengths[unitig])
+
+    def mean_coverage(self, unitig):
+        return self.total_coverage[unitig] / self.kmer_totals[unitig]
+
+    def length_array(self):
+        return np.asarray(self.lengths, dtype=np.int64)
+
+    def coverage_array(self):
+        """Mean k-mer coverage of every unitig."""
+        return np.asarray(self.total_coverage, dtype=np.float64) / np.asarray(self.kmer_totals, dtype=np.float64)
+
+    def add_chain(self, source, chain):
+        """
+        Append the unitig spelled by a chain of unitigs of another graph.
+
+        Args:
+            source (UnitigGraph): Graph holding the chained unitigs
+            chain (list): (unitig, orientation) pairs, orientation 1 for the
+                reverse complement; consecutive unitigs overlap by k - 1 bases
+        """
+        k = self.kmer_length
+
+        def oriented_sequence(unitig, orientation):
+            sequence = source.sequences[unitig]
+            return sequence if orientation == 0 else reverse_complement_code(sequence, source.lengths[unitig])
+
+        sequence = oriented_sequence(*chain[0])
+        length = source.lengths[chain[0][0]]
+        kmer_total = 0
+        coverage = 0
+        for unitig, orientation in chain:
+            kmer_total += source.kmer_totals[unitig]
+            coverage += source.total_coverage[unitig]
+        for unitig, orientation in chain[1:]:
+            added = source.lengths[unitig] - (k - 1)
+            sequence = (sequence << (2 * added)) | (oriented_sequence(unitig, orientation) & kmer_mask(added))
+            length += added
+
+        self.sequences.append(sequence)
+        self.lengths.append(length)
+        self.kmer_totals.append(kmer_total)
+        self.total_coverage.append(coverage)
+        first_unitig, first_orientation = chain[0]
+        if first_orientation == 0:
+            self.first_kmer.append(source.first_kmer[first_unitig])
+        else:
+            index, strand = source.last_kmer[first_unitig]
+            self.first_kmer.append((index, 1 - strand))
+        last_unitig, last_orientation = chain[-1]
+        if last_orientation == 0:
+            self.last_kmer.append(source.last_kmer[last_unitig])
+        else:
+            index, strand = source.first_kmer[last_unitig]
+            self.last_kmer.append((index, 1 - strand))
+
+    def n50(self):
+        lengths = np.sort(self.length_array())[::-1]
+        if not len(lengths):
+            return 0
+        cumulative = np.cumsum(lengths)
+        return int(lengths[np.searchsorted(cumulative, cumulative[-1] / 2)])
+
+
+def _member_positions(members, indices):
+    """Positions of table indices in a sorted member array, -1 for non-members."""
+    positions = np.searchsorted(members, indices)
+    positions[positions == len(members)] = 0
+    return np.where(members[positions] == indices, positions, -1) if len(members) else positions
+
+
+def walk_paths(kmers, counts, kmer_length, members=None):
+    """
+    Walk the maximal non-branching paths through the k-mers of a table.
+
+    Branching is always judged against the whole table. With `members`,
+    only those k-mers are walked and a path also ends where its next k-mer
+    is not a member, leaving a fragment to be stitched to its neighbour.
+
+    Args:
+        kmers (np.ndarray): Sorted canonical packed k-mers
+        counts (np.ndarray): Their counts
+        kmer_length (int): K-mer length
+        members (np.ndarray): Sorted indices of the k-mers to walk (all if None)
+
+    Returns:
+        UnitigGraph: Paths without links; first/last k-mers are table indices
+    """
+    k = kmer_length
+    queries = kmers if members is None else kmers[members]
+    member_indices = range(len(kmers)) if members is None else members.tolist()
+    counts = (counts if members is None else counts[members]).tolist()
+    reverse = reverse_complement_codes(queries, k).tolist()
+    forward_codes = queries.tolist()
+
+    out_degree, succ_index, succ_strand = neighbour_arrays(kmers, k, successors=True, members=members)
+    in_degree, pred_index, pred_strand = neighbour_arrays(kmers, k, successors=False, members=members)
+    if members is not None:
+        # Neighbours become positions among the members, -1 outside them
+        succ_index = _member_positions(members, succ_index)
+        pred_index = _member_positions(members, pred_index)
+    out_degree = out_degree.tolist()
+    in_degree = in_degree.tolist()
+    succ_index = succ_index.tolist()
+    succ_strand = succ_strand.tolist()
+    pred_index = pred_index.tolist()
+    pred_strand = pred_strand.tolist()
+
+    def next_kmer(position, strand):
+        """Unique successor of an oriented k-mer, or None when it branches, ends or leaves the members."""
+        if strand == 0:
+            if out_degree[position] != 1:
+                return None
+            index, following_strand = succ_index[position], succ_strand[position]
+        else:
+            if in_degree[position] != 1:
+                return None
+            index, following_strand = pred_index[position], 1 - pred_strand[position]
+        if index < 0:
+            return None
+        # The successor must not have other predecessors
+        following_in = in_degree[index] if following_strand == 0 else out_degree[index]
+        return (index, following_strand) if following_in == 1 else None
+
+    graph = UnitigGraph(k)
+    visited = bytearray(len(queries))
+
+    def walk(position, strand):
+        path = []
+        current = (position, strand)
+        while True:
+            following = next_kmer(*current)
+            if following is None or visited[following[0]]:
+                return path
+            visited[following[0]] = 1
+            path.append(following)
+            current = following
+
+    for seed in range(len(queries)):
+        if visited[seed]:
+            continue
+        visited[seed] = 1
+        forward_path = walk(seed, 0)
+        backward_path = walk(seed, 1)
+        path = [(position, 1 - strand) for position, strand in reversed(backward_path)]
+        path.append((seed, 0))
+        path.extend(forward_path)
+
+        first_position, first_strand = path[0]
+        sequence = forward_codes[first_position] if first_strand == 0 else reverse[first_position]
+        coverage = 0
+        for position, strand in path:
+            coverage += counts[position]
+        for position, strand in path[1:]:
+            code = forward_codes[position] if strand == 0 else reverse[position]
+            sequence = (sequence << 2) | (code & 3)
+
+        graph.sequences.append(sequence)
+        graph.lengths.append(k + len(path) - 1)
+        graph.kmer_totals.append(len(path))
+        graph.total_coverage.append(coverage)
+        last_position, last_strand = path[-1]
+        graph.first_kmer.append((member_indices[first_position], first_strand))
+        graph.last_kmer.append((member_indices[last_position], last_strand))
+    return graph
+
+
+def build_unitigs(table):
+    """
+    Compact a canonical k-mer count table into its unitig graph.
+
+    Args:
+        table (KmerCountTable): Canonical k-mer counts
+
+    Returns:
+        UnitigGraph: Unitigs with coverage and links
+    """
+    graph = walk_paths(table.kmers, table.counts, table.kmer_length)
+    graph.links = find_links(graph, table.kmers)
+    return graph
+
+
+def oriented_codes(kmers, indices, strands, kmer_length):
+    """Packed codes of oriented k-mers given as (table index, strand) arrays."""
+    codes = kmers[indices]
+    return np.where(strands == 0, codes, reverse_complement_codes(codes, kmer_length))
+
+
+def _end_arrays(graph):
+    first = np.array(graph.first_kmer, dtype=np.int64).reshape(-1, 2)
+    last = np.array(graph.last_kmer, dtype=np.int64).reshape(-1, 2)
+    return first, last
+
+
+def find_links(graph, kmers):
+    """
+    Link unitig ends whose k-mers overlap by k - 1 bases.
+
+    A unitig's '+' orientation is left through its last k-mer and its '-'
+    orientation through the reverse complement of its first k-mer. Every
+    one-base extension of those exits that is in the table starts another
+    unitig (or ends one, entered in reverse), since a k-mer with two
+    predecessors cannot be inside a unitig. A palindromic k-mer is looked
+    up on both strands.
+
+    Args:
+        graph (UnitigGraph): Unitigs with first/last k-mers
+        kmers (np.ndarray): Sorted canonical packed k-mers of the table
+
+    Returns:
+        np.ndarray: (from unitig, from strand, to unitig, to strand) rows
+    """
+    k = graph.kmer_length
+    count = len(graph)
+    if not count:
+        return np.empty((0, 4), dtype=np.int64)
+    first, last = _end_arrays(graph)
+    unitigs = np.arange(count, dtype=np.int64)
+
+    # Entering an oriented k-mer: (index, strand) of a first k-mer enters
+    # that unitig as '+'; the flipped last k-mer enters it as '-'
+    entry_keys = np.concatenate((first[:, 0] * 2 + first[:, 1], last[:, 0] * 2 + (1 - last[:, 1])))
+    entry_values = np.concatenate((unitigs * 2, unitigs * 2 + 1))
+    order = np.argsort(entry_keys, kind='stable')
+    entry_keys = entry_keys[order]
+    entry_values = entry_values[order]
+
+    exit_codes = np.concatenate((
+        oriented_codes(kmers, last[:, 0], last[:, 1], k),
+        oriented_codes(kmers, first[:, 0], 1 - first[:, 1], k),
+    ))
+    sources = np.concatenate((unitigs * 2, unitigs * 2 + 1))
+    mask = np.uint64(kmer_mask(k))
+    link_codes = []
+    for base in range(4):
+        following = ((exit_codes << np.uint64(2)) | np.uint64(base)) & mask
+        reverse = reverse_complement_codes(following, k)
+        canonical = np.minimum(following, reverse)
+        index, found = search_sorted(kmers, canonical)
+        found = np.flatnonzero(found)
+        keys = index[found] * 2 + (following[found] != canonical[found])
+        # A palindromic k-mer (even k) is the same on both strands, so it
+        # enters whichever unitig end holds it, whatever strand was recorded
+        palindromes = found[following[found] == reverse[found]]
+        found = np.concatenate((found, palindromes))
+        keys = np.concatenate((keys, index[palindromes] * 2 + 1))
+        entry, entered = search_sorted(entry_keys, keys)
+        targets = entry_values[entry[entered]]
+        source = sources[found[entered]]
+        # A link and its reverse complement (target flipped -> source
+        # flipped) describe the same adjacency; keep the smaller of the two
+        link = source * (2 * count) + targets
+        mirror = (targets ^ 1) * (2 * count) + (source ^ 1)
+        link_codes.append(np.minimum(link, mirror))
+    link_codes = np.sort(np.concatenate(link_codes))
+    if len(link_codes):
+        link_codes = link_codes[np.concatenate(([True], link_codes[1:] != link_codes[:-1]))]
+    source, target = np.divmod(link_codes, 2 * count)
+    return np.stack((source // 2, source % 2, target // 2, target % 2), axis=1).astype(np.int64)